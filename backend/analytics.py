@@ -0,0 +1,415 @@
+"""
+Search analytics: a batched, compressed event log rolled up into per-minute aggregates
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+
+from .config import settings
+from .tracing import bucket_index, bucket_upper_bound
+
+logger = logging.getLogger(__name__)
+
+SearchEvent = namedtuple("SearchEvent", ["timestamp", "query", "results", "elapsed_us", "cached"])
+
+# The writer appends to <name>.active.gz and renames it to <name>.jsonl.gz when it seals it;
+# only sealed segments are compacted
+ACTIVE_SUFFIX = ".active.gz"
+SEALED_SUFFIX = ".jsonl.gz"
+
+
+class MinuteStats:
+    """Search count, cache hits, empty results and a sparse latency histogram for one minute
+
+    The histogram uses the tracing buckets (see tracing.bucket_index), kept
+    as {bucket: count} so a day of minutes stays small in memory and on disk.
+    """
+
+    __slots__ = ("searches", "cached", "empty", "total_us", "max_us", "buckets")
+
+    def __init__(self, searches=0, cached=0, empty=0, total_us=0, max_us=0, buckets=None):
+        self.searches = searches
+        self.cached = cached
+        self.empty = empty
+        self.total_us = total_us
+        self.max_us = max_us
+        self.buckets = buckets or {}
+
+    def add(self, event):
+        self.searches += 1
+        self.cached += bool(event.cached)
+        self.empty += not event.results
+        self.total_us += event.elapsed_us
+        self.max_us = max(self.max_us, event.elapsed_us)
+        bucket = bucket_index(event.elapsed_us)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def merge(self, other):
+        self.searches += other.searches
+        self.cached += other.cached
+        self.empty += other.empty
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        return self
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile, in microseconds"""
+        counted = sum(self.buckets.values())
+        if not counted:
+            return 0
+        rank = max(1, -(-counted * pct // 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(bucket_upper_bound(bucket), self.max_us)
+        return self.max_us
+
+    def summary(self):
+        searches = self.searches
+        return {
+            "searches": searches,
+            "cache_hit_rate": self.cached / searches * 100 if searches else 0.0,
+            "avg_response_time_ms": self.total_us / searches / 1000 if searches else 0.0,
+            "p95_response_time_ms": round(self.percentile(95) / 1000, 3),
+            "empty_results": self.empty,
+        }
+
+
+def rollup(events, minutes=None):
+    """Fold events into {minute start, in epoch seconds: MinuteStats}"""
+    minutes = {} if minutes is None else minutes
+    for event in events:
+        minute = int(event.timestamp // 60 * 60)
+        stats = minutes.get(minute)
+        if stats is None:
+            stats = minutes[minute] = MinuteStats()
+        stats.add(event)
+    return minutes
+
+
+def read_segment(path):
+    """Events in a segment file; a batch cut short by a crash ends the read"""
+    events = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                events.append(SearchEvent(*json.loads(line)))
+    except FileNotFoundError:
+        # Another worker compacted and removed it first
+        pass
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        logger.warning("Analytics segment %s is truncated after %d events: %s", path, len(events), e)
+    return events
+
+
+class AggregateStore:
+    """SQLite table of per-minute aggregates, plus the names of the segments rolled into it
+
+    Recording a segment's name in the same transaction as its minutes makes
+    compaction safe to repeat and to run from several workers at once: a
+    segment is only ever counted once.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS minutes (
+                    minute INTEGER PRIMARY KEY,
+                    searches INTEGER NOT NULL,
+                    cached INTEGER NOT NULL,
+                    empty INTEGER NOT NULL,
+                    total_us INTEGER NOT NULL,
+                    max_us INTEGER NOT NULL,
+                    buckets TEXT NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments (name TEXT PRIMARY KEY, compacted_at REAL NOT NULL)"
+            )
+
+    def add_segment(self, name, minutes):
+        """Add a segment's minutes unless it was added before; returns whether it was"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM segments WHERE name = ?", (name,)).fetchone():
+                    self._conn.execute("ROLLBACK")
+                    return False
+                for minute, stats in minutes.items():
+                    row = self._conn.execute("SELECT * FROM minutes WHERE minute = ?", (minute,)).fetchone()
+                    if row is not None:
+                        stats = _from_row(row).merge(stats)
+                    self._conn.execute("INSERT OR REPLACE INTO minutes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                       (minute, *_to_row(stats)))
+                self._conn.execute("INSERT INTO segments VALUES (?, ?)", (name, time.time()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def compacted(self, names):
+        names = list(names)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT name FROM segments WHERE name IN ({','.join('?' * len(names))})", names
+            ) if names else []
+            return {row[0] for row in rows}
+
+    def totals(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(searches), 0), COALESCE(SUM(cached), 0), COALESCE(SUM(empty), 0), "
+                "COALESCE(SUM(total_us), 0), COALESCE(MAX(max_us), 0) FROM minutes"
+            ).fetchone()
+        return MinuteStats(*row)
+
+    def minutes(self, since):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM minutes WHERE minute >= ? ORDER BY minute", (since,)).fetchall()
+        return {row[0]: _from_row(row) for row in rows}
+
+    def prune(self, before):
+        """Drop minutes, and the record of segments compacted, older than ``before``"""
+        with self._lock:
+            self._conn.execute("DELETE FROM minutes WHERE minute < ?", (before,))
+            self._conn.execute("DELETE FROM segments WHERE compacted_at < ?", (before,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _to_row(stats):
+    return (stats.searches, stats.cached, stats.empty, stats.total_us, stats.max_us,
+            json.dumps({str(bucket): count for bucket, count in stats.buckets.items()}))
+
+
+def _from_row(row):
+    buckets = {int(bucket): count for bucket, count in json.loads(row[6]).items()}
+    return MinuteStats(row[1], row[2], row[3], row[4], row[5], buckets)
+
+
+class SearchAnalytics:
+    """Search statistics that cost the request path one deque append
+
+    record() appends an event to an in-process deque, which is safe without
+    a lock, and returns. A background task drains the deque every
+    ``flush_interval`` seconds. It folds each batch into per-minute stats in
+    memory, then a worker thread appends the batch to this process's active
+    segment under ``path`` as one gzip member of JSON lines. A segment is
+    sealed once it reaches ``segment_bytes`` or ``segment_seconds``.
+
+    Every ``compact_interval`` seconds the sealed segments of every worker
+    are rolled into the per-minute table in ``aggregates.sqlite3`` and
+    deleted. stats() answers from the table's totals and recent minutes,
+    cached after each compaction, plus this process's events that are not
+    compacted yet, so reading it touches no disk either. With no ``path``
+    the stats are kept in memory only.
+    """
+
+    def __init__(self, path=None, flush_interval=None, compact_interval=None, segment_bytes=None,
+                 segment_seconds=None, queue_size=None, retention_days=None, history_minutes=None):
+        self.path = settings.analytics_path if path is None else path
+        self.flush_interval = flush_interval or settings.analytics_flush_interval
+        self.compact_interval = compact_interval or settings.analytics_compact_interval
+        self.segment_bytes = segment_bytes or settings.analytics_segment_bytes
+        self.segment_seconds = segment_seconds or settings.analytics_segment_seconds
+        self.retention = (retention_days or settings.analytics_retention_days) * 86400
+        self.history_minutes = history_minutes or settings.analytics_history_minutes
+        self.store = AggregateStore(os.path.join(self.path, "aggregates.sqlite3")) if self.path else None
+
+        self._queue = deque(maxlen=queue_size or settings.analytics_queue_size)
+        self._lock = threading.Lock()
+        # Segment name (None without a path) -> {minute: MinuteStats} of events not compacted yet
+        self._live = {}
+        self._totals = MinuteStats()
+        self._history = {}
+        self._active = None
+        self._active_started = 0.0
+        self._active_bytes = 0
+        self._task = None
+        self.counters = {"recorded": 0, "dropped": 0, "written": 0, "segments": 0, "compacted": 0,
+                         "write_errors": 0}
+        if self.store is not None:
+            self._refresh()
+
+    def record(self, query, results, elapsed_ms, cached=False):
+        if len(self._queue) == self._queue.maxlen:
+            # The oldest event is pushed out; only possible if the writer has stalled
+            self.counters["dropped"] += 1
+        self._queue.append(SearchEvent(time.time(), query, results, int(elapsed_ms * 1000), cached))
+        self.counters["recorded"] += 1
+
+    def _drain(self):
+        batch = []
+        for _ in range(len(self._queue)):
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _fold(self, segment, batch):
+        with self._lock:
+            rollup(batch, self._live.setdefault(segment, {}))
+
+    def _segment_for(self, now):
+        """Name of the segment the next batch goes to, and the one to seal first, if any"""
+        sealed = None
+        if self._active is not None and (self._active_bytes >= self.segment_bytes
+                                         or now - self._active_started >= self.segment_seconds):
+            sealed, self._active = self._active, None
+        if self._active is None:
+            self._active = f"{int(now * 1000)}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._active_started = now
+            self._active_bytes = 0
+            self.counters["segments"] += 1
+        return self._active, sealed
+
+    def _append(self, segment, batch, sealed):
+        if sealed is not None:
+            self._seal(sealed)
+        data = "".join(json.dumps(list(event), ensure_ascii=False) + "\n" for event in batch)
+        member = gzip.compress(data.encode("utf-8"), compresslevel=6)
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, segment + ACTIVE_SUFFIX), "ab") as f:
+            f.write(member)
+        return len(member)
+
+    def _seal(self, segment):
+        try:
+            os.replace(os.path.join(self.path, segment + ACTIVE_SUFFIX), os.path.join(self.path, segment + SEALED_SUFFIX))
+        except FileNotFoundError:
+            pass
+
+    async def flush(self):
+        """Write out everything recorded so far"""
+        batch = self._drain()
+        if not batch:
+            return
+        if self.store is None:
+            self._fold(None, batch)
+            return
+        segment, sealed = self._segment_for(time.time())
+        self._fold(segment, batch)
+        try:
+            self._active_bytes += await asyncio.to_thread(self._append, segment, batch, sealed)
+            self.counters["written"] += len(batch)
+        except OSError as e:
+            # The events still count towards stats() until this process exits
+            logger.warning("Analytics write to %s failed: %s", self.path, e)
+            self.counters["write_errors"] += 1
+
+    def compact(self, now=None):
+        """Roll every sealed segment into the aggregate table and refresh the cached stats
+
+        Also seals segments left active by a worker that has stopped writing
+        (no append for two segment spans, so most likely gone) and drops
+        minutes past the retention period. Returns how many segments this
+        call rolled up.
+        """
+        if self.store is None:
+            return 0
+        now = now or time.time()
+        rolled = 0
+        names = sorted(os.listdir(self.path)) if os.path.isdir(self.path) else []
+        for name in names:
+            if name.endswith(ACTIVE_SUFFIX) and name[:-len(ACTIVE_SUFFIX)] != self._active:
+                try:
+                    idle = now - os.path.getmtime(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    continue
+                if idle > 2 * self.segment_seconds:
+                    self._seal(name[:-len(ACTIVE_SUFFIX)])
+                    name = name[:-len(ACTIVE_SUFFIX)] + SEALED_SUFFIX
+            if not name.endswith(SEALED_SUFFIX):
+                continue
+            path = os.path.join(self.path, name)
+            if self.store.add_segment(name[:-len(SEALED_SUFFIX)], rollup(read_segment(path))):
+                rolled += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.store.prune(now - self.retention)
+        self._refresh(now)
+        self.counters["compacted"] += rolled
+        return rolled
+
+    def _refresh(self, now=None):
+        now = now or time.time()
+        totals = self.store.totals()
+        history = self.store.minutes(int(now // 60 * 60) - self.history_minutes * 60)
+        with self._lock:
+            done = self.store.compacted(segment for segment in self._live if segment is not None)
+            for segment in done:
+                del self._live[segment]
+            self._totals, self._history = totals, history
+
+    def stats(self, minutes=60, now=None):
+        """Totals since the oldest retained minute, and per-minute stats for the last ``minutes``
+
+        Returns (MinuteStats, [(minute start, MinuteStats), ...]) with the
+        history oldest first and only minutes that saw a search.
+        """
+        if self._task is None:
+            # No background writer (e.g. a sync caller), so fold pending events in now
+            batch = self._drain()
+            if batch:
+                self._fold(None, batch)
+        now = now or time.time()
+        since = int(now // 60 * 60) - (min(minutes, self.history_minutes) - 1) * 60
+        with self._lock:
+            totals = MinuteStats().merge(self._totals)
+            history = {minute: MinuteStats().merge(stats) for minute, stats in self._history.items()
+                       if minute >= since}
+            for live in self._live.values():
+                for minute, stats in live.items():
+                    totals.merge(stats)
+                    if minute >= since:
+                        history.setdefault(minute, MinuteStats()).merge(stats)
+        return totals, sorted(history.items()) if minutes > 0 else []
+
+    async def run(self):
+        last_compaction = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - last_compaction >= self.compact_interval:
+                    last_compaction = time.monotonic()
+                    await asyncio.to_thread(self.compact)
+            except Exception:
+                logger.exception("Analytics flush failed")
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self.store is not None and self._active is not None:
+            # Seal on the way out so this process's last events are compacted now, not abandoned
+            self._seal(self._active)
+            self._active = None
+            await asyncio.to_thread(self.compact)
+
+    def snapshot(self):
+        return {**self.counters, "queued": len(self._queue), "live_segments": len(self._live)}
@@ -0,0 +1,314 @@
+"""
+Two-tier search-result cache: in-process L1 in front of Redis
+"""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from .config import settings
+from .tracing import stage
+from .embeddings import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    __slots__ = ("value", "fresh_until", "stale_until", "hits")
+
+    def __init__(self, value, fresh_until, stale_until, hits=0):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.hits = hits
+
+    def dumps(self):
+        return json.dumps({"v": self.value, "f": self.fresh_until, "s": self.stale_until})
+
+    @classmethod
+    def loads(cls, raw):
+        data = json.loads(raw)
+        return cls(data["v"], data["f"], data["s"])
+
+
+class L1Cache:
+    """Bounded LRU of CacheEntry objects that drops entries past their stale deadline"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if now >= entry.stale_until:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class LocalRedis:
+    """In-memory stand-in for the subset of redis.asyncio.Redis the backend uses"""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+
+    def _expire(self, key):
+        deadline = self._expires.get(key)
+        if deadline is not None and time.time() >= deadline:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    async def get(self, key):
+        self._expire(key)
+        return self._data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self._data[key] = value.encode() if isinstance(value, str) else value
+        if ex is not None:
+            self._expires[key] = time.time() + ex
+        else:
+            self._expires.pop(key, None)
+        return True
+
+    async def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            self._expires.pop(key, None)
+            removed += self._data.pop(key, None) is not None
+        return removed
+
+    async def hset(self, key, field, value):
+        fields = self._data.setdefault(key, {})
+        created = field not in fields
+        fields[_to_bytes(field)] = _to_bytes(value)
+        return int(created)
+
+    async def hget(self, key, field):
+        return self._data.get(key, {}).get(_to_bytes(field))
+
+    async def zincrby(self, key, amount, member):
+        scores = self._data.setdefault(key, {})
+        member = _to_bytes(member)
+        scores[member] = scores.get(member, 0.0) + float(amount)
+        return scores[member]
+
+    async def zunionstore(self, dest, keys):
+        union = {}
+        for key in keys:
+            self._expire(key)
+            for member, score in self._data.get(key, {}).items():
+                union[member] = union.get(member, 0.0) + score
+        self._data[dest] = union
+        self._expires.pop(dest, None)
+        return len(union)
+
+    async def expire(self, key, seconds):
+        if key not in self._data:
+            return False
+        self._expires[key] = time.time() + seconds
+        return True
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        self._expire(key)
+        ranked = sorted(self._data.get(key, {}).items(), key=lambda item: (-item[1], item[0]))
+        ranked = ranked[start:None if end == -1 else end + 1]
+        return ranked if withscores else [member for member, _ in ranked]
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+    async def ping(self):
+        return True
+
+    async def aclose(self):
+        pass
+
+
+class LocalPipeline:
+    """Queues LocalRedis commands until execute(), like a redis.asyncio pipeline"""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        commands, self._commands = self._commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+def _to_bytes(value):
+    return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+
+def create_redis(url=None):
+    """Redis client for REDIS_URL, or the in-memory stand-in for CACHE_BACKEND=local"""
+    if settings.cache_backend == "local":
+        return LocalRedis()
+    import redis.asyncio as redis
+    return redis.from_url(url or settings.redis_url)
+
+
+class SearchCache:
+    """Search-result cache with request coalescing and stale-while-revalidate
+
+    Lookups go L1 (this process) -> L2 (Redis, shared by all workers) -> compute.
+    Concurrent misses for the same key share one computation (single flight).
+    Entries stay usable for ``stale_ttl`` seconds past their freshness; a hot
+    entry (``hot_hits`` or more hits) served in that window is returned at once
+    and refreshed in the background. Fresh TTLs are jittered so keys written
+    together do not all expire together.
+    """
+
+    def __init__(self, redis=None, ttl=None, stale_ttl=None, l1_size=None, hot_hits=None,
+                 namespace="search", jitter=0.1):
+        self.redis = redis
+        self.ttl = ttl or settings.cache_ttl_seconds
+        self.stale_ttl = settings.cache_stale_ttl_seconds if stale_ttl is None else stale_ttl
+        self.l1 = L1Cache(l1_size or settings.cache_l1_size)
+        self.hot_hits = settings.cache_hot_hits if hot_hits is None else hot_hits
+        self.namespace = namespace
+        self.jitter = jitter
+
+        self._inflight = {}
+        self._background = set()
+        self.counters = {
+            "l1_hits": 0, "l2_hits": 0, "stale_hits": 0, "misses": 0,
+            "coalesced": 0, "refreshes": 0, "l2_errors": 0,
+        }
+
+    def key(self, query, *parts):
+        """Cache key from the normalized query, so "Biryani " and "biryani" share an entry"""
+        suffix = ":".join(str(part) for part in parts)
+        return f"{self.namespace}:{normalize_query(query)}" + (f":{suffix}" if suffix else "")
+
+    def hit_rate(self):
+        """Share of lookups answered from L1 or L2, in percent"""
+        hits = self.counters["l1_hits"] + self.counters["l2_hits"]
+        lookups = hits + self.counters["misses"]
+        return hits / lookups * 100 if lookups else 0.0
+
+    def stats(self):
+        return dict(self.counters, hit_rate=self.hit_rate(), l1_entries=len(self.l1))
+
+    async def _l2_get(self, key):
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(key)
+        except Exception as e:
+            self.counters["l2_errors"] += 1
+            logger.debug("L2 cache read failed for %s: %s", key, e)
+            return None
+        return CacheEntry.loads(raw) if raw else None
+
+    async def _store(self, key, value):
+        now = time.time()
+        fresh = self.ttl * random.uniform(1 - self.jitter, 1 + self.jitter)
+        entry = CacheEntry(value, now + fresh, now + fresh + self.stale_ttl)
+        self.l1.put(key, entry)
+        if self.redis is not None:
+            try:
+                await self.redis.set(key, entry.dumps(), ex=max(1, int(fresh + self.stale_ttl)))
+            except Exception as e:
+                self.counters["l2_errors"] += 1
+                logger.debug("L2 cache write failed for %s: %s", key, e)
+
+    async def get_or_compute(self, key, compute):
+        """Return (value, cached) for key, calling the async compute() on a miss"""
+        now = time.time()
+        with stage("cache"):
+            entry = self.l1.get(key, now)
+            source = "l1_hits"
+            if entry is None:
+                entry = await self._l2_get(key)
+                source = "l2_hits"
+                if entry is not None and now < entry.stale_until:
+                    self.l1.put(key, entry)
+
+        if entry is not None:
+            entry.hits += 1
+            if now < entry.fresh_until:
+                self.counters[source] += 1
+                return entry.value, True
+            if now < entry.stale_until and entry.hits >= self.hot_hits:
+                self.counters[source] += 1
+                self.counters["stale_hits"] += 1
+                self._refresh_in_background(key, compute)
+                return entry.value, True
+
+        self.counters["misses"] += 1
+        return await self._single_flight(key, compute), False
+
+    async def _single_flight(self, key, compute):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            task = asyncio.get_running_loop().create_task(self._fill(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._fill_done(key, done))
+        # The fill runs in its own task, so a caller that goes away (a client hanging up)
+        # cancels only its own wait, never the result the other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _fill(self, key, compute):
+        value = await compute()
+        await self._store(key, value)
+        return value
+
+    def _fill_done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller had already gone
+            task.exception()
+
+    def _refresh_in_background(self, key, compute):
+        if key in self._inflight:
+            return
+        self.counters["refreshes"] += 1
+
+        async def refresh():
+            try:
+                await self._single_flight(key, compute)
+            except Exception as e:
+                logger.warning("Background refresh of %s failed: %s", key, e)
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def clear_local(self):
+        self.l1.clear()
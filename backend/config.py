@@ -0,0 +1,141 @@
+"""
+SnapChef backend configuration
+Values are read from the environment and the .env file (see env.example)
+"""
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8-sig", extra="ignore")
+
+    # API Configuration
+    api_title: str = "SnapChef API"
+    api_version: str = "1.0.0"
+    debug: bool = False
+
+    # External API Keys
+    huggingface_api_key: str = ""
+
+    # Database Configuration
+    redis_url: str = "redis://localhost:6379"
+    elasticsearch_url: str = "http://localhost:9200"
+    elasticsearch_index: str = "recipes"
+
+    # Recipe Sources
+    recipe_sources: str = "https://hebbarskitchen.com/,https://www.archanaskitchen.com/,https://www.indianhealthyrecipes.com/"
+    recipe_corpus_path: str = "data/recipes.json"
+    index_manifest_path: str = "data/index_manifest.json"
+    # Fall back to a full rebuild once this share of index slots are tombstones
+    index_compact_ratio: float = 0.25
+    # Near-duplicate recipes (estimated Jaccard similarity of title words, ingredients and
+    # step 3-grams at or above DEDUP_THRESHOLD) are indexed once, as their most complete copy
+    dedup_enabled: bool = True
+    dedup_threshold: float = 0.5
+    dedup_num_perm: int = 128
+    dedup_bands: int = 32
+    dedup_store_path: str = "data/dedup_signatures"
+    # Multi-worker serving: when set, the indexes are built once into memory-mapped generations
+    # under this directory that every worker maps read-only, re-checked every poll interval
+    shared_index_path: str = ""
+    shared_index_poll_interval: float = 1.0
+
+    # Search Configuration
+    max_search_results: int = 2
+    similarity_threshold: float = 0.3
+    cache_ttl_seconds: int = 3600
+    cache_stale_ttl_seconds: int = 600
+    cache_l1_size: int = 1024
+    cache_hot_hits: int = 3
+    # redis | local (in-process stand-in, for tests and single-node runs)
+    cache_backend: str = "redis"
+
+    # Popularity Counters
+    popularity_flush_interval: float = 2.0
+    popularity_top_k: int = 50
+    popularity_shards: int = 16
+    popularity_sketch_width: int = 2048
+    popularity_sketch_depth: int = 4
+
+    # Search Analytics: events are batched into gzip segments under ANALYTICS_PATH (empty keeps
+    # them in memory only) and compacted into per-minute aggregates that /stats answers from
+    analytics_path: str = "data/analytics"
+    analytics_flush_interval: float = 1.0
+    analytics_compact_interval: float = 60.0
+    analytics_segment_bytes: int = 1_000_000
+    analytics_segment_seconds: float = 300.0
+    analytics_queue_size: int = 100_000
+    analytics_retention_days: int = 30
+    analytics_history_minutes: int = 1440
+
+    # Typeahead Suggestions: completions kept per trie node, typos tolerated in long prefixes
+    suggest_top_k: int = 10
+    suggest_max_edits: int = 2
+
+    # Retrieval: lexical | semantic | hybrid (both, fused by reciprocal rank), then a
+    # cross-scorer re-ranks the first RERANK_CANDIDATES within RERANK_BUDGET_MS (0 disables it)
+    retrieval_mode: str = "hybrid"
+    hybrid_candidates: int = 50
+    rrf_k: int = 60
+    rerank_candidates: int = 20
+    rerank_budget_ms: float = 5.0
+
+    # Query Canonicalization: typos corrected per word (1 below 8 characters, none below 4)
+    query_max_edits: int = 2
+
+    # Scraping Configuration
+    request_timeout: int = 30
+    max_retries: int = 3
+    delay_between_requests: float = 1.0
+    scrape_concurrency: int = 8
+    scrape_connections_per_host: int = 2
+    scrape_max_pages: int = 500
+    scrape_max_depth: int = 3
+    scrape_frontier_path: str = "data/crawl_frontier.sqlite3"
+
+    # Indexing Pipeline
+    bulk_max_docs: int = 500
+    bulk_max_bytes: int = 5_000_000
+    bulk_flush_interval: float = 1.0
+    bulk_queue_size: int = 2000
+    bulk_max_retries: int = 5
+    bulk_dead_letter_path: str = "data/bulk_dead_letter.jsonl"
+    pipeline_manifest_path: str = "data/es_manifest.json"
+    pipeline_stats_path: str = "data/pipeline_stats.json"
+    pipeline_poll_interval: float = 30.0
+
+    # Request Tracing: requests slower than TRACE_SLOW_MS keep their profile when
+    # sampled; TRACE_PROFILE_SAMPLE_RATE=0 turns the profiler off
+    trace_slow_ms: float = 1000.0
+    trace_profile_sample_rate: float = 0.0
+    trace_profile_interval_ms: float = 5.0
+
+    # Model Configuration
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    max_sequence_length: int = 512
+    llm_model: str = "mistralai/Mistral-7B-Instruct-v0.2"
+
+    # Recipe Enrichment: none | stub | huggingface
+    enrichment_backend: str = "none"
+    enrichment_concurrency: int = 4
+    enrichment_timeout: int = 20
+    enrichment_store_path: str = "data/enrichments.sqlite3"
+
+    # Embedding Service: none | hashing | local | huggingface
+    embedding_backend: str = "none"
+    embedding_batch_size: int = 32
+    embedding_batch_window_ms: float = 5.0
+    embedding_cache_size: int = 10000
+    embedding_store_path: str = "data/embeddings"
+
+    # Vector Index: flat | ivf, stored as float32 | float16 | int8
+    vector_index_type: str = "ivf"
+    vector_index_dtype: str = "float32"
+    vector_index_nprobe: int = 8
+
+    @property
+    def recipe_source_list(self):
+        return [url.strip() for url in self.recipe_sources.split(",") if url.strip()]
+
+
+settings = Settings()
@@ -0,0 +1,239 @@
+"""
+Near-duplicate recipe detection across sources with MinHash signatures and LSH banding
+"""
+
+import hashlib
+import logging
+import zlib
+
+import numpy as np
+
+from .config import settings
+from .embeddings import EmbeddingStore
+from .ingredients import normalize_ingredient
+from .manifest import recipe_key
+from .search_index import tokenize
+from .transliteration import transliteration_key
+
+logger = logging.getLogger(__name__)
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; a, b and x all stay
+# below 2**32, so a * x + b cannot overflow uint64
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Recipes hashed per vectorized block, which bounds the (shingles x permutations) temporary
+SIGNATURE_BLOCK = 128
+# Candidate pairs verified per block, which bounds the two gathered signature copies
+PAIR_BLOCK = 8192
+
+
+def shingles(recipe, k=3):
+    """Features two copies of a recipe share: title words, ingredient names and word k-grams of the steps
+
+    Everything is normalized first (quantities and units dropped, Hindi and
+    English ingredient names unified, dish-name spellings keyed alike), so
+    the same recipe scraped from two sites shingles the same way.
+    """
+    features = {f"t:{transliteration_key(word)}" for word in tokenize(recipe.get("title", ""))}
+    for line in recipe.get("ingredients") or []:
+        name = normalize_ingredient(line)
+        if name:
+            features.add(f"i:{name}")
+    words = tokenize(" ".join(recipe.get("steps") or []))
+    features.update("s:" + " ".join(words[i:i + k]) for i in range(len(words) - k + 1))
+    return features
+
+
+class MinHasher:
+    """MinHash signatures of shingle sets, num_perm uint32 values each"""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.name = f"minhash-{num_perm}-seed{seed}"
+        self.a = rng.integers(1, MAX_HASH, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MAX_HASH, num_perm, dtype=np.uint64)
+
+    def signatures(self, shingle_sets):
+        """(len(shingle_sets), num_perm) signatures; an empty set gets all MAX_HASH, which matches nothing"""
+        result = np.full((len(shingle_sets), self.num_perm), MAX_HASH, dtype=np.uint32)
+        for start in range(0, len(shingle_sets), SIGNATURE_BLOCK):
+            block = shingle_sets[start:start + SIGNATURE_BLOCK]
+            rows = [i for i, features in enumerate(block) if features]
+            if not rows:
+                continue
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for i in rows for feature in block[i]),
+                                 dtype=np.uint64)
+            offsets = np.concatenate([[0], np.cumsum([len(block[i]) for i in rows])[:-1]])
+            permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+            result[start + np.asarray(rows)] = np.minimum.reduceat(permuted, offsets, axis=0)
+        return result
+
+
+def similar_pairs(signatures, bands, threshold):
+    """Pairs (i, j), i < j, whose signatures agree on at least ``threshold`` of their values, ordered by j
+
+    Rows are bucketed on each band of ``num_perm // bands`` values; within a
+    bucket every row is checked against the bucket's first row only, which
+    keeps the work linear in the number of rows however large a bucket gets.
+    """
+    n, num_perm = signatures.shape
+    width = num_perm // bands
+    live = np.flatnonzero((signatures != MAX_HASH).any(axis=1))
+    if len(live) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    candidates = []
+    for band in range(bands):
+        keys = signatures[live, band * width:(band + 1) * width]
+        # Sorting the band's values row-wise as a record groups identical bands together
+        records = np.ascontiguousarray(keys).view(np.dtype((np.void, keys.dtype.itemsize * width))).ravel()
+        order = np.argsort(records, kind="stable")
+        starts = np.concatenate([[True], records[order][1:] != records[order][:-1]])
+        leaders = order[np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))]
+        members = order[leaders != order]
+        candidates.append(np.stack([live[leaders[leaders != order]], live[members]], axis=1))
+    # One int64 per pair sorts far faster than unique rows, and orders the pairs by j, then i
+    candidates = np.concatenate(candidates)
+    codes = np.sort(candidates[:, 1] * n + candidates[:, 0])
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    codes = codes[first]
+    pairs = np.stack([codes % n, codes // n], axis=1)
+    if not len(pairs):
+        return pairs
+    keep = np.zeros(len(pairs), dtype=bool)
+    for start in range(0, len(pairs), PAIR_BLOCK):
+        block = pairs[start:start + PAIR_BLOCK]
+        agreement = (signatures[block[:, 0]] == signatures[block[:, 1]]).mean(axis=1)
+        keep[start:start + PAIR_BLOCK] = agreement >= threshold
+    return pairs[keep]
+
+
+def content_key(recipe):
+    """Digest of the raw fields shingles() reads, cheaper than manifest.fingerprint() at corpus scale
+
+    Unlike the fingerprint it does not normalize, so a cosmetic edit costs
+    one re-hash; two recipes with the same key always shingle the same.
+    """
+    parts = [recipe.get("title", ""), "\x1f".join(recipe.get("ingredients") or []),
+             "\x1f".join(recipe.get("steps") or [])]
+    return hashlib.blake2b("\x1e".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def completeness(recipe):
+    """How complete a recipe page is; the most complete copy becomes a cluster's canonical recipe"""
+    return (
+        bool(recipe.get("steps")),
+        len(recipe.get("ingredients") or []),
+        len(recipe.get("steps") or []),
+        bool(recipe.get("description")),
+        recipe.get("rating") or 0,
+    )
+
+
+class RecipeDeduplicator:
+    """Collapses copies of one recipe published by different sources into one canonical recipe
+
+    Recipes whose shingles (see shingles()) have an estimated Jaccard
+    similarity of at least ``threshold`` are clustered, at most one page per
+    source: two similar pages of the same site are kept apart, since a site
+    rarely publishes one recipe twice but often has close variants. Each cluster is
+    served as its most complete recipe, carrying the others as
+    ``alternates`` (id, title, source and url), so they are indexed,
+    embedded and returned once.
+
+    Clusters are stars rather than transitive closures: walking the corpus
+    in order, a recipe joins the first earlier recipe it matches that
+    started a cluster of its own and has no page from its source yet, or
+    starts one. A chain of recipes that
+    each look a little like the next therefore cannot merge a whole dish
+    family into one result.
+
+    Signatures are cached by content_key(), in memory and in an
+    append-only store on disk, so a pass only shingles and hashes recipes
+    that are new or changed, even across restarts; the clustering itself
+    is a few vectorized sorts over the cached signatures.
+    """
+
+    def __init__(self, threshold=None, num_perm=None, bands=None, store_path=None):
+        self.threshold = settings.dedup_threshold if threshold is None else threshold
+        self.bands = bands or settings.dedup_bands
+        self.hasher = MinHasher(num_perm or settings.dedup_num_perm)
+        store_path = settings.dedup_store_path if store_path is None else store_path
+        self.store = EmbeddingStore(store_path, self.hasher.name, dtype=np.uint32) if store_path else None
+        self._signatures = {}
+        self.counters = {"passes": 0, "hashed": 0, "duplicates": 0, "clusters": 0}
+
+    def snapshot(self):
+        return dict(self.counters)
+
+    def _signature_matrix(self, recipes, contents):
+        signatures = {}
+        for value in contents:
+            signature = self._signatures.get(value)
+            if signature is None and self.store is not None:
+                signature = self.store.get(value)
+            if signature is not None:
+                signatures[value] = signature
+        missing = list({value: i for i, value in enumerate(contents) if value not in signatures}.items())
+        # Shingled a block at a time, so only one block's shingle sets are ever held
+        for start in range(0, len(missing), SIGNATURE_BLOCK):
+            block = missing[start:start + SIGNATURE_BLOCK]
+            computed = self.hasher.signatures([shingles(recipes[i]) for _, i in block])
+            signatures.update(zip((value for value, _ in block), computed))
+            if self.store is not None:
+                self.store.put_many([value for value, _ in block], computed)
+        # Only content still in the corpus stays in memory
+        self._signatures = signatures
+        return np.vstack([signatures[value] for value in contents]), len(missing)
+
+    def deduplicate(self, recipes):
+        """Canonical recipes in corpus order, each with the alternates it stands for"""
+        by_key = {}
+        for recipe in recipes:
+            by_key.setdefault(recipe_key(recipe), recipe)
+        recipes = list(by_key.values())
+        if not recipes:
+            self.counters.update(duplicates=0, clusters=0)
+            return []
+        matrix, hashed = self._signature_matrix(recipes, [content_key(recipe) for recipe in recipes])
+
+        sources = [recipe.get("source", "Unknown") for recipe in recipes]
+        leader = list(range(len(recipes)))
+        cluster_sources = {}
+        for i, j in similar_pairs(matrix, self.bands, self.threshold).tolist():
+            # Pairs arrive ordered by j, then i: j joins the first earlier leader it matches
+            if leader[j] != j or leader[i] != i:
+                continue
+            taken = cluster_sources.setdefault(i, {sources[i]})
+            if sources[j] not in taken:
+                taken.add(sources[j])
+                leader[j] = i
+
+        clusters = {}
+        for i, root in enumerate(leader):
+            clusters.setdefault(root, []).append(i)
+        canonical, clustered = [], 0
+        for members in clusters.values():
+            best = max(members, key=lambda i: completeness(recipes[i]))
+            recipe = recipes[best]
+            others = [recipes[i] for i in members if i != best]
+            if others:
+                recipe = dict(recipe, alternates=[
+                    {"id": recipe_key(other), "title": other["title"], "source": other.get("source", "Unknown"),
+                     "url": other.get("url", "")}
+                    for other in others
+                ])
+                clustered += 1
+            canonical.append((best, recipe))
+        canonical.sort(key=lambda item: item[0])
+
+        self.counters["passes"] += 1
+        self.counters["hashed"] += hashed
+        self.counters["duplicates"] = len(recipes) - len(canonical)
+        self.counters["clusters"] = clustered
+        if hashed or clustered:
+            logger.info("Deduplicated %d recipes into %d (%d newly hashed, %d clusters)",
+                        len(recipes), len(canonical), hashed, clustered)
+        return [recipe for _, recipe in canonical]
@@ -0,0 +1,440 @@
+"""
+Text encoders and the batched, cached query-embedding service
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; run a single worker there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_query(text):
+    """Cache key for a query: lowercase with collapsed whitespace"""
+    return " ".join(text.lower().split())
+
+
+class HashingEncoder:
+    """Deterministic local encoder built from hashed word and character n-grams
+
+    Needs no model download or network, so it stands in for the real encoder
+    in CI and offline runs. Similar spellings share trigrams and therefore land
+    close to each other.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        for word in WORD_RE.findall(text.lower()):
+            yield "w:" + word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3], 0.5
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode())
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEncoder:
+    """Local sentence-transformers model, loaded on first use
+
+    Importing sentence-transformers pulls in torch, which takes seconds, so
+    nothing is imported until load() or the first encode().
+    """
+
+    def __init__(self, model_name=None):
+        self.model_name = model_name or settings.embedding_model
+        self.name = self.model_name
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._model is not None
+
+    def load(self):
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(self.model_name)
+                model.max_seq_length = settings.max_sequence_length
+                self._model = model
+        return self._model
+
+    def encode(self, texts):
+        return self.load().encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+
+
+class HuggingFaceEncoder:
+    """Hugging Face Inference API feature extraction, one request per batch"""
+
+    API_URL = "https://api-inference.huggingface.co/pipeline/feature-extraction/{model}"
+
+    def __init__(self, model_name=None, api_key=None, timeout=None):
+        self.model_name = model_name or settings.embedding_model
+        self.name = self.model_name
+        self.url = self.API_URL.format(model=self.model_name)
+        self.headers = {"Authorization": f"Bearer {api_key or settings.huggingface_api_key}"}
+        self.timeout = timeout or settings.request_timeout
+        self._client = None
+
+    def encode(self, texts):
+        import httpx
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout, headers=self.headers)
+        response = self._client.post(
+            self.url, json={"inputs": list(texts), "options": {"wait_for_model": True}}
+        )
+        response.raise_for_status()
+        vectors = np.asarray(response.json(), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def create_encoder(backend=None):
+    """Encoder for the EMBEDDING_BACKEND setting, or None when embeddings are disabled"""
+    backend = (backend or settings.embedding_backend).lower()
+    if backend == "none":
+        return None
+    if backend == "hashing":
+        return HashingEncoder()
+    if backend == "local":
+        return SentenceTransformerEncoder()
+    if backend == "huggingface":
+        return HuggingFaceEncoder()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class EmbeddingStore:
+    """Append-only on-disk vector store read through a memory map
+
+    Layout under ``path``: ``vectors.f32`` holds raw float32 rows, ``keys.txt``
+    holds one key per line (line number == row) and ``meta.json`` records the
+    encoder and dimension. A store written by a different encoder is ignored.
+    Other row types (``dtype``) go to ``vectors.<kind><bits>``, e.g. ``vectors.u32``.
+
+    Several workers may share one store: appends happen under an flock on
+    ``store.lock``, after reading the keys other processes appended since,
+    so every process agrees on which row holds which key.
+    """
+
+    def __init__(self, path, encoder_name, dim=None, dtype=np.float32):
+        self.path = path
+        self.encoder_name = encoder_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.rows = {}
+        self.num_rows = 0
+        self._matrix = None
+        # Bytes of keys.txt already read into rows
+        self._keys_offset = 0
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(path, f"vectors.{self.dtype.kind}{self.dtype.itemsize * 8}")
+        self._keys_path = os.path.join(path, "keys.txt")
+        self._meta_path = os.path.join(path, "meta.json")
+        self._lock_path = os.path.join(path, "store.lock")
+        self._load()
+
+    def __len__(self):
+        return len(self.rows)
+
+    @contextmanager
+    def _file_lock(self):
+        """Held across processes while the store's files are checked or appended to"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        if not os.path.exists(self._meta_path):
+            return None
+        with open(self._meta_path) as f:
+            return json.load(f)
+
+    def _matches(self, meta):
+        return (meta is not None and meta.get("encoder") == self.encoder_name
+                and meta.get("dtype", "float32") == self.dtype.name)
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with self._lock, self._file_lock():
+            meta = self._read_meta()
+            if not self._matches(meta):
+                logger.warning("Embedding store %s was written by %s, not %s; ignoring it",
+                               self.path, meta.get("encoder"), self.encoder_name)
+                return
+            self._sync(meta)
+
+    def _sync(self, meta):
+        """Pick up rows appended since the last sync, by this or another process; needs the file lock"""
+        self.dim = meta["dim"]
+        row_bytes = self.dtype.itemsize * self.dim
+        vector_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        tail = b""
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._keys_offset)
+                tail = f.read()
+        lines = tail.split(b"\n")[:-1]
+        complete_rows = vector_bytes // row_bytes
+        # A crash between the two appends can leave one side longer; keep the rows both files
+        # agree on and cut the other back to match
+        lines = lines[:max(0, complete_rows - self.num_rows)]
+        read_bytes = sum(len(line) + 1 for line in lines)
+        rows = self.num_rows + len(lines)
+        if read_bytes != len(tail) or vector_bytes != rows * row_bytes:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(rows * row_bytes)
+            with open(self._keys_path, "ab") as f:
+                f.truncate(self._keys_offset + read_bytes)
+        for line in lines:
+            self.rows[line.decode("utf-8")] = self.num_rows
+            self.num_rows += 1
+        self._keys_offset += read_bytes
+        if lines:
+            self._remap()
+
+    def _remap(self):
+        if self.num_rows:
+            self._matrix = np.memmap(self._vectors_path, dtype=self.dtype, mode="r",
+                                     shape=(self.num_rows, self.dim))
+
+    def get(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        if self._matrix is None or row >= len(self._matrix):
+            with self._lock:
+                self._remap()
+        return np.array(self._matrix[row])
+
+    def put_many(self, keys, vectors):
+        """Append vectors for keys that are not stored yet"""
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        with self._lock, self._file_lock():
+            meta = self._read_meta()
+            if self._matches(meta):
+                self._sync(meta)
+            else:
+                # No store yet, or one another encoder wrote: start afresh. Under the file
+                # lock, so this never discards rows a worker with the same encoder appended
+                self.dim = vectors.shape[1]
+                for stale in (self._vectors_path, self._keys_path):
+                    if os.path.exists(stale):
+                        os.remove(stale)
+                tmp_path = f"{self._meta_path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"encoder": self.encoder_name, "dim": self.dim, "dtype": self.dtype.name}, f)
+                os.replace(tmp_path, self._meta_path)
+                self.rows, self.num_rows, self._keys_offset, self._matrix = {}, 0, 0, None
+
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.rows and "\n" not in key:
+                    new.setdefault(key, vector)
+            new = list(new.items())
+            if not new:
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack([vector for _, vector in new]).tobytes())
+            data = "".join(key + "\n" for key, _ in new).encode("utf-8")
+            with open(self._keys_path, "ab") as f:
+                f.write(data)
+            for key, _ in new:
+                self.rows[key] = self.num_rows
+                self.num_rows += 1
+            self._keys_offset += len(data)
+            self._remap()
+
+
+class EmbeddingService:
+    """Query embeddings with an LRU, a persistent store and micro-batching
+
+    Concurrent ``embed`` calls that miss both caches are collected for up to
+    ``batch_window_ms`` (or until ``batch_size`` distinct queries are waiting)
+    and encoded in a single encoder call. Identical queries waiting in the same
+    window share one slot in the batch.
+
+    Recipe texts go through encode_corpus() instead, which keeps them in a
+    separate store under ``<store_path>/corpus`` and out of the query LRU.
+    """
+
+    def __init__(self, encoder, cache_size=None, store_path=None, batch_size=None, batch_window_ms=None):
+        self.encoder = encoder
+        self.cache = LRUCache(cache_size or settings.embedding_cache_size)
+        store_path = settings.embedding_store_path if store_path is None else store_path
+        self.store = EmbeddingStore(store_path, encoder.name) if store_path else None
+        self.corpus_store = EmbeddingStore(os.path.join(store_path, "corpus"), encoder.name) if store_path else None
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.batch_window = (batch_window_ms if batch_window_ms is not None
+                             else settings.embedding_batch_window_ms) / 1000.0
+
+        self._pending = {}
+        self._flush_handle = None
+        self.stats = {"cache_hits": 0, "store_hits": 0, "encoded": 0, "batches": 0, "corpus_encoded": 0}
+
+    @property
+    def name(self):
+        return self.encoder.name
+
+    @property
+    def ready(self):
+        """False while a lazily loaded encoder has not been loaded yet"""
+        return getattr(self.encoder, "ready", True)
+
+    def warm(self):
+        """Load a lazily loaded encoder now rather than on the first query"""
+        load = getattr(self.encoder, "load", None)
+        if load is not None:
+            load()
+
+    def _cached(self, key):
+        vector = self.cache.get(key)
+        if vector is not None:
+            self.stats["cache_hits"] += 1
+            return vector
+        if self.store is not None:
+            vector = self.store.get(key)
+            if vector is not None:
+                self.stats["store_hits"] += 1
+                self.cache.put(key, vector)
+                return vector
+        return None
+
+    def _remember(self, keys, vectors):
+        for key, vector in zip(keys, vectors):
+            self.cache.put(key, vector)
+        if self.store is not None:
+            self.store.put_many(keys, vectors)
+        self.stats["encoded"] += len(keys)
+        self.stats["batches"] += 1
+
+    def _encode_and_remember(self, keys):
+        vectors = self.encoder.encode(keys)
+        self._remember(keys, vectors)
+        return vectors
+
+    def encode(self, texts):
+        """Synchronous batch encode through both caches (corpus builds, sync callers)"""
+        keys = [normalize_query(text) for text in texts]
+        vectors = [self._cached(key) for key in keys]
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            encoded = self._encode_and_remember(missing)
+            lookup = dict(zip(missing, encoded))
+            vectors = [lookup[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    def encode_corpus(self, texts):
+        """Recipe vectors for an index build, from the corpus store or the encoder, never the query cache"""
+        keys = [normalize_query(text) for text in texts]
+        store = self.corpus_store
+        vectors = [store.get(key) if store is not None else None for key in keys]
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            encoded = self.encoder.encode(missing)
+            if store is not None:
+                store.put_many(missing, encoded)
+            self.stats["corpus_encoded"] += len(missing)
+            lookup = dict(zip(missing, encoded))
+            vectors = [lookup[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    async def embed(self, text):
+        """Embedding for one query, batched with other concurrent misses"""
+        key = normalize_query(text)
+        vector = self._cached(key)
+        if vector is not None:
+            return vector
+
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.batch_size:
+                self._flush_now()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush_now)
+        return await asyncio.shield(future)
+
+    def _flush_now(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        keys = list(batch)
+        try:
+            vectors = await asyncio.to_thread(self._encode_and_remember, keys)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, vector in zip(keys, vectors):
+            if not batch[key].done():
+                batch[key].set_result(vector)
@@ -0,0 +1,73 @@
+"""
+Precomputed recipe enrichments keyed by content hash
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class EnrichmentStore:
+    """SQLite table of generated recipe details, one row per recipe version
+
+    Rows are keyed by the recipe fingerprint (see manifest.fingerprint), so
+    an edited recipe gets a fresh enrichment while unchanged ones are only
+    ever generated once. The pipeline writes and the backend reads the same
+    file; WAL mode lets both happen at once.
+    """
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS enrichments (
+                    content_hash TEXT PRIMARY KEY,
+                    recipe_id TEXT NOT NULL,
+                    fields TEXT NOT NULL,
+                    generator TEXT,
+                    created_at REAL NOT NULL
+                )"""
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM enrichments").fetchone()[0]
+
+    def get(self, content_hash):
+        """Stored fields for a recipe version, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fields FROM enrichments WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def missing(self, content_hashes):
+        """The subset of hashes with no stored enrichment"""
+        content_hashes = list(content_hashes)
+        found = set()
+        with self._lock:
+            for start in range(0, len(content_hashes), 500):
+                chunk = content_hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT content_hash FROM enrichments WHERE content_hash IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                found.update(row[0] for row in rows)
+        return [content_hash for content_hash in content_hashes if content_hash not in found]
+
+    def put(self, content_hash, recipe_id, fields, generator=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO enrichments VALUES (?, ?, ?, ?, ?)",
+                (content_hash, recipe_id, json.dumps(fields, ensure_ascii=False), generator, time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
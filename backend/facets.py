@@ -0,0 +1,221 @@
+"""
+Facet bitmaps and columns for filtered search and facet counts
+"""
+
+import json
+import os
+
+import numpy as np
+
+from .ingredients import main_ingredient
+from .transliteration import fold
+
+FACETS = ("diet", "source", "cuisine", "course", "difficulty", "time", "main_ingredient")
+# Single-valued facets with an open-ended vocabulary, stored as a column of value ids
+COLUMN_FACETS = ("main_ingredient",)
+# Values of a column facet listed in facet counts, most frequent first
+COLUMN_COUNT_LIMIT = 25
+# Recipe fields facets are derived from that may change without the content hash changing
+FACET_FIELDS = ("diet", "source", "cuisine", "course", "difficulty", "cook_time_minutes")
+
+# Filter spellings accepted for facet values
+VALUE_ALIASES = {
+    "veg": "vegetarian",
+    "non veg": "non-vegetarian",
+    "non-veg": "non-vegetarian",
+    "nonveg": "non-vegetarian",
+}
+
+# Upper bound in minutes (inclusive) -> bucket name; the last bucket is open-ended
+TIME_BUCKETS = ((30, "under_30_min"), (60, "30_to_60_min"), (None, "over_60_min"))
+
+
+def time_bucket(minutes):
+    if minutes is None:
+        return None
+    for limit, name in TIME_BUCKETS:
+        if limit is None or minutes <= limit:
+            return name
+
+
+def normalize_filters(filters):
+    """Facet -> sorted folded values; raises ValueError for facets that do not exist"""
+    normalized = {}
+    for facet, wanted in (filters or {}).items():
+        if facet not in FACETS:
+            raise ValueError(f"Unknown filter: {facet} (expected one of {', '.join(FACETS)})")
+        if wanted is None:
+            continue
+        wanted = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+        values = {fold(str(value)).strip() for value in wanted}
+        normalized[facet] = sorted(VALUE_ALIASES.get(value, value) for value in values)
+    return normalized
+
+
+def facet_values(recipe):
+    """Facet -> values a recipe is counted under"""
+    values = {
+        "source": recipe.get("source"),
+        "cuisine": recipe.get("cuisine"),
+        "course": recipe.get("course"),
+        "difficulty": recipe.get("difficulty"),
+        "time": time_bucket(recipe.get("cook_time_minutes")),
+        "main_ingredient": main_ingredient(recipe.get("ingredients", [])),
+    }
+    values = {facet: [fold(value).strip()] for facet, value in values.items() if value}
+    diet = fold(recipe.get("diet") or "").strip()
+    if diet:
+        # Vegan dishes also satisfy a vegetarian filter
+        values["diet"] = [diet, "vegetarian"] if diet == "vegan" else [diet]
+    return values
+
+
+def _bitmap_bytes(docs):
+    return (docs + 7) // 8
+
+
+class FacetIndex:
+    """Packed bitmaps per facet value, and value-id columns for high-cardinality facets
+
+    Each value of a low-cardinality facet has a bitmap over doc ids, eight
+    documents to a byte (np.packbits order). A filter ORs the bitmaps of the
+    requested values within a facet and ANDs across facets, giving a mask
+    that retrieval applies before ranking, so filtered queries keep their
+    full top-k. Facets in COLUMN_FACETS have a value for almost every recipe
+    and an open-ended vocabulary, so they are stored as one int32 value id
+    per document instead, costing four bytes a recipe however many values
+    exist; only their COLUMN_COUNT_LIMIT most frequent values are counted.
+    Documents are added and removed in place; copy() first when the index is serving.
+    """
+
+    def __init__(self, capacity=1024):
+        self.rows = {}
+        self.bits = np.zeros((16, _bitmap_bytes(capacity)), dtype=np.uint8)
+        self.live = np.zeros(capacity, dtype=bool)
+        # Facet -> value -> value id, the values in id order, and facet -> value id per doc (-1 for none)
+        self.values = {facet: {} for facet in COLUMN_FACETS}
+        self.names = {facet: [] for facet in COLUMN_FACETS}
+        self.columns = {facet: np.full(capacity, -1, dtype=np.int32) for facet in COLUMN_FACETS}
+        self.size = 0
+
+    def build(self, recipes):
+        for doc_id, recipe in enumerate(recipes):
+            if recipe is not None:
+                self.add(doc_id, recipe)
+        return self
+
+    def _row(self, facet, value):
+        row = self.rows.get((facet, value))
+        if row is None:
+            row = self.rows[(facet, value)] = len(self.rows)
+            if row >= len(self.bits):
+                self.bits = np.vstack([self.bits, np.zeros_like(self.bits)])
+        return row
+
+    def _reserve(self, docs):
+        if docs <= len(self.live):
+            return
+        capacity = max(docs, 2 * len(self.live))
+        self.bits = np.pad(self.bits, ((0, 0), (0, _bitmap_bytes(capacity) - self.bits.shape[1])))
+        self.live = np.pad(self.live, (0, capacity - len(self.live)))
+        for facet, column in self.columns.items():
+            self.columns[facet] = np.pad(column, (0, capacity - len(column)), constant_values=-1)
+
+    def add(self, doc_id, recipe):
+        self._reserve(doc_id + 1)
+        self.size = max(self.size, doc_id + 1)
+        self.live[doc_id] = True
+        for facet, values in facet_values(recipe).items():
+            if facet in self.columns:
+                value_id = self.values[facet].get(values[0])
+                if value_id is None:
+                    value_id = self.values[facet][values[0]] = len(self.names[facet])
+                    self.names[facet].append(values[0])
+                self.columns[facet][doc_id] = value_id
+                continue
+            for value in values:
+                row = self._row(facet, value)
+                self.bits[row, doc_id >> 3] |= 0x80 >> (doc_id & 7)
+
+    def remove(self, doc_id):
+        self.live[doc_id] = False
+        self.bits[:, doc_id >> 3] &= 0xFF ^ (0x80 >> (doc_id & 7))
+        for column in self.columns.values():
+            column[doc_id] = -1
+
+    def copy(self):
+        """Copy that can be patched while this index keeps serving queries"""
+        clone = FacetIndex(capacity=0)
+        clone.rows = dict(self.rows)
+        clone.bits = np.array(self.bits)
+        clone.live = np.array(self.live)
+        clone.values = {facet: dict(values) for facet, values in self.values.items()}
+        clone.names = {facet: list(names) for facet, names in self.names.items()}
+        clone.columns = {facet: np.array(column) for facet, column in self.columns.items()}
+        clone.size = self.size
+        return clone
+
+    def save(self, path):
+        """Write the bitmaps and columns as .npy files that load() can memory-map"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "bits.npy"), self.bits[:len(self.rows), :_bitmap_bytes(self.size)])
+        np.save(os.path.join(path, "live.npy"), self.live[:self.size])
+        for facet, column in self.columns.items():
+            np.save(os.path.join(path, f"{facet}.npy"), column[:self.size])
+        with open(os.path.join(path, "rows.json"), "w", encoding="utf-8") as f:
+            json.dump({"rows": list(self.rows), "values": self.names}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved index read-only; with mmap the bitmaps stay on disk and are paged in on demand"""
+        with open(os.path.join(path, "rows.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        index = cls(capacity=0)
+        index.rows = {(facet, value): row for row, (facet, value) in enumerate(meta["rows"])}
+        index.names = meta["values"]
+        index.values = {facet: {value: i for i, value in enumerate(names)} for facet, names in index.names.items()}
+        index.bits = np.load(os.path.join(path, "bits.npy"), mmap_mode=mode)
+        index.live = np.load(os.path.join(path, "live.npy"), mmap_mode=mode)
+        index.columns = {facet: np.load(os.path.join(path, f"{facet}.npy"), mmap_mode=mode) for facet in index.values}
+        index.size = len(index.live)
+        return index
+
+    def mask(self, filters):
+        """Boolean mask over doc ids matching every filter, or None for no filters
+
+        ``filters`` maps a facet to one value or a list of values; see
+        normalize_filters().
+        """
+        filters = normalize_filters(filters)
+        if not filters:
+            return None
+        mask = self.live[:self.size].copy()
+        for facet, wanted in filters.items():
+            if facet in self.columns:
+                ids = [self.values[facet][value] for value in wanted if value in self.values[facet]]
+                mask &= np.isin(self.columns[facet][:self.size], ids)
+                continue
+            rows = [self.rows[(facet, value)] for value in wanted if (facet, value) in self.rows]
+            if not rows:
+                return np.zeros(self.size, dtype=bool)
+            bits = np.bitwise_or.reduce(self.bits[rows], axis=0)
+            mask &= np.unpackbits(bits, count=self.size).view(bool)
+        return mask
+
+    def counts(self, doc_ids):
+        """Facet -> {value: count} over the given documents, values with no documents left out"""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        bits = self.bits[:len(self.rows), doc_ids >> 3] >> (7 - (doc_ids & 7)).astype(np.uint8)
+        totals = np.count_nonzero(bits & 1, axis=1)
+        counts = {}
+        for (facet, value), row in self.rows.items():
+            if totals[row]:
+                counts.setdefault(facet, {})[value] = int(totals[row])
+        for facet, column in self.columns.items():
+            ids = np.asarray(column[doc_ids])
+            totals = np.bincount(ids[ids >= 0], minlength=len(self.names[facet]))
+            present = np.flatnonzero(totals)
+            for value_id in present[np.argsort(-totals[present], kind="stable")[:COLUMN_COUNT_LIMIT]]:
+                counts.setdefault(facet, {})[self.names[facet][value_id]] = int(totals[value_id])
+        return {facet: dict(sorted(values.items(), key=lambda item: -item[1])) for facet, values in counts.items()}
@@ -0,0 +1,92 @@
+"""
+Hybrid retrieval: reciprocal-rank fusion and a budgeted re-rank of the fused candidates
+"""
+
+import time
+from collections import namedtuple
+
+from .search_index import tokenize
+
+MODES = ("lexical", "semantic", "hybrid")
+
+# A ranked search hit and how it was found: retrieved_by lists the candidate
+# generators that returned it, reranked tells whether the cross-scorer saw it
+Hit = namedtuple("Hit", ["recipe", "similarity", "retrieved_by", "reranked"])
+
+Candidate = namedtuple("Candidate", ["doc_id", "fused", "lexical", "semantic"])
+
+# Feature weights of the cross-scorer; they sum to 1 so scores stay in [0, 1]
+CROSS_WEIGHTS = {
+    "title_recall": 0.35,
+    "title_precision": 0.15,
+    "phrase": 0.15,
+    "ingredients": 0.10,
+    "lexical": 0.15,
+    "semantic": 0.10,
+}
+
+
+def reciprocal_rank_fusion(lexical, semantic, k=60):
+    """Candidates from two ranked (doc_id, similarity) lists, ordered by summed 1 / (k + rank)"""
+    merged = {}
+    for source, ranking in (("lexical", lexical), ("semantic", semantic)):
+        for rank, (doc_id, similarity) in enumerate(ranking):
+            entry = merged.setdefault(doc_id, {"fused": 0.0, "lexical": None, "semantic": None})
+            entry["fused"] += 1.0 / (k + rank + 1)
+            entry[source] = similarity
+    candidates = [Candidate(doc_id, **entry) for doc_id, entry in merged.items()]
+    candidates.sort(key=lambda candidate: (-candidate.fused, candidate.doc_id))
+    return candidates
+
+
+def _contains_phrase(tokens, phrase):
+    width = len(phrase)
+    return any(tokens[start:start + width] == phrase for start in range(len(tokens) - width + 1))
+
+
+def cross_score(query_tokens, recipe, lexical=None, semantic=None):
+    """Score a query against one recipe's title and ingredients, in [0, 1]
+
+    Query and recipe are compared directly rather than through independent
+    scores, so "dal makhani" prefers the recipe titled exactly that over
+    other dal recipes that happen to embed nearby.
+    """
+    if not query_tokens:
+        return 0.0
+    title = tokenize(recipe["title"])
+    title_set, query_set = set(title), set(query_tokens)
+    ingredients = set(tokenize(" ".join(recipe.get("ingredients", []))))
+    features = {
+        "title_recall": len(query_set & title_set) / len(query_set),
+        "title_precision": len(query_set & title_set) / len(title_set) if title_set else 0.0,
+        "phrase": 1.0 if _contains_phrase(title, query_tokens) else 0.0,
+        "ingredients": len(query_set & ingredients) / len(query_set),
+        "lexical": lexical or 0.0,
+        "semantic": max(semantic or 0.0, 0.0),
+    }
+    return sum(CROSS_WEIGHTS[name] * value for name, value in features.items())
+
+
+def rerank(query, candidates, recipes, limit, depth, budget_ms):
+    """Hits for the best ``limit`` candidates
+
+    The first ``depth`` fused candidates (or as many as fit in ``budget_ms``)
+    are re-scored with cross_score() and reordered; the rest keep their
+    fused order behind them. A budget of 0 skips re-ranking.
+    """
+    query_tokens = tokenize(query)
+    deadline = time.perf_counter() + budget_ms / 1000
+    scored, rest = [], []
+    for position, candidate in enumerate(candidates[:max(limit, depth)]):
+        recipe = recipes[candidate.doc_id]
+        if position < depth and budget_ms > 0 and time.perf_counter() < deadline:
+            score = cross_score(query_tokens, recipe, candidate.lexical, candidate.semantic)
+            scored.append((score, candidate, True))
+        else:
+            rest.append((max(candidate.lexical or 0.0, candidate.semantic or 0.0), candidate, False))
+    scored.sort(key=lambda item: -item[0])
+    return [
+        Hit(recipes[candidate.doc_id], similarity,
+            [source for source in ("lexical", "semantic") if getattr(candidate, source) is not None], reranked)
+        for similarity, candidate, reranked in (scored + rest)[:limit]
+    ]
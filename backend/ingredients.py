@@ -0,0 +1,225 @@
+"""
+Ingredient normalization: quantities, units, plurals and Hindi names
+"""
+
+import bisect
+import heapq
+import json
+import os
+import re
+
+import numpy as np
+
+from .search_index import PackedLists
+from .transliteration import ascii_fold
+
+QUANTITY_RE = re.compile(r"\([^)]*\)|\d+(?:[./]\d+)?")
+WORD_RE = re.compile(r"[a-z]+")
+
+# Units, sizes and preparation words that say nothing about what the ingredient is
+UNIT_WORDS = frozenset({
+    "g", "gm", "gms", "gram", "kg", "ml", "l", "litre", "liter", "tsp", "teaspoon", "tbsp", "tablespoon",
+    "cup", "inch", "pinch", "bunch", "handful", "piece", "sprig", "clove", "pod", "stick", "few", "some",
+    "small", "medium", "large", "big", "whole", "fresh", "freshly", "finely", "thinly", "roughly",
+    "chopped", "sliced", "diced", "cubed", "grated", "minced", "crushed", "pureed", "boiled", "soaked",
+    "peeled", "floret", "to", "taste", "as", "needed", "for", "of", "a", "an", "and", "or", "optional",
+})
+
+# Singular spelling -> the name an ingredient is indexed under (Hindi and English names meet here)
+INGREDIENT_ALIASES = {
+    "jeera": "cumin", "zeera": "cumin", "cumin seed": "cumin", "jeera seed": "cumin",
+    "aloo": "potato", "alu": "potato", "gobi": "cauliflower", "gobhi": "cauliflower",
+    "palak": "spinach", "methi": "fenugreek", "methi seed": "fenugreek", "fenugreek seed": "fenugreek",
+    "kabuli chana": "chickpea", "chole": "chickpea", "chana": "chickpea",
+    "rajma": "kidney bean", "dahi": "curd", "yogurt": "curd", "yoghurt": "curd", "hung curd": "curd",
+    "haldi": "turmeric", "turmeric powder": "turmeric", "adrak": "ginger", "lehsun": "garlic",
+    "lahsun": "garlic", "pyaz": "onion", "pyaaz": "onion", "kanda": "onion", "tamatar": "tomato",
+    "mirch": "chilli", "chili": "chilli", "green chili": "green chilli", "hari mirch": "green chilli",
+    "basmati rice": "rice", "chawal": "rice", "murgh": "chicken", "capsicum": "bell pepper",
+    "shimla mirch": "bell pepper", "matar": "pea", "mutter": "pea", "green pea": "pea",
+    "dhania": "coriander", "coriander leaf": "coriander", "cilantro": "coriander",
+    "kaju": "cashew", "elaichi": "cardamom", "dalchini": "cinnamon", "tej patta": "bay leaf",
+    "panir": "paneer", "makhan": "butter",
+}
+
+# Words whose final "s" is not a plural, and plurals the suffix rules get wrong
+KEEP_S = frozenset({"hummus", "couscous", "asparagus", "molasses", "swiss"})
+IRREGULAR_PLURALS = {"leaves": "leaf", "halves": "half", "loaves": "loaf", "chillies": "chilli", "chilies": "chilli"}
+
+
+def singular(word):
+    if word in KEEP_S:
+        return word
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(text):
+    """Canonical name of an ingredient line ("2 cups Basmati Rice, washed" -> "rice"), or None"""
+    text = QUANTITY_RE.sub(" ", ascii_fold(text.split(",")[0]))
+    words = [word for word in map(singular, WORD_RE.findall(text)) if word not in UNIT_WORDS]
+    if not words:
+        return None
+    name = " ".join(words)
+    if name in INGREDIENT_ALIASES:
+        return INGREDIENT_ALIASES[name]
+    # "kashmiri haldi" -> turmeric
+    if len(words) > 1 and words[-1] in INGREDIENT_ALIASES:
+        return INGREDIENT_ALIASES[words[-1]]
+    return name
+
+
+def main_ingredient(ingredients):
+    """The recipe's leading ingredient, which recipes list first"""
+    for line in ingredients:
+        name = normalize_ingredient(line)
+        if name:
+            return name
+    return None
+
+
+# Assumed to be in every kitchen, so they neither count towards nor against coverage
+PANTRY_STAPLES = frozenset({"salt", "water", "oil"})
+
+
+def recipe_ingredients(recipe):
+    """Normalized, de-duplicated ingredients of a recipe, staples left out"""
+    names = (normalize_ingredient(line) for line in recipe.get("ingredients", []))
+    return sorted({name for name in names if name and name not in PANTRY_STAPLES})
+
+
+class IngredientIndex:
+    """Inverted index from normalized ingredient to the recipes that use it
+
+    Each posting list holds doc ids in increasing order with the weight
+    1 / (number of ingredients in that recipe), so summing the weights of the
+    ingredients someone has gives the share of a recipe they can cover. The
+    top-k by coverage is found with WAND: each list's largest weight bounds
+    what it can add, and recipes whose bound cannot beat the current k-th
+    best are skipped without being scored.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.upper_bounds = {}
+        self.doc_ingredients = {}
+        self.num_docs = 0
+
+    def __len__(self):
+        return self.num_docs
+
+    def build(self, recipes):
+        for doc_id, recipe in enumerate(recipes):
+            if recipe is not None:
+                self.add(doc_id, recipe)
+        return self
+
+    def add(self, doc_id, recipe):
+        """Index a recipe; doc ids must be added in increasing order"""
+        names = recipe_ingredients(recipe)
+        if not names:
+            return
+        self.doc_ingredients[doc_id] = names
+        self.num_docs += 1
+        weight = 1.0 / len(names)
+        for name in names:
+            doc_ids, weights = self.postings.setdefault(name, ([], []))
+            doc_ids.append(doc_id)
+            weights.append(weight)
+            self.upper_bounds[name] = max(self.upper_bounds.get(name, 0.0), weight)
+
+    def remove(self, doc_id):
+        # Upper bounds are left as they are; a stale bound is looser but still safe
+        names = self.doc_ingredients.pop(doc_id, None)
+        if names is None:
+            return
+        self.num_docs -= 1
+        for name in names:
+            doc_ids, weights = self.postings[name]
+            position = bisect.bisect_left(doc_ids, doc_id)
+            del doc_ids[position], weights[position]
+            if not doc_ids:
+                del self.postings[name], self.upper_bounds[name]
+
+    def copy(self):
+        """Copy that can be patched while this index keeps serving queries"""
+        clone = IngredientIndex()
+        clone.postings = {name: (list(doc_ids), list(weights)) for name, (doc_ids, weights) in self.postings.items()}
+        clone.upper_bounds = dict(self.upper_bounds)
+        clone.doc_ingredients = dict(self.doc_ingredients)
+        clone.num_docs = self.num_docs
+        return clone
+
+    def search(self, ingredients, k=10, allowed=None):
+        """Top k (doc_id, coverage, matched ingredients) for normalized ingredient names, best first"""
+        cursors = []
+        for name in set(ingredients):
+            if name in self.postings:
+                doc_ids, weights = self.postings[name]
+                if isinstance(doc_ids, np.ndarray):
+                    # Packed lists are read out once, as element access on arrays is slow in the loop below
+                    doc_ids, weights = doc_ids.tolist(), weights.tolist()
+                cursors.append([0, name, doc_ids, weights])
+        top = []
+        threshold = 0.0
+        while cursors:
+            cursors.sort(key=lambda cursor: cursor[2][cursor[0]])
+            # Pivot: the first doc id at which the bounds of the lists so far could beat the k-th best
+            bound, pivot = 0.0, None
+            for cursor in cursors:
+                bound += self.upper_bounds[cursor[1]]
+                if bound > threshold:
+                    pivot = cursor[2][cursor[0]]
+                    break
+            if pivot is None:
+                break
+            if cursors[0][2][cursors[0][0]] == pivot:
+                score, matched = 0.0, []
+                for cursor in cursors:
+                    position, name, doc_ids, weights = cursor
+                    if doc_ids[position] != pivot:
+                        break
+                    score += weights[position]
+                    matched.append(name)
+                    cursor[0] += 1
+                if (allowed is None or (pivot < len(allowed) and allowed[pivot])) and score > threshold:
+                    heapq.heappush(top, (score, -pivot, matched))
+                    if len(top) > k:
+                        heapq.heappop(top)
+                    if len(top) == k:
+                        threshold = top[0][0]
+            else:
+                # Nothing before the pivot can make the top k, so jump those lists ahead to it
+                for cursor in cursors:
+                    if cursor[2][cursor[0]] >= pivot:
+                        break
+                    cursor[0] = bisect.bisect_left(cursor[2], pivot, cursor[0])
+            cursors = [cursor for cursor in cursors if cursor[0] < len(cursor[2])]
+        return [(-negated, score, sorted(matched)) for score, negated, matched in sorted(top, reverse=True)]
+
+    def save(self, path):
+        """Write the posting lists in the packed form load() memory-maps"""
+        # Weights stay float64 so the bounds WAND prunes with are exactly the weights they bound
+        PackedLists.pack(self.postings, {"doc_ids": np.int32, "weights": np.float64}).save(path)
+        np.save(os.path.join(path, "upper_bounds.npy"),
+                np.asarray([self.upper_bounds[name] for name in self.postings], dtype=np.float64))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"num_docs": self.num_docs}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved index for search only; it keeps no per-recipe lists, so it cannot be patched"""
+        index = cls()
+        index.postings = PackedLists.load(path, mmap)
+        upper_bounds = np.load(os.path.join(path, "upper_bounds.npy"))
+        index.upper_bounds = dict(zip(index.postings, upper_bounds.tolist()))
+        with open(os.path.join(path, "meta.json")) as f:
+            index.num_docs = json.load(f)["num_docs"]
+        return index
@@ -0,0 +1,199 @@
+"""
+SnapChef FastAPI application
+"""
+
+import asyncio
+import json
+import logging
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from .cache import SearchCache, create_redis
+from .config import settings
+from .models import (
+    LatencyStats,
+    PantrySearchRequest,
+    PantrySearchResponse,
+    PopularRecipesResponse,
+    RecipeSearchRequest,
+    RecipeSearchResponse,
+    RefreshResponse,
+    SuggestResponse,
+    SystemStats,
+)
+from .analytics import SearchAnalytics
+from .embeddings import EmbeddingService, create_encoder
+from .enrichment_store import EnrichmentStore
+from .facets import normalize_filters
+from .popularity import PopularityTracker
+from .rag import RAGService, create_generator
+from .services import RecipeSearchService, WebScrapingService
+from .shared_index import SharedIndex
+from .tracing import ServerTimingMiddleware, SlowRequestProfiler, recorder, stage
+
+logging.basicConfig(level=logging.DEBUG if settings.debug else logging.INFO)
+
+app = FastAPI(title=settings.api_title, version=settings.api_version)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["Server-Timing"],
+)
+profiler = SlowRequestProfiler()
+app.add_middleware(ServerTimingMiddleware, profiler=profiler)
+
+encoder = create_encoder()
+embedding_service = EmbeddingService(encoder) if encoder is not None else None
+redis_client = create_redis()
+search_cache = SearchCache(redis_client)
+enrichment_store = EnrichmentStore(settings.enrichment_store_path)
+rag_service = RAGService(create_generator(), enrichment_store)
+popularity = PopularityTracker(redis_client)
+analytics = SearchAnalytics()
+shared_index = SharedIndex(settings.shared_index_path) if settings.shared_index_path else None
+# The indexes are loaded in the background once the server is up; /health/ready reports when
+search_service = RecipeSearchService(encoder=embedding_service, cache=search_cache, rag=rag_service,
+                                     popularity=popularity, shared=shared_index, load=False,
+                                     analytics=analytics)
+scraping_service = WebScrapingService()
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    popularity.start()
+    analytics.start()
+    search_service.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await search_service.stop()
+    await popularity.stop()
+    await analytics.stop()
+
+
+@app.get("/")
+async def root():
+    return {"service": "snapchef-backend", "version": settings.api_version, "docs": "/docs"}
+
+
+def require_ready():
+    """Dependency of the endpoints that need the indexes: 503 until they are loaded"""
+    if not search_service.ready:
+        raise HTTPException(status_code=503, detail="Search indexes are still loading",
+                            headers={"Retry-After": "1"})
+
+
+@app.get("/health")
+async def health():
+    """Health check endpoint"""
+    return {"status": "healthy", "service": "snapchef-backend", "ready": search_service.ready}
+
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness probe: 200 once searches can be answered, 503 with loading progress until then"""
+    progress = search_service.loading.as_dict()
+    if progress["ready"]:
+        return JSONResponse(progress)
+    return JSONResponse(progress, status_code=503, headers={"Retry-After": "1"})
+
+
+@app.post("/search", response_model=RecipeSearchResponse, dependencies=[Depends(require_ready)])
+async def search_recipes(request: RecipeSearchRequest):
+    """Main recipe search endpoint"""
+    try:
+        response = await search_service.search_async(request.dish_name, request.max_results, request.filters,
+                                                     request.mode, request.rerank_budget_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with stage("serialization"):
+        body = response.model_dump_json()
+    return Response(body, media_type="application/json")
+
+
+@app.post("/search/stream", dependencies=[Depends(require_ready)])
+async def search_recipes_stream(request: RecipeSearchRequest, http_request: Request, format: str = None):
+    """Streaming search: ranked hits first, then each enriched recipe as it completes
+
+    Sends NDJSON by default, or server-sent events with ?format=sse or an
+    Accept: text/event-stream header.
+    """
+    sse = format == "sse" or (format is None and "text/event-stream" in http_request.headers.get("accept", ""))
+    try:
+        # Checked up front, since errors can no longer change the status once streaming starts
+        normalize_filters(request.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        async for event in search_service.search_stream(request.dish_name, request.max_results, request.filters,
+                                                        request.mode, request.rerank_budget_ms):
+            data = json.dumps(event, ensure_ascii=False)
+            yield f"event: {event['event']}\ndata: {data}\n\n" if sse else data + "\n"
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/recipes/by-ingredients", response_model=PantrySearchResponse, dependencies=[Depends(require_ready)])
+async def recipes_by_ingredients(request: PantrySearchRequest):
+    """What can I cook: recipes ranked by how much of them the given ingredients cover"""
+    try:
+        return await asyncio.to_thread(search_service.search_by_ingredients, request.ingredients,
+                                       request.max_results, request.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/suggest", response_model=SuggestResponse, dependencies=[Depends(require_ready)])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=settings.suggest_top_k),
+):
+    """Typeahead completions for a partially typed dish name"""
+    return SuggestResponse(query=q, suggestions=search_service.suggest(q, limit))
+
+
+@app.get("/recipes/popular", response_model=PopularRecipesResponse)
+async def popular_recipes(
+    window: str = Query("all", pattern="^(all|hour|day|week)$"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Popular recipes based on search frequency, all-time or trending over the last hour/day/week"""
+    return PopularRecipesResponse(window=window, recipes=search_service.get_popular_recipes(limit, window))
+
+
+@app.post("/recipes/refresh", response_model=RefreshResponse)
+async def refresh_recipes(scrape: bool = False):
+    """Reload the recipe corpus and re-index it, optionally scraping the sources first"""
+    scrape_stats = await scraping_service.scrape() if scrape else None
+    report = await asyncio.to_thread(search_service.reload)
+    return RefreshResponse(status="refreshed", scrape=scrape_stats, **report)
+
+
+@app.get("/stats", response_model=SystemStats)
+async def stats(minutes: int = Query(60, ge=0, le=settings.analytics_history_minutes)):
+    """System statistics endpoint, with per-minute history for the last ``minutes``"""
+    return search_service.get_stats(minutes)
+
+
+@app.get("/stats/latency", response_model=LatencyStats)
+async def latency_stats():
+    """Latency percentiles per search stage, plus profiles of sampled slow requests"""
+    return LatencyStats(
+        stages=recorder.summary(),
+        slow_requests=profiler.profiles(),
+        profiler_sample_rate=profiler.sample_rate,
+    )
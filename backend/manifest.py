@@ -0,0 +1,138 @@
+"""
+Content fingerprints of indexed recipes, used to re-index only what changed
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Fields fingerprint() reads
+FINGERPRINT_FIELDS = ("title", "ingredients", "steps")
+
+# Recipes to (re-)index, and ids that need nothing or must be dropped
+ChangeSet = namedtuple("ChangeSet", ["added", "updated", "unchanged", "deleted"])
+
+
+def recipe_key(recipe):
+    return recipe.get("id") or recipe["title"]
+
+
+def _normalize(text):
+    return WHITESPACE_RE.sub(" ", str(text)).strip().casefold()
+
+
+def _content_parts(recipe):
+    return [
+        _normalize(recipe.get("title", "")),
+        "\x1f".join(_normalize(item) for item in recipe.get("ingredients") or []),
+        "\x1f".join(_normalize(step) for step in recipe.get("steps") or []),
+    ]
+
+
+def _digest(parts):
+    return hashlib.sha1("\x1e".join(parts).encode("utf-8")).hexdigest()
+
+
+def fingerprint(recipe):
+    """Hash of the recipe's own content: title, ingredients and steps
+
+    Whitespace and case are normalised first so cosmetic edits on the source
+    site do not count as changes. It keys the enrichment store, so a copy
+    joining or leaving a deduplicated recipe does not regenerate it.
+    """
+    return _digest(_content_parts(recipe))
+
+
+def index_fingerprint(recipe):
+    """fingerprint() plus the ids of a deduplicated recipe's alternates
+
+    IndexManifest diffs with it by default, so a copy joining or leaving a
+    recipe re-indexes it.
+    """
+    parts = _content_parts(recipe)
+    if recipe.get("alternates"):
+        parts.append("\x1f".join(alternate["id"] for alternate in recipe["alternates"]))
+    return _digest(parts)
+
+
+def document_fingerprint(recipe):
+    """fingerprint() plus every other field the search document carries
+
+    The Elasticsearch sync diffs with it so an edited rating, diet, cook time,
+    cuisine, course or set of alternates is re-indexed too. Enrichments stay
+    keyed by fingerprint(), so such edits do not regenerate them.
+    """
+    rest = {key: value for key, value in recipe.items() if key not in FINGERPRINT_FIELDS}
+    payload = fingerprint(recipe) + json.dumps(rest, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class IndexManifest:
+    """JSON manifest of recipe id -> index fingerprint plus tombstones for deleted recipes"""
+
+    VERSION = 1
+
+    def __init__(self, path=None, fingerprint=index_fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.documents = {}
+        self.tombstones = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self.documents = data.get("documents", {})
+                    self.tombstones = data.get("tombstones", {})
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable index manifest %s: %s", path, e)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def diff(self, recipes):
+        """Compare a corpus against the manifest"""
+        added, updated, unchanged = [], [], []
+        seen = set()
+        for recipe in recipes:
+            key = recipe_key(recipe)
+            if key in seen:
+                continue
+            seen.add(key)
+            known = self.documents.get(key)
+            if known is None:
+                added.append(recipe)
+            elif known != self.fingerprint(recipe):
+                updated.append(recipe)
+            else:
+                unchanged.append(key)
+        deleted = [key for key in self.documents if key not in seen]
+        return ChangeSet(added, updated, unchanged, deleted)
+
+    def apply(self, changes):
+        """Record a change set as indexed"""
+        now = time.time()
+        for recipe in changes.added + changes.updated:
+            key = recipe_key(recipe)
+            self.documents[key] = self.fingerprint(recipe)
+            self.tombstones.pop(key, None)
+        for key in changes.deleted:
+            self.documents.pop(key, None)
+            self.tombstones[key] = now
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "documents": self.documents, "tombstones": self.tombstones}, f)
+        os.replace(tmp_path, self.path)
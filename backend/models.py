@@ -0,0 +1,160 @@
+"""
+SnapChef API data models
+"""
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class RecipeSearchRequest(BaseModel):
+    """Search parameters"""
+    dish_name: str = Field(..., min_length=1, max_length=200)
+    filters: Optional[Dict[str, Any]] = None
+    max_results: Optional[int] = Field(None, ge=1, le=50)
+    mode: Optional[str] = Field(None, pattern="^(lexical|semantic|hybrid)$")
+    rerank_budget_ms: Optional[float] = Field(None, ge=0, le=1000)
+
+
+class RecipeResult(BaseModel):
+    """Complete recipe information"""
+    id: str
+    title: str
+    source: str
+    url: str
+    description: Optional[str] = None
+    ingredients: List[str] = []
+    steps: List[str] = []
+    tips: List[str] = []
+    nutrition: Optional[Dict[str, Any]] = None
+    cook_time_minutes: Optional[int] = None
+    difficulty: Optional[str] = None
+    rating: Optional[float] = None
+    # The same recipe on other pages, collapsed into this one
+    alternates: List[Dict[str, str]] = []
+    similarity_score: float = 0.0
+    retrieved_by: List[str] = []
+    reranked: bool = False
+
+
+class PantrySearchRequest(BaseModel):
+    """Ingredients on hand"""
+    ingredients: List[str] = Field(..., min_length=1, max_length=50)
+    filters: Optional[Dict[str, Any]] = None
+    max_results: Optional[int] = Field(None, ge=1, le=50)
+
+
+class PantryMatch(BaseModel):
+    """Recipe that can be made, fully or partly, from the given ingredients"""
+    id: str
+    title: str
+    source: str
+    url: str
+    coverage: float
+    matched: List[str] = []
+    missing: List[str] = []
+    cook_time_minutes: Optional[int] = None
+    difficulty: Optional[str] = None
+
+
+class PantrySearchResponse(BaseModel):
+    ingredients: List[str]
+    results: List[PantryMatch]
+    total_found: int
+    search_time_ms: float
+
+
+class RecipeHit(BaseModel):
+    """Ranked search hit, sent before enrichment"""
+    rank: int
+    id: str
+    title: str
+    source: str
+    url: str
+    similarity_score: float
+    retrieved_by: List[str] = []
+    reranked: bool = False
+
+
+class RecipeSearchResponse(BaseModel):
+    """Formatted search results"""
+    query: str
+    results: List[RecipeResult]
+    total_found: int
+    search_time_ms: float
+    cached: bool = False
+    canonical_query: Optional[str] = None
+    facets: Dict[str, Dict[str, int]] = {}
+
+
+class Suggestion(BaseModel):
+    """Typeahead completion for a dish name"""
+    id: str
+    title: str
+    edits: int = 0
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: List[Suggestion]
+
+
+class PopularRecipe(BaseModel):
+    """Trending recipe"""
+    title: str
+    search_count: int
+    last_searched: Optional[str] = None
+
+
+class PopularRecipesResponse(BaseModel):
+    window: str = "all"
+    recipes: List[PopularRecipe]
+
+
+class StageLatency(BaseModel):
+    """Sample count and latency percentiles of one stage"""
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    p999_ms: float
+    max_ms: float
+
+
+class LatencyStats(BaseModel):
+    """Per-stage latency percentiles and captured slow-request profiles"""
+    stages: Dict[str, StageLatency]
+    slow_requests: List[Dict[str, Any]] = []
+    profiler_sample_rate: float = 0.0
+
+
+class RefreshResponse(BaseModel):
+    status: str
+    total_recipes: int
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    duplicates: int = 0
+    scrape: Optional[Dict[str, Any]] = None
+
+
+class StatsMinute(BaseModel):
+    """Search metrics for one minute"""
+    minute: str
+    searches: int
+    cache_hit_rate: float
+    avg_response_time_ms: float
+    p95_response_time_ms: float
+    empty_results: int
+
+
+class SystemStats(BaseModel):
+    """Performance metrics"""
+    total_searches: int
+    total_recipes_indexed: int
+    cache_hit_rate: float
+    avg_response_time_ms: float
+    empty_results: int = 0
+    history: List[StatsMinute] = []
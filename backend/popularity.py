@@ -0,0 +1,281 @@
+"""
+Search popularity: batched Redis counters over all time and sliding windows,
+with top-K sketches as the in-process fallback
+"""
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Window name -> (span in seconds, number of buckets it slides by)
+WINDOWS = {
+    "hour": (3600, 12),
+    "day": (86400, 24),
+    "week": (7 * 86400, 7),
+}
+
+
+class CountMinSketch:
+    """Approximate counts in fixed memory; estimates never undercount"""
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def cells(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[8 * row:8 * row + 8], "little") % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        for row, cell in enumerate(self.cells(key)):
+            self.table[row, cell] += count
+
+    def estimate(self, key, table=None):
+        table = self.table if table is None else table
+        return int(min(table[row, cell] for row, cell in enumerate(self.cells(key))))
+
+    def clear(self):
+        self.table[:] = 0
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: tracks at most k keys, evicting the smallest"""
+
+    def __init__(self, k):
+        self.k = k
+        self.counts = {}
+
+    def add(self, key, count=1):
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.k:
+            self.counts[key] = count
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            # The newcomer inherits the evicted count, so it is never undercounted
+            self.counts[key] = self.counts.pop(victim) + count
+
+    def clear(self):
+        self.counts.clear()
+
+
+class SlidingWindow:
+    """A window of ``buckets`` sub-intervals, each with its own sketch and heavy hitters
+
+    Expired buckets are reset as time moves on, so the window slides by
+    span / buckets. A window's count for a key is the Count-Min estimate over
+    the summed tables of its live buckets.
+    """
+
+    def __init__(self, span, buckets, k, width, depth):
+        self.bucket_span = span / buckets
+        self.buckets = buckets
+        self.slots = [(-1, CountMinSketch(width, depth), SpaceSaving(k)) for _ in range(buckets)]
+
+    def _slot(self, now):
+        index = int(now // self.bucket_span)
+        position = index % self.buckets
+        stamp, sketch, heavy = self.slots[position]
+        if stamp != index:
+            sketch.clear()
+            heavy.clear()
+            self.slots[position] = (index, sketch, heavy)
+        return sketch, heavy
+
+    def add(self, counts, now):
+        sketch, heavy = self._slot(now)
+        for key, count in counts.items():
+            sketch.add(key, count)
+            heavy.add(key, count)
+
+    def top(self, k, now):
+        current = int(now // self.bucket_span)
+        live = [(sketch, heavy) for stamp, sketch, heavy in self.slots if 0 <= current - stamp < self.buckets]
+        if not live:
+            return []
+        table = sum(sketch.table for sketch, _ in live)
+        candidates = set().union(*(heavy.counts for _, heavy in live))
+        estimate = live[0][0].estimate
+        return heapq.nlargest(k, ((key, estimate(key, table)) for key in candidates), key=lambda item: item[1])
+
+
+class PopularityTracker:
+    """Popularity counters that cost no Redis round trip per search
+
+    record() only bumps an in-process counter. flush() (run every
+    ``flush_interval`` seconds by start()) writes the batch to Redis in one
+    pipeline, shared by every worker: a ZINCRBY per title on the all-time
+    sorted set and on the current bucket of each hour/day/week window, and
+    the last-searched time in hashes sharded by title. The same pipeline
+    reads back the all-time top K and each window's top K, from a ZUNIONSTORE
+    of its live buckets. A bucket key expires once it has slid out of its
+    window. Counts that fail to reach Redis are kept and sent with the next
+    flush. Without Redis, or while it is unreachable, windows are ranked from
+    this process's own sketches. Each flush re-ranks every window, so top()
+    is a slice of a precomputed list.
+    """
+
+    def __init__(self, redis=None, namespace="popular", shards=None, top_k=None, flush_interval=None,
+                 sketch_width=None, sketch_depth=None):
+        self.redis = redis
+        self.namespace = namespace
+        self.shards = shards or settings.popularity_shards
+        self.top_k = top_k or settings.popularity_top_k
+        self.flush_interval = flush_interval or settings.popularity_flush_interval
+        width = sketch_width or settings.popularity_sketch_width
+        depth = sketch_depth or settings.popularity_sketch_depth
+        self.windows = {
+            name: SlidingWindow(span, buckets, self.top_k, width, depth)
+            for name, (span, buckets) in WINDOWS.items()
+        }
+
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._last_seen = {}
+        # Everything recorded by this process, used without (or while unable to reach) Redis
+        self._local_totals = Counter()
+        self._local_last = {}
+        # Counts not yet written to Redis because a flush failed
+        self._backlog = Counter()
+        self._backlog_last = {}
+        self._ranked = {name: [] for name in ("all", *WINDOWS)}
+        self._task = None
+        self.counters = {"recorded": 0, "flushes": 0, "redis_errors": 0}
+
+    def _shard(self, title):
+        return zlib.crc32(title.encode("utf-8")) % self.shards
+
+    def _bucket_keys(self, window, now):
+        """Redis keys of a window's live buckets, current first"""
+        span, buckets = WINDOWS[window]
+        current = int(now // (span / buckets))
+        return [f"{self.namespace}:{window}:{index}" for index in range(current, current - buckets, -1)]
+
+    def record(self, title, now=None):
+        with self._lock:
+            self._pending[title] += 1
+            self._last_seen[title] = now or time.time()
+            self.counters["recorded"] += 1
+
+    def _drain(self, now=None, rerank=True):
+        """Fold pending counts into the sketches and re-rank the windows; returns the batch"""
+        now = now or time.time()
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+            last_seen, self._last_seen = self._last_seen, {}
+        if batch:
+            for window in self.windows.values():
+                window.add(batch, now)
+            self._local_totals.update(batch)
+            self._local_last.update(last_seen)
+        if batch or rerank:
+            for name, window in self.windows.items():
+                self._ranked[name] = [
+                    (title, count, self._local_last.get(title)) for title, count in window.top(self.top_k, now)
+                ]
+        return batch, last_seen
+
+    async def flush(self, now=None):
+        now = now or time.time()
+        batch, last_seen = self._drain(now)
+        self.counters["flushes"] += 1
+        if self.redis is None:
+            self._rank_local()
+            return
+        self._backlog.update(batch)
+        self._backlog_last.update(last_seen)
+        try:
+            # MULTI/EXEC: a flush that fails applies none of its increments, so the backlog
+            # retried by the next one is counted exactly once
+            pipe = self.redis.pipeline(transaction=True)
+            buckets = {window: self._bucket_keys(window, now) for window in WINDOWS}
+            for title, count in self._backlog.items():
+                pipe.zincrby(f"{self.namespace}:all", count, title)
+                pipe.hset(f"{self.namespace}:last:{self._shard(title)}", title, str(self._backlog_last[title]))
+                for keys in buckets.values():
+                    pipe.zincrby(keys[0], count, title)
+            if self._backlog:
+                for window, (span, slots) in WINDOWS.items():
+                    pipe.expire(buckets[window][0], int(span + span / slots))
+            pipe.zrevrange(f"{self.namespace}:all", 0, self.top_k - 1, withscores=True)
+            for window, keys in buckets.items():
+                pipe.zunionstore(f"{self.namespace}:{window}:top", keys)
+                pipe.zrevrange(f"{self.namespace}:{window}:top", 0, self.top_k - 1, withscores=True)
+            results = await pipe.execute()
+            self._backlog, self._backlog_last = Counter(), {}
+            reads = results[-(1 + 2 * len(WINDOWS)):]
+            tops = {"all": reads[0]}
+            tops.update((window, reads[2 + 2 * i]) for i, window in enumerate(WINDOWS))
+            tops = {name: [(_decode(title), int(score)) for title, score in top] for name, top in tops.items()}
+
+            titles = list({title for top in tops.values() for title, _ in top})
+            pipe = self.redis.pipeline(transaction=False)
+            for title in titles:
+                pipe.hget(f"{self.namespace}:last:{self._shard(title)}", title)
+            stamps = dict(zip(titles, await pipe.execute())) if titles else {}
+            for name, top in tops.items():
+                self._ranked[name] = [
+                    (title, count, float(stamps[title]) if stamps.get(title) else None) for title, count in top
+                ]
+        except Exception as e:
+            logger.warning("Popularity flush to Redis failed: %s", e)
+            self.counters["redis_errors"] += 1
+            self._rank_local()
+
+    def _rank_local(self):
+        self._ranked["all"] = [
+            (title, count, self._local_last.get(title)) for title, count in self._local_totals.most_common(self.top_k)
+        ]
+
+    def top(self, window="all", limit=10):
+        """Ranked (title, count, last_searched_timestamp) tuples for a window"""
+        if window not in self._ranked:
+            raise ValueError(f"Unknown popularity window: {window}")
+        if self._task is None:
+            # No background flusher (e.g. a sync caller), so fold pending counts in now
+            self._drain(rerank=False)
+            self._rank_local()
+        return self._ranked[window][:limit]
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Popularity flush failed")
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {**self.counters, "pending": sum(self._pending.values()), "backlog": sum(self._backlog.values())}
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def format_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
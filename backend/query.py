@@ -0,0 +1,276 @@
+"""
+Query canonicalization: folding, filler-word stripping, spelling correction and synonyms
+"""
+
+import json
+import os
+import threading
+import zlib
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from .search_index import STOP_WORDS, TOKEN_RE
+from .transliteration import DISH_ALIASES, ascii_fold, transliteration_key
+
+# Words people wrap dish names in that never change which recipe they want
+QUERY_STOP_WORDS = STOP_WORDS | {
+    "recipe", "recipes", "how", "make", "making", "cook", "cooking", "prepare",
+    "easy", "best", "simple", "quick", "homemade", "style", "way", "ways",
+}
+
+# Alias (one or more words) -> the name used in recipe titles
+SYNONYMS = {
+    tuple(alias.split()): canonical
+    for canonical, aliases in DISH_ALIASES.items()
+    for alias in aliases
+}
+MAX_SYNONYM_WORDS = max(len(words) for words in SYNONYMS)
+
+
+def vocabulary_words(recipe):
+    """Words of a recipe that queries are corrected towards"""
+    text = " ".join([recipe["title"], *recipe.get("ingredients", [])])
+    return [word for word in TOKEN_RE.findall(ascii_fold(text)) if word not in QUERY_STOP_WORDS]
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment) distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], previous2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        previous2, previous = previous, row
+    return previous[-1]
+
+
+def delete_hash(delete):
+    """Stable 64-bit hash of a delete string (str hashes differ between processes)"""
+    data = delete.encode("utf-8")
+    return zlib.crc32(data) << 32 | zlib.adler32(data)
+
+
+class SpellCorrector:
+    """SymSpell-style correction against a word list
+
+    Every vocabulary word is indexed under all strings reachable by deleting
+    up to ``max_edits`` characters from it. A misspelling shares at least one
+    such delete with every word within ``max_edits`` edits, so a lookup is a
+    few dictionary probes plus exact distance checks on the candidates.
+    """
+
+    def __init__(self, max_edits=2):
+        self.max_edits = max_edits
+        self.counts = Counter()
+        self.deletes = {}
+
+    def _deletes(self, word, edits):
+        found, frontier = {word}, {word}
+        for _ in range(edits):
+            frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+            found |= frontier
+        return found
+
+    def add(self, word, count=1):
+        if not self.counts[word]:
+            for delete in self._deletes(word, self.max_edits):
+                self.deletes.setdefault(delete, set()).add(word)
+        self.counts[word] += count
+
+    def remove(self, word, count=1):
+        self.counts[word] -= count
+        if self.counts[word] > 0:
+            return
+        del self.counts[word]
+        for delete in self._deletes(word, self.max_edits):
+            words = self.deletes.get(delete)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.deletes[delete]
+
+    def correct(self, word, max_edits=None):
+        """Closest, then most frequent, known word within ``max_edits``; None if there is none"""
+        max_edits = self.max_edits if max_edits is None else min(max_edits, self.max_edits)
+        if word in self.counts:
+            return word
+        best = None
+        for candidate in self._candidates(self._deletes(word, max_edits)):
+            distance = edit_distance(word, candidate, max_edits)
+            if distance <= max_edits:
+                rank = (distance, -self.counts[candidate], candidate)
+                if best is None or rank < best:
+                    best = rank
+        return best[2] if best else None
+
+    def _candidates(self, deletes):
+        return {candidate for delete in deletes for candidate in self.deletes.get(delete, ())}
+
+    def save(self, path):
+        """Write the words and a delete table sorted by delete_hash() that PackedSpellCorrector maps"""
+        os.makedirs(path, exist_ok=True)
+        words = list(self.counts)
+        word_ids = {word: word_id for word_id, word in enumerate(words)}
+        hashes, ids = [], []
+        for delete, found in self.deletes.items():
+            hashed = delete_hash(delete)
+            for word in found:
+                hashes.append(hashed)
+                ids.append(word_ids[word])
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        np.save(os.path.join(path, "delete_hashes.npy"), hashes[order])
+        np.save(os.path.join(path, "delete_words.npy"), np.asarray(ids, dtype=np.int32)[order])
+        with open(os.path.join(path, "words.json"), "w", encoding="utf-8") as f:
+            json.dump({"max_edits": self.max_edits, "words": words, "counts": [self.counts[word] for word in words]},
+                      f, ensure_ascii=False)
+
+
+class PackedSpellCorrector(SpellCorrector):
+    """Read-only SpellCorrector over the memory-mapped delete table SpellCorrector.save() wrote
+
+    Candidates come from a binary search of the table for the hashes of the
+    misspelling's deletes. A hash collision only adds a candidate, which the
+    distance check then rejects.
+    """
+
+    def __init__(self, words, counts, hashes, word_ids, max_edits=2):
+        super().__init__(max_edits)
+        self.words = words
+        self.counts = Counter(dict(zip(words, counts)))
+        self.hashes = hashes
+        self.word_ids = word_ids
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "words.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        return cls(meta["words"], meta["counts"], np.load(os.path.join(path, "delete_hashes.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "delete_words.npy"), mmap_mode=mode), meta["max_edits"])
+
+    def _candidates(self, deletes):
+        hashes = np.asarray([delete_hash(delete) for delete in deletes], dtype=np.uint64)
+        starts = np.searchsorted(self.hashes, hashes, side="left")
+        ends = np.searchsorted(self.hashes, hashes, side="right")
+        return {self.words[word_id] for start, end in zip(starts, ends) for word_id in self.word_ids[start:end].tolist()}
+
+    def add(self, word, count=1):
+        raise TypeError("PackedSpellCorrector is read-only")
+
+    remove = add
+
+
+class QueryCanonicalizer:
+    """Rewrites equivalent queries to one canonical string
+
+    "Chicken Biriyani Recipe", "chicken biryani" and "murgh biryani" all
+    become "chicken biryani": the query is Unicode- and case-folded, filler
+    words are dropped, Hindi/English aliases are mapped to the name used in
+    titles (if the corpus uses it at all), and words the corpus does not
+    know are replaced by a corpus word with the same transliteration key or,
+    failing that, the nearest one by edit distance. The vocabulary is
+    patched with update() as recipes change.
+    """
+
+    def __init__(self, max_edits=2, cache_size=4096):
+        self.spelling = SpellCorrector(max_edits)
+        self.cache_size = cache_size
+        self._by_key = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, path):
+        self.spelling.save(path)
+        with open(os.path.join(path, "transliterations.json"), "w", encoding="utf-8") as f:
+            json.dump({key: sorted(words) for key, words in self._by_key.items()}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=True, cache_size=4096):
+        """Open a saved vocabulary read-only; it cannot be update()d"""
+        canonicalizer = cls(cache_size=cache_size)
+        canonicalizer.spelling = PackedSpellCorrector.load(path, mmap)
+        with open(os.path.join(path, "transliterations.json"), encoding="utf-8") as f:
+            canonicalizer._by_key = {key: set(words) for key, words in json.load(f).items()}
+        return canonicalizer
+
+    def build(self, recipes):
+        with self._lock:
+            self.spelling = SpellCorrector(self.spelling.max_edits)
+            self._by_key = {}
+            self._update(recipes, ())
+
+    def update(self, added=(), removed=()):
+        with self._lock:
+            self._update(added, removed)
+
+    def _update(self, added, removed):
+        for recipe in removed:
+            for word, count in Counter(vocabulary_words(recipe)).items():
+                self.spelling.remove(word, count)
+                if word not in self.spelling.counts:
+                    key = transliteration_key(word)
+                    self._by_key[key].discard(word)
+                    if not self._by_key[key]:
+                        del self._by_key[key]
+        for recipe in added:
+            for word, count in Counter(vocabulary_words(recipe)).items():
+                self.spelling.add(word, count)
+                self._by_key.setdefault(transliteration_key(word), set()).add(word)
+        self._cache.clear()
+
+    def _correct(self, word):
+        if word in self.spelling.counts or len(word) < 4:
+            return word
+        variants = self._by_key.get(transliteration_key(word))
+        if variants:
+            return max(variants, key=lambda variant: (self.spelling.counts[variant], variant))
+        return self.spelling.correct(word, 1 if len(word) < 8 else 2) or word
+
+    def _synonym(self, words):
+        canonical = SYNONYMS.get(words)
+        return canonical if canonical in self.spelling.counts else None
+
+    def canonicalize(self, query):
+        with self._lock:
+            canonical = self._cache.get(query)
+            if canonical is not None:
+                self._cache.move_to_end(query)
+                return canonical
+
+            words = TOKEN_RE.findall(ascii_fold(query))
+            # Map multi-word aliases first ("cottage cheese" -> paneer), then fix spelling
+            mapped, position = [], 0
+            while position < len(words):
+                for size in range(min(MAX_SYNONYM_WORDS, len(words) - position), 0, -1):
+                    canonical_word = self._synonym(tuple(words[position:position + size]))
+                    if canonical_word is not None:
+                        mapped.append(canonical_word)
+                        position += size
+                        break
+                else:
+                    mapped.append(words[position])
+                    position += 1
+            canonical_words = []
+            for word in mapped:
+                if word in QUERY_STOP_WORDS:
+                    continue
+                word = self._correct(word)
+                word = self._synonym((word,)) or word
+                if word not in canonical_words:
+                    canonical_words.append(word)
+            # A query of nothing but filler words is searched as typed
+            canonical = " ".join(canonical_words) or " ".join(words) or query.strip()
+
+            self._cache[query] = canonical
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return canonical
@@ -0,0 +1,191 @@
+"""
+Recipe enrichment with a hosted LLM
+"""
+
+import asyncio
+import json
+import logging
+import re
+
+from .config import settings
+from .manifest import fingerprint, recipe_key
+
+logger = logging.getLogger(__name__)
+
+# Fields the LLM may fill in when a source page did not provide them
+ENRICHED_FIELDS = ("ingredients", "steps", "tips", "nutrition")
+
+
+def missing_fields(recipe):
+    return [field for field in ENRICHED_FIELDS if not recipe.get(field)]
+
+
+def build_prompt(recipe, fields):
+    known = {
+        "title": recipe["title"],
+        "description": recipe.get("description"),
+        "ingredients": recipe.get("ingredients") or None,
+        "steps": recipe.get("steps") or None,
+    }
+    known = {key: value for key, value in known.items() if value}
+    return (
+        "You are a helpful Indian cooking assistant. Given this recipe:\n"
+        f"{json.dumps(known, ensure_ascii=False)}\n"
+        f"Return only a JSON object with the keys {', '.join(fields)}. "
+        "ingredients, steps and tips are lists of short strings; nutrition is an object "
+        "such as {\"calories\": \"350 kcal\", \"protein\": \"12 g\"}.\nJSON:"
+    )
+
+
+def parse_generation(text, fields):
+    """Pull the requested fields out of the model output, dropping anything malformed"""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    parsed = {}
+    for field in fields:
+        value = data.get(field)
+        if field == "nutrition":
+            if isinstance(value, dict) and value:
+                parsed[field] = {str(k): v for k, v in value.items() if isinstance(v, (str, int, float))}
+        elif isinstance(value, list):
+            items = [str(item).strip() for item in value if str(item).strip()]
+            if items:
+                parsed[field] = items
+    return parsed
+
+
+class HuggingFaceGenerator:
+    """Text generation through the Hugging Face Inference API"""
+
+    API_URL = "https://api-inference.huggingface.co/models/{model}"
+
+    def __init__(self, model_name=None, api_key=None, timeout=None, max_new_tokens=512):
+        self.model_name = model_name or settings.llm_model
+        self.name = self.model_name
+        self.url = self.API_URL.format(model=self.model_name)
+        self.headers = {"Authorization": f"Bearer {api_key or settings.huggingface_api_key}"}
+        self.timeout = timeout or settings.enrichment_timeout
+        self.max_new_tokens = max_new_tokens
+        self._client = None
+
+    async def generate(self, prompt):
+        import httpx
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, headers=self.headers)
+        response = await self._client.post(self.url, json={
+            "inputs": prompt,
+            "parameters": {"max_new_tokens": self.max_new_tokens, "return_full_text": False, "temperature": 0.2},
+            "options": {"wait_for_model": True},
+        })
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, list):
+            data = data[0] if data else {}
+        return data.get("generated_text", "")
+
+
+class StubGenerator:
+    """Deterministic offline generator for tests and local runs"""
+
+    name = "stub"
+    TITLE_RE = re.compile(r'"title": "((?:[^"\\]|\\.)*)"')
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, prompt):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        match = self.TITLE_RE.search(prompt)
+        title = json.loads(f'"{match.group(1)}"') if match else "this dish"
+        return json.dumps({
+            "ingredients": [f"500 g main ingredient for {title}", "1 tbsp oil", "1 tsp salt"],
+            "steps": [f"Prepare the ingredients for {title}.", "Cook until done.", "Serve hot."],
+            "tips": [f"{title} tastes best freshly made."],
+            "nutrition": {"calories": "300 kcal"},
+        })
+
+
+def create_generator(backend=None):
+    """Generator for the ENRICHMENT_BACKEND setting, or None when enrichment is disabled"""
+    backend = (backend or settings.enrichment_backend).lower()
+    if backend == "none":
+        return None
+    if backend == "stub":
+        return StubGenerator()
+    if backend == "huggingface":
+        return HuggingFaceGenerator()
+    raise ValueError(f"Unknown ENRICHMENT_BACKEND: {backend}")
+
+
+class RAGService:
+    """Creates enhanced recipe details using LLM
+
+    Only fields the recipe is missing are generated, and recipes that are
+    complete skip the model entirely. With an EnrichmentStore, details are
+    looked up by content hash first (the pipeline precomputes them), so the
+    model only runs for recipe versions nobody has enriched yet, and its
+    output is stored for next time. Without a generator, store misses are
+    returned as they are. Store reads and writes run in worker threads, so
+    SQLite never blocks the event loop. At most ``concurrency`` generations
+    run at once; a failed or unparseable generation leaves the recipe as it
+    was.
+    """
+
+    def __init__(self, generator=None, store=None, concurrency=None):
+        self.generator = generator
+        self.store = store
+        self.concurrency = concurrency or settings.enrichment_concurrency
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self.store_hits = 0
+        self.enriched = 0
+        self.skipped = 0
+        self.failed = 0
+
+    async def enrich(self, recipe):
+        """Recipe dict with any missing details filled in"""
+        fields = missing_fields(recipe)
+        if not fields:
+            self.skipped += 1
+            return recipe
+
+        content_hash = None
+        if self.store is not None:
+            content_hash = fingerprint(recipe)
+            stored = await asyncio.to_thread(self.store.get, content_hash)
+            if stored is not None:
+                self.store_hits += 1
+                return {**recipe, **{field: stored[field] for field in fields if field in stored}}
+        if self.generator is None:
+            self.skipped += 1
+            return recipe
+
+        async with self._slots:
+            try:
+                text = await self.generator.generate(build_prompt(recipe, fields))
+            except Exception as e:
+                logger.warning("Enriching %r failed: %s", recipe["title"], e)
+                self.failed += 1
+                return recipe
+        generated = parse_generation(text, fields)
+        if not generated:
+            self.failed += 1
+            return recipe
+        self.enriched += 1
+        if content_hash is not None:
+            await asyncio.to_thread(self.store.put, content_hash, recipe_key(recipe), generated,
+                                    getattr(self.generator, "name", None))
+        return {**recipe, **generated}
+
+    def stats(self):
+        return {"store_hits": self.store_hits, "enriched": self.enriched, "skipped": self.skipped,
+                "failed": self.failed, "concurrency": self.concurrency}
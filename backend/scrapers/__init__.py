@@ -0,0 +1,43 @@
+"""
+Recipe scrapers for the supported sources
+"""
+
+from urllib.parse import urlparse
+
+from .archanas_kitchen import ArchanasKitchenScraper
+from .base import BaseScraper
+from .engine import CrawlEngine, TokenBucket
+from .frontier import FrontierStore
+from .hebbars_kitchen import HebbarsKitchenScraper
+from .indian_healthy_recipes import IndianHealthyRecipesScraper
+
+SCRAPERS_BY_HOST = {
+    "hebbarskitchen.com": HebbarsKitchenScraper,
+    "www.archanaskitchen.com": ArchanasKitchenScraper,
+    "www.indianhealthyrecipes.com": IndianHealthyRecipesScraper,
+}
+
+
+def create_scrapers(sources):
+    """One scraper per source URL; unknown hosts get the generic JSON-LD scraper"""
+    scrapers = []
+    for url in sources:
+        host = urlparse(url).netloc
+        scraper_class = SCRAPERS_BY_HOST.get(host) or SCRAPERS_BY_HOST.get(host.removeprefix("www.")) or BaseScraper
+        scraper = scraper_class(url)
+        if scraper_class is BaseScraper:
+            scraper.name = host
+        scrapers.append(scraper)
+    return scrapers
+
+
+__all__ = [
+    "ArchanasKitchenScraper",
+    "BaseScraper",
+    "CrawlEngine",
+    "FrontierStore",
+    "HebbarsKitchenScraper",
+    "IndianHealthyRecipesScraper",
+    "TokenBucket",
+    "create_scrapers",
+]
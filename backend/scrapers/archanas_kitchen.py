@@ -0,0 +1,16 @@
+"""
+Archana's Kitchen scraper
+"""
+
+from urllib.parse import urlparse
+
+from .base import BaseScraper
+
+
+class ArchanasKitchenScraper(BaseScraper):
+    name = "Archana's Kitchen"
+
+    def is_recipe_url(self, url):
+        # Recipes live under slugs ending in -recipe (optionally below /recipes/)
+        path = urlparse(url).path.strip("/")
+        return path.rsplit("/", 1)[-1].endswith("recipe")
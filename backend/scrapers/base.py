@@ -0,0 +1,170 @@
+"""
+Base scraper with common functionality
+
+Recipe pages on all supported sites embed a schema.org Recipe as JSON-LD, so
+parsing is shared here and source scrapers only decide which URLs to crawl.
+"""
+
+import json
+import re
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+DURATION_RE = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?")
+
+SKIP_PATH_RE = re.compile(
+    r"/(wp-admin|wp-content|wp-json|wp-login|feed|tag|author|comments?|cart|account|search)(/|$)"
+    r"|\.(jpe?g|png|gif|webp|svg|pdf|zip|mp4|css|js|xml)$",
+    re.IGNORECASE,
+)
+
+DIET_MAP = {
+    "VegetarianDiet": "vegetarian",
+    "VeganDiet": "vegan",
+}
+
+
+def parse_duration_minutes(value):
+    """Minutes in an ISO 8601 duration such as PT1H30M"""
+    if not value or not isinstance(value, str):
+        return None
+    match = DURATION_RE.fullmatch(value.strip())
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _text(value):
+    if isinstance(value, dict):
+        value = value.get("text") or value.get("name") or ""
+    return BeautifulSoup(str(value), "html.parser").get_text(" ", strip=True)
+
+
+def _instructions(value):
+    steps = []
+    for item in _as_list(value):
+        if isinstance(item, dict) and item.get("@type") == "HowToSection":
+            steps.extend(_instructions(item.get("itemListElement")))
+        elif isinstance(item, str) and "\n" in item:
+            steps.extend(line.strip() for line in item.splitlines() if line.strip())
+        else:
+            text = _text(item)
+            if text:
+                steps.append(text)
+    return steps
+
+
+def _find_recipe(node):
+    """Depth-first search for a schema.org Recipe object in parsed JSON-LD"""
+    if isinstance(node, list):
+        for item in node:
+            found = _find_recipe(item)
+            if found:
+                return found
+    elif isinstance(node, dict):
+        types = _as_list(node.get("@type"))
+        if "Recipe" in types:
+            return node
+        for key in ("@graph", "mainEntity"):
+            if key in node:
+                found = _find_recipe(node[key])
+                if found:
+                    return found
+    return None
+
+
+class BaseScraper:
+    """Generic JSON-LD recipe scraper; also used for sources without a dedicated scraper"""
+
+    name = "Recipe Website"
+
+    def __init__(self, base_url):
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.host = urlparse(self.base_url).netloc
+
+    @property
+    def start_urls(self):
+        return [self.base_url]
+
+    def is_recipe_url(self, url):
+        """Whether a URL is worth parsing for a recipe"""
+        return True
+
+    def should_follow(self, url):
+        """Whether a discovered link belongs in the crawl frontier"""
+        parsed = urlparse(url)
+        return (
+            parsed.scheme in ("http", "https")
+            and parsed.netloc == self.host
+            and not parsed.query
+            and not SKIP_PATH_RE.search(parsed.path)
+        )
+
+    def extract_links(self, html, page_url):
+        soup = BeautifulSoup(html, "html.parser")
+        links = set()
+        for anchor in soup.find_all("a", href=True):
+            url = urldefrag(urljoin(page_url, anchor["href"]))[0]
+            if self.should_follow(url):
+                links.add(url)
+        return links
+
+    def parse_recipe(self, html, page_url):
+        """Recipe dict in the corpus format, or None if the page has no recipe"""
+        if not self.is_recipe_url(page_url):
+            return None
+        soup = BeautifulSoup(html, "html.parser")
+        recipe = None
+        for script in soup.find_all("script", type="application/ld+json"):
+            try:
+                recipe = _find_recipe(json.loads(script.string or ""))
+            except json.JSONDecodeError:
+                continue
+            if recipe:
+                break
+        if not recipe or not recipe.get("name"):
+            return None
+
+        rating = recipe.get("aggregateRating") or {}
+        nutrition = recipe.get("nutrition") or {}
+        diets = [DIET_MAP.get(str(d).rsplit("/", 1)[-1]) for d in _as_list(recipe.get("suitableForDiet"))]
+        image = _as_list(recipe.get("image"))
+        image = image[0] if image else None
+        if isinstance(image, dict):
+            image = image.get("url")
+
+        try:
+            rating_value = round(float(rating.get("ratingValue")), 2) if rating.get("ratingValue") else None
+        except (TypeError, ValueError):
+            rating_value = None
+
+        return {
+            "id": self.recipe_id(page_url),
+            "title": _text(recipe["name"]),
+            "source": self.name,
+            "url": page_url,
+            "description": _text(recipe.get("description") or "") or None,
+            "diet": next((d for d in diets if d), None),
+            "cuisine": ", ".join(_text(c) for c in _as_list(recipe.get("recipeCuisine"))) or None,
+            "course": ", ".join(_text(c) for c in _as_list(recipe.get("recipeCategory"))) or None,
+            "cook_time_minutes": parse_duration_minutes(recipe.get("totalTime") or recipe.get("cookTime")),
+            "rating": rating_value,
+            "image_url": image,
+            "ingredients": [_text(i) for i in _as_list(recipe.get("recipeIngredient")) if _text(i)],
+            "steps": _instructions(recipe.get("recipeInstructions")),
+            "tips": [],
+            "nutrition": {k: v for k, v in nutrition.items() if not k.startswith("@")} or None,
+        }
+
+    def recipe_id(self, url):
+        slug = urlparse(url).path.strip("/").replace("/", "-") or "index"
+        prefix = "".join(word[0] for word in re.findall(r"[A-Za-z]+", self.name)).lower() or "web"
+        return f"{prefix}-{slug}"
@@ -0,0 +1,208 @@
+"""
+Asynchronous crawl engine shared by all recipe scrapers
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+USER_AGENT = "SnapChefBot/1.0 (+https://github.com/snapchef)"
+
+
+class RetryableStatus(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average with bursts of up to ``burst``"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CrawlEngine:
+    """Crawls every source concurrently with per-host connection pools and rate limits
+
+    Fetches are conditional GETs using the ETag/Last-Modified stored in the
+    frontier; a 304 or an unchanged body hash skips parsing entirely. Each
+    parsed recipe is passed to ``on_recipe``. Frontier reads and writes run
+    in worker threads so SQLite never blocks the event loop.
+    """
+
+    def __init__(self, scrapers, frontier, concurrency=8, connections_per_host=2,
+                 requests_per_second=None, burst=2, timeout=None, max_retries=None,
+                 max_pages=500, max_depth=3):
+        self.scrapers = {scraper.name: scraper for scraper in scrapers}
+        self.frontier = frontier
+        self.concurrency = concurrency
+        self.connections_per_host = connections_per_host
+        if requests_per_second is None:
+            requests_per_second = 1.0 / settings.delay_between_requests if settings.delay_between_requests else 10.0
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.timeout = timeout or settings.request_timeout
+        self.max_retries = settings.max_retries if max_retries is None else max_retries
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+
+        self._buckets = {}
+        self._reserved = 0
+        self.stats = {}
+
+    def _bucket(self, url):
+        host = urlparse(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+        return self._buckets[host]
+
+    async def crawl(self, on_recipe):
+        """Run (or resume) a crawl pass; returns the pass statistics"""
+        self.stats = {
+            "fetched": 0, "not_modified": 0, "unchanged": 0, "recipes": 0,
+            "links_added": 0, "retries": 0, "failed": 0,
+        }
+        self._reserved = 0
+        if not await asyncio.to_thread(self.frontier.pending, 1):
+            await asyncio.to_thread(self.frontier.start_pass)
+        for scraper in self.scrapers.values():
+            await asyncio.to_thread(self.frontier.add, scraper.start_urls, scraper.name, 0)
+
+        queue = asyncio.Queue()
+        for row in await asyncio.to_thread(self.frontier.pending):
+            if row[1] in self.scrapers:
+                queue.put_nowait(row)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.connections_per_host,
+                                         ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": USER_AGENT}) as session:
+            workers = [
+                asyncio.create_task(self._worker(session, queue, on_recipe))
+                for _ in range(self.concurrency)
+            ]
+            try:
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        self.stats["frontier"] = await asyncio.to_thread(self.frontier.counts)
+        return self.stats
+
+    async def _worker(self, session, queue, on_recipe):
+        while True:
+            url, source, depth = await queue.get()
+            try:
+                # Past the page budget the rest stays pending for the next run
+                if self._reserve_page():
+                    await self._process(session, queue, url, self.scrapers[source], depth, on_recipe)
+            except Exception as e:
+                logger.warning("Crawling %s failed: %s", url, e)
+                self.stats["failed"] += 1
+                await asyncio.to_thread(self.frontier.mark_failed, url)
+            finally:
+                queue.task_done()
+
+    def _reserve_page(self):
+        """Take a page from the budget before fetching; False once it is spent
+
+        Check and take happen with no await in between, so concurrent workers
+        cannot all pass the check while their fetches are still in flight.
+        """
+        if self._reserved >= self.max_pages:
+            return False
+        self._reserved += 1
+        return True
+
+    async def _process(self, session, queue, url, scraper, depth, on_recipe):
+        etag, last_modified, old_hash = await asyncio.to_thread(self.frontier.validators, url)
+        status, body, headers = await self._fetch(session, url, etag, last_modified)
+
+        if status == 304:
+            self.stats["not_modified"] += 1
+            await asyncio.to_thread(self.frontier.mark_done, url)
+            return
+        if status != 200 or body is None:
+            self.stats["failed"] += 1
+            await asyncio.to_thread(self.frontier.mark_failed, url)
+            return
+
+        self.stats["fetched"] += 1
+        content_hash = hashlib.sha1(body.encode("utf-8", "replace")).hexdigest()
+        new_etag, new_last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if content_hash == old_hash:
+            self.stats["unchanged"] += 1
+            await asyncio.to_thread(self.frontier.mark_done, url, new_etag, new_last_modified)
+            return
+
+        recipe = scraper.parse_recipe(body, url)
+        if recipe:
+            self.stats["recipes"] += 1
+            on_recipe(recipe)
+
+        if depth < self.max_depth:
+            links = scraper.extract_links(body, url)
+            added = await asyncio.to_thread(self.frontier.add, sorted(links), scraper.name, depth + 1)
+            self.stats["links_added"] += len(added)
+            for link in added:
+                queue.put_nowait((link, scraper.name, depth + 1))
+
+        await asyncio.to_thread(self.frontier.mark_done, url, new_etag, new_last_modified, content_hash)
+
+    async def _fetch(self, session, url, etag, last_modified):
+        """Conditional GET with retries; returns (status, body, headers)"""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        for attempt in range(self.max_retries + 1):
+            await self._bucket(url).acquire()
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status in RETRY_STATUSES:
+                        raise RetryableStatus(response.status, response.headers.get("Retry-After"))
+                    if response.status != 200:
+                        return response.status, None, response.headers
+                    if "html" not in response.headers.get("Content-Type", "text/html"):
+                        return response.status, None, response.headers
+                    return response.status, await response.text(errors="replace"), response.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus) as e:
+                if attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                delay = 0.5 * 2 ** attempt * random.uniform(0.5, 1.5)
+                if isinstance(e, RetryableStatus) and (e.retry_after or "").isdigit():
+                    delay = max(delay, float(e.retry_after))
+                await asyncio.sleep(delay)
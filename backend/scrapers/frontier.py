@@ -0,0 +1,105 @@
+"""
+Persistent crawl frontier and visited store
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class FrontierStore:
+    """SQLite-backed record of every URL the crawler knows about
+
+    Each URL keeps its crawl status plus the ETag, Last-Modified and content
+    hash from its last successful fetch. A crawl that stops part-way leaves
+    the rest of the frontier pending, so the next crawl resumes from there;
+    once a pass has finished, ``start_pass`` queues every URL again and the
+    stored validators turn the refetches into conditional GETs.
+    """
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    depth INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    fetched_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS urls_status ON urls(status, depth)")
+
+    def add(self, urls, source, depth=0):
+        """Queue URLs that have never been seen; returns the ones that were new"""
+        added = []
+        with self._lock, self._conn:
+            for url in urls:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO urls (url, source, depth) VALUES (?, ?, ?)",
+                    (url, source, depth),
+                )
+                if cursor.rowcount:
+                    added.append(url)
+        return added
+
+    def pending(self, limit=None):
+        """Pending (url, source, depth) rows, shallowest first"""
+        query = "SELECT url, source, depth FROM urls WHERE status = ? ORDER BY depth, rowid"
+        params = (PENDING,)
+        if limit:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+
+    def validators(self, url):
+        """(etag, last_modified, content_hash) from the last successful fetch"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, content_hash FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        return row or (None, None, None)
+
+    def mark_done(self, url, etag=None, last_modified=None, content_hash=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE urls SET status = ?, fetched_at = ?, attempts = 0,
+                   etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified),
+                   content_hash = COALESCE(?, content_hash)
+                   WHERE url = ?""",
+                (DONE, time.time(), etag, last_modified, content_hash, url),
+            )
+
+    def mark_failed(self, url):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE urls SET status = ?, attempts = attempts + 1 WHERE url = ?", (FAILED, url)
+            )
+
+    def start_pass(self):
+        """Queue every known URL again for a new crawl pass"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE urls SET status = ? WHERE status != ?", (PENDING, PENDING))
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,16 @@
+"""
+Hebbar's Kitchen scraper
+"""
+
+from urllib.parse import urlparse
+
+from .base import BaseScraper
+
+
+class HebbarsKitchenScraper(BaseScraper):
+    name = "Hebbar's Kitchen"
+
+    def is_recipe_url(self, url):
+        # Recipe posts are single-segment slugs such as /veg-biryani-recipe/
+        path = urlparse(url).path.strip("/")
+        return bool(path) and "/" not in path and path.endswith("recipe")
@@ -0,0 +1,18 @@
+"""
+Indian Healthy Recipes scraper
+"""
+
+from urllib.parse import urlparse
+
+from .base import BaseScraper
+
+# Top-level sections that are listings rather than recipe posts
+LISTING_SECTIONS = {"recipes", "category", "page", "about", "contact", "privacy-policy", "web-stories"}
+
+
+class IndianHealthyRecipesScraper(BaseScraper):
+    name = "Indian Healthy Recipes"
+
+    def is_recipe_url(self, url):
+        path = urlparse(url).path.strip("/")
+        return bool(path) and "/" not in path and path not in LISTING_SECTIONS
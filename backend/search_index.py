@@ -0,0 +1,317 @@
+"""
+In-process BM25 inverted index over recipe titles and ingredients
+"""
+
+import copy
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from operator import itemgetter
+
+import numpy as np
+
+from .vector_index import allowed_ids
+
+TOKEN_RE = re.compile(r"[a-z]+")
+
+# Common English words plus the quantity and unit words that fill ingredient
+# lines ("1 tsp", "to taste") without saying anything about the dish
+STOP_WORDS = frozenset({
+    "a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with",
+    "g", "kg", "ml", "l", "tsp", "tbsp", "cup", "cups", "inch", "pinch",
+    "taste", "chopped", "sliced", "cubed", "pureed", "boiled", "florets", "small",
+})
+
+# Title terms count three times as much as ingredient terms
+FIELD_WEIGHTS = {"title": 3.0, "ingredients": 1.0}
+
+
+def tokenize(text):
+    """Lowercase word tokens without stop words"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class PackedLists(Mapping):
+    """Read-only mapping of key -> slices of parallel arrays stored back to back
+
+    The entries of the i-th key sit at offsets[i]:offsets[i + 1] in every
+    array, so the arrays can be saved as .npy files and memory-mapped by any
+    number of processes at once.
+    """
+
+    def __init__(self, keys, offsets, arrays):
+        self.slots = {key: slot for slot, key in enumerate(keys)}
+        self.offsets = offsets
+        self.arrays = arrays
+
+    def __getitem__(self, key):
+        slot = self.slots[key]
+        start, end = self.offsets[slot], self.offsets[slot + 1]
+        return tuple(array[start:end] for array in self.arrays.values())
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def __len__(self):
+        return len(self.slots)
+
+    @classmethod
+    def pack(cls, lists, dtypes):
+        """Pack key -> tuple of equal-length sequences, with one dtype per sequence given by name"""
+        lengths = [len(entries[0]) for entries in lists.values()]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        arrays = {
+            name: np.fromiter(itertools.chain.from_iterable(entries[i] for entries in lists.values()),
+                              dtype=dtype, count=int(offsets[-1]))
+            for i, (name, dtype) in enumerate(dtypes.items())
+        }
+        return cls(lists, offsets, arrays)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        for name, array in self.arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        with open(os.path.join(path, "keys.json"), "w", encoding="utf-8") as f:
+            json.dump({"keys": list(self.slots), "arrays": list(self.arrays)}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "keys.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in meta["arrays"]}
+        return cls(meta["keys"], np.load(os.path.join(path, "offsets.npy"), mmap_mode=mode), arrays)
+
+
+class BM25Index:
+    """Inverted index with precomputed BM25 impacts per posting
+
+    Every posting stores its full term score (idf * saturated tf), so a query
+    is just a sum over the posting lists of its terms.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, field_weights=None):
+        self.k1 = k1
+        self.b = b
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        self.postings = {}
+        self.max_impacts = {}
+        self.num_docs = 0
+
+        # Kept so documents can be added and removed without re-tokenising the rest
+        self.term_freqs = {}
+        self.doc_freqs = Counter()
+        self.total_length = 0.0
+        # Collection statistics the stored impacts were computed with
+        self.impact_num_docs = 0
+        self.impact_avg_length = 1.0
+
+    def _term_freqs(self, fields):
+        tf = Counter()
+        for field, weight in self.field_weights.items():
+            for token in tokenize(fields.get(field) or ""):
+                tf[token] += weight
+        return tf
+
+    def _idf(self, term):
+        df = self.doc_freqs[term]
+        n = self.impact_num_docs
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _impact(self, idf, freq, length):
+        norm = self.k1 * (1 - self.b + self.b * length / self.impact_avg_length)
+        return idf * freq * (self.k1 + 1) / (freq + norm)
+
+    def _set_collection_stats(self):
+        self.num_docs = len(self.term_freqs)
+        self.impact_num_docs = self.num_docs
+        self.impact_avg_length = self.total_length / self.num_docs if self.num_docs else 1.0
+        self.impact_avg_length = self.impact_avg_length or 1.0
+
+    def _posting_list(self, term, doc_ids):
+        idf = self._idf(term)
+        plist = []
+        for doc_id in sorted(doc_ids):
+            tf = self.term_freqs[doc_id]
+            plist.append((doc_id, self._impact(idf, tf[term], sum(tf.values()))))
+        return plist
+
+    def build(self, documents, doc_ids=None):
+        """Index documents given as dicts of field name -> text, numbered in order
+
+        doc_ids, if given, supplies the id of each document instead.
+        """
+        documents = list(documents)
+        if doc_ids is None:
+            doc_ids = range(len(documents))
+        self.term_freqs = {doc_id: self._term_freqs(fields) for doc_id, fields in zip(doc_ids, documents)}
+        self.doc_freqs = Counter(term for tf in self.term_freqs.values() for term in tf)
+        self.total_length = sum(sum(tf.values()) for tf in self.term_freqs.values())
+        self._reimpact()
+        return self
+
+    def _reimpact(self):
+        """Recompute every impact against the current collection statistics"""
+        self._set_collection_stats()
+        lengths = {doc_id: sum(tf.values()) for doc_id, tf in self.term_freqs.items()}
+        idf = {term: self._idf(term) for term in self.doc_freqs}
+        postings = defaultdict(list)
+        for doc_id in sorted(self.term_freqs):
+            tf = self.term_freqs[doc_id]
+            for term, freq in tf.items():
+                postings[term].append((doc_id, self._impact(idf[term], freq, lengths[doc_id])))
+        self.postings = dict(postings)
+        self.max_impacts = {term: max(p[1] for p in plist) for term, plist in self.postings.items()}
+
+    def update(self, added=None, removed=(), drift=0.1):
+        """Apply document changes in place
+
+        added maps doc_id -> fields; removed lists doc_ids to drop. Only the
+        posting lists of terms those documents contain are rewritten. Impacts
+        elsewhere keep the collection statistics they were computed with until
+        the document count or average length drifts by more than ``drift``,
+        at which point all impacts are recomputed from the stored term counts.
+        Returns the number of posting lists rewritten.
+        """
+        dirty = {}
+        for doc_id in removed:
+            tf = self.term_freqs.pop(doc_id, None)
+            if tf is None:
+                continue
+            self.total_length -= sum(tf.values())
+            for term in tf:
+                self.doc_freqs[term] -= 1
+                if not self.doc_freqs[term]:
+                    del self.doc_freqs[term]
+                dirty.setdefault(term, set()).add(doc_id)
+        new_docs = {}
+        for doc_id, fields in (added or {}).items():
+            tf = self._term_freqs(fields)
+            self.term_freqs[doc_id] = tf
+            self.total_length += sum(tf.values())
+            for term in tf:
+                self.doc_freqs[term] += 1
+                dirty.setdefault(term, set())
+                new_docs.setdefault(term, []).append(doc_id)
+
+        num_docs = len(self.term_freqs)
+        avg_length = self.total_length / num_docs if num_docs else 1.0
+        stale = (
+            not self.impact_num_docs
+            or abs(num_docs - self.impact_num_docs) > drift * self.impact_num_docs
+            or abs(avg_length - self.impact_avg_length) > drift * self.impact_avg_length
+        )
+        if stale:
+            self._reimpact()
+            return len(self.postings)
+
+        self.num_docs = num_docs
+        for term, gone in dirty.items():
+            doc_ids = {doc_id for doc_id, _ in self.postings.get(term, ()) if doc_id not in gone}
+            doc_ids.update(new_docs.get(term, ()))
+            if doc_ids:
+                plist = self._posting_list(term, doc_ids)
+                self.postings[term] = plist
+                self.max_impacts[term] = max(p[1] for p in plist)
+            else:
+                self.postings.pop(term, None)
+                self.max_impacts.pop(term, None)
+        return len(dirty)
+
+    def copy(self):
+        """Copy that update() can patch while this index keeps serving queries
+
+        update() only ever replaces posting lists and term counts, so those
+        are shared rather than copied.
+        """
+        clone = copy.copy(self)
+        clone.postings = dict(self.postings)
+        clone.max_impacts = dict(self.max_impacts)
+        clone.term_freqs = dict(self.term_freqs)
+        clone.doc_freqs = Counter(self.doc_freqs)
+        return clone
+
+    def max_score(self, terms):
+        """Upper bound on the score any document can reach for these terms"""
+        return sum(self.max_impacts.get(term, 0.0) for term in terms)
+
+    def score_all(self, query, allowed=None):
+        """Scores of every matching document, and the max_score() bound they are normalized by
+
+        ``allowed`` is an optional boolean mask over doc ids; other documents
+        are skipped while the posting lists are summed.
+        """
+        terms = set(tokenize(query))
+        scores = defaultdict(float)
+        for term in terms:
+            for doc_id, impact in self.postings.get(term, ()):
+                if allowed is None or (doc_id < len(allowed) and allowed[doc_id]):
+                    scores[doc_id] += impact
+        return scores, self.max_score(terms)
+
+    def search(self, query, k=10, allowed=None):
+        """Return up to k (doc_id, score, normalized_score) tuples, best first
+
+        normalized_score is the score divided by max_score(), so it lies in
+        [0, 1] and can be compared against SIMILARITY_THRESHOLD.
+        """
+        scores, bound = self.score_all(query, allowed)
+        if not scores:
+            return []
+        top = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+        return [(doc_id, score, score / bound) for doc_id, score in top]
+
+    def save(self, path):
+        """Write the postings in the packed form PackedBM25Index.load() memory-maps"""
+        postings = PackedLists.pack({term: tuple(zip(*plist)) for term, plist in self.postings.items()},
+                                    {"doc_ids": np.int32, "impacts": np.float32})
+        postings.save(path)
+        np.save(os.path.join(path, "max_impacts.npy"),
+                np.asarray([self.max_impacts[term] for term in self.postings], dtype=np.float32))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"num_docs": self.num_docs, "k1": self.k1, "b": self.b}, f)
+
+
+class PackedBM25Index:
+    """Read-only BM25 index over packed, memory-mapped posting arrays
+
+    Opened from what BM25Index.save() wrote, it answers the same queries;
+    every process that opens the same files shares one copy of the postings.
+    """
+
+    def __init__(self, postings, max_impacts, num_docs):
+        self.postings = postings
+        self.max_impacts = max_impacts
+        self.num_docs = num_docs
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        postings = PackedLists.load(path, mmap)
+        max_impacts = np.load(os.path.join(path, "max_impacts.npy"))
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(postings, dict(zip(postings, max_impacts.tolist())), meta["num_docs"])
+
+    max_score = BM25Index.max_score
+    search = BM25Index.search
+
+    def score_all(self, query, allowed=None):
+        """Scores of every matching document, and the max_score() bound they are normalized by"""
+        terms = set(tokenize(query))
+        lists = [self.postings[term] for term in terms if term in self.postings]
+        if not lists:
+            return {}, self.max_score(terms)
+        doc_ids = np.concatenate([doc_ids for doc_ids, _ in lists])
+        impacts = np.concatenate([impacts for _, impacts in lists])
+        if allowed is not None:
+            keep = allowed_ids(allowed, doc_ids)
+            doc_ids, impacts = doc_ids[keep], impacts[keep]
+        matched, slots = np.unique(doc_ids, return_inverse=True)
+        totals = np.bincount(slots, weights=impacts, minlength=len(matched))
+        return dict(zip(matched.tolist(), totals.tolist())), self.max_score(terms)
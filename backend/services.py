@@ -0,0 +1,803 @@
+"""
+SnapChef backend services
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from .analytics import SearchAnalytics
+from .config import settings
+from .dedup import RecipeDeduplicator
+from .facets import FACET_FIELDS, FacetIndex, normalize_filters
+from .hybrid import MODES, reciprocal_rank_fusion, rerank
+from .ingredients import IngredientIndex, normalize_ingredient, recipe_ingredients
+from .manifest import IndexManifest, recipe_key
+from .popularity import PopularityTracker, format_timestamp
+from .query import QueryCanonicalizer
+from .models import PantryMatch, PantrySearchResponse, PopularRecipe, RecipeHit, RecipeResult, RecipeSearchResponse, StatsMinute, Suggestion, SystemStats
+from .search_index import BM25Index
+from .suggest import SuggestIndex
+from .tracing import stage
+
+logger = logging.getLogger(__name__)
+
+# Everything a search reads, swapped as one reference on reload
+SearchState = namedtuple("SearchState", ["recipes", "index", "vector_index", "version", "facets", "ingredients"])
+
+# Recipes embedded per encoder call during a rebuild, which is also how often progress is reported
+REBUILD_EMBED_BATCH = 512
+
+
+def load_corpus(path):
+    """Load recipes from a JSON list (or {"recipes": [...]}) file
+
+    Returns (recipes, version) where version is a checksum of the file, so
+    every worker that loads the same corpus agrees on it.
+    """
+    if not os.path.exists(path):
+        logger.warning("Recipe corpus %s not found, starting with an empty index", path)
+        return [], "empty"
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = json.loads(raw.decode("utf-8"))
+    if isinstance(data, dict):
+        data = data.get("recipes", [])
+    return [recipe for recipe in data if recipe.get("title")], format(zlib.crc32(raw), "08x")
+
+
+def write_corpus(path, recipes):
+    """Atomically replace the corpus file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(recipes, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def index_fields(recipe):
+    """Fields the lexical index sees for a recipe"""
+    return {"title": recipe["title"], "ingredients": " ".join(recipe.get("ingredients", []))}
+
+
+def embedding_text(recipe):
+    """Text the encoder sees for a recipe"""
+    return f"{recipe['title']}. {recipe.get('description', '')} Ingredients: {', '.join(recipe.get('ingredients', []))}"
+
+
+def to_result(recipe, score, retrieved_by=(), reranked=False):
+    return RecipeResult(
+        id=recipe.get("id") or recipe["title"],
+        title=recipe["title"],
+        source=recipe.get("source", "Unknown"),
+        url=recipe.get("url", ""),
+        description=recipe.get("description"),
+        ingredients=recipe.get("ingredients", []),
+        steps=recipe.get("steps", []),
+        tips=recipe.get("tips", []),
+        nutrition=recipe.get("nutrition"),
+        cook_time_minutes=recipe.get("cook_time_minutes"),
+        difficulty=recipe.get("difficulty"),
+        rating=recipe.get("rating"),
+        alternates=recipe.get("alternates", []),
+        similarity_score=round(score, 4),
+        retrieved_by=list(retrieved_by),
+        reranked=reranked,
+    )
+
+
+class LoadProgress:
+    """How far the service is from answering searches, for the readiness probe
+
+    ``phase`` names the step under way, with ``done`` of ``total`` items for
+    steps that count them. ``ready`` turns true once the indexes are loaded
+    and stays true through later refreshes, which swap indexes atomically;
+    ``components`` tracks the parts that finish after that.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.phase = "starting"
+        self.done = 0
+        self.total = 0
+        self.ready = False
+        self.ready_after_s = None
+        self.error = None
+        self.components = {}
+
+    def step(self, phase, done=0, total=0):
+        self.phase, self.done, self.total = phase, done, total
+
+    def finish(self):
+        if not self.ready:
+            self.ready = True
+            self.ready_after_s = round(time.time() - self.started, 3)
+        self.step("serving")
+
+    def fail(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+        self.step("failed")
+
+    def as_dict(self):
+        return {
+            "ready": self.ready,
+            "phase": self.phase,
+            "done": self.done,
+            "total": self.total,
+            "elapsed_s": round(time.time() - self.started, 3),
+            "ready_after_s": self.ready_after_s,
+            "components": dict(self.components),
+            "error": self.error,
+        }
+
+
+class RecipeSearchService:
+    """Main search orchestration
+
+    Answers searches from an in-process BM25 index built from the local corpus
+    file, so no Elasticsearch or network round trip is needed. When an encoder
+    is given, a vector index is built too, and by default both indexes are
+    queried and their candidates fused and re-ranked (see retrieve). Passing an EmbeddingService as the encoder gives cached,
+    micro-batched query embeddings on the async path, and passing a
+    SearchCache caches whole responses there.
+
+    Refreshes are incremental: an IndexManifest of content hashes decides
+    which recipes are new, changed or gone, and only those touch the indexes.
+The indexes are patched as copies and swapped in whole, so a query
+always scores one consistent SearchState without taking a lock.
+
+    With a RAGService, results on the async paths are enriched concurrently;
+    search_stream() yields the ranked hits before any enrichment finishes.
+
+    Queries are canonicalized first (folding, filler words, spelling,
+    Hindi/English synonyms), and the canonical form is what gets cached and
+    retrieved, so variants of one query share a cache entry.
+
+    suggest() completes dish names from a typeahead trie that is patched
+    along with the indexes and ranked by the popularity counts.
+
+    With a SharedIndex, several worker processes serve one copy of the
+    indexes: a reload builds them under the shared lock and publishes them as
+    a memory-mapped snapshot (or attaches to the current one if it already
+    covers this corpus), and start() watches for snapshots published by
+    other workers. Attaching maps the snapshot in milliseconds; only the
+    typeahead trie is built per worker, in the background.
+
+    With load=False nothing is loaded until start() loads it in the
+    background, reporting progress through ``loading`` meanwhile.
+    """
+
+    def __init__(self, corpus_path=None, encoder=None, max_results=None, similarity_threshold=None, cache=None,
+                 manifest_path=None, rag=None, popularity=None, shared=None, load=True, analytics=None):
+        self.corpus_path = corpus_path or settings.recipe_corpus_path
+        self.encoder = encoder
+        self.cache = cache
+        self.rag = rag
+        self.popularity = popularity or PopularityTracker()
+        self.analytics = analytics or SearchAnalytics(path="")
+        self.shared = shared
+        # Name of the shared generation being served, if any
+        self.generation = None
+        self._watcher = None
+        self._loader = None
+        self.loading = LoadProgress()
+        self.manifest = IndexManifest(manifest_path or settings.index_manifest_path)
+        self.dedup = RecipeDeduplicator() if settings.dedup_enabled else None
+        self.max_results = max_results or settings.max_search_results
+        self.similarity_threshold = (
+            settings.similarity_threshold if similarity_threshold is None else similarity_threshold
+        )
+        self.state = SearchState([], BM25Index(), None, "empty", FacetIndex(), IngredientIndex())
+        self.suggestions = SuggestIndex(settings.suggest_top_k, settings.suggest_max_edits)
+        self._suggest_counts = None
+        self.canonicalizer = QueryCanonicalizer(settings.query_max_edits)
+        # Recipe id -> doc id (slot in state.recipes); replaced and deleted slots hold None
+        self._doc_ids = {}
+        # Held while the state and the fields that go with it are swapped; queries read self.state once and never wait
+        self._update_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+        if load:
+            self.reload(full=True)
+
+    @property
+    def ready(self):
+        return self.loading.ready
+
+    def reload(self, full=False):
+        """Bring the indexes up to date with the corpus file
+
+        Recipes are compared with the manifest by content hash and only new or
+        changed ones are tokenised and embedded. Changed and deleted recipes
+        leave tombstoned slots behind; once those exceed INDEX_COMPACT_RATIO
+        of all slots (or with full=True) everything is rebuilt instead.
+        Returns the change counts.
+        """
+        with self._reload_lock:
+            if self.shared is None:
+                return self._reload(full)
+            with self.shared.lock():
+                # Another worker may have re-indexed, and moved the manifest on, since this one last did
+                self.manifest = IndexManifest(self.manifest.path)
+                return self._reload(full)
+
+    def _reload(self, full):
+        self.loading.step("reading_corpus")
+        recipes, version = load_corpus(self.corpus_path)
+        duplicates = 0
+        if self.dedup is not None:
+            self.loading.step("deduplicating", 0, len(recipes))
+            recipes = self.dedup.deduplicate(recipes)
+            duplicates = self.dedup.counters["duplicates"]
+        changes = self.manifest.diff(recipes)
+
+        if self.shared is not None:
+            rebuild = self._publish(recipes, version)
+        else:
+            slots = len(self.state.recipes) + len(changes.added) + len(changes.updated)
+            dead = len(self.state.recipes) - len(self._doc_ids) + len(changes.updated) + len(changes.deleted)
+            rebuild = full or not slots or dead > settings.index_compact_ratio * slots
+            if rebuild:
+                self._rebuild(recipes, version)
+            else:
+                self._apply_changes(changes, recipes, version)
+
+        self.loading.step("saving_manifest")
+        self.manifest.apply(changes)
+        self.manifest.save()
+        if self.cache is not None:
+            self.cache.clear_local()
+        self.loading.finish()
+
+        report = {
+            "total_recipes": self.recipe_count,
+            "added": len(changes.added),
+            "updated": len(changes.updated),
+            "unchanged": len(changes.unchanged),
+            "deleted": len(changes.deleted),
+            "duplicates": duplicates,
+        }
+        if self.generation is not None:
+            action = f"{'Published' if rebuild else 'Attached to'} index generation {self.generation} of"
+        else:
+            action = "Rebuilt index" if rebuild else "Re-indexed"
+        logger.info("%s %s from %s: %s", action, self.corpus_path, version, report)
+        return report
+
+    @property
+    def recipe_count(self):
+        # A shared generation is written without retired slots, and its workers keep no id map
+        return len(self.state.recipes) if self.generation is not None else len(self._doc_ids)
+
+    def _rebuild(self, recipes, version):
+        by_key = {}
+        for recipe in recipes:
+            by_key.setdefault(recipe_key(recipe), recipe)
+        recipes = list(by_key.values())
+        self.loading.step("lexical_index", 0, len(recipes))
+        index = BM25Index().build(index_fields(recipe) for recipe in recipes)
+
+        vector_index = None
+        if self.encoder is not None and recipes:
+            from .vector_index import create_vector_index
+            texts = [embedding_text(recipe) for recipe in recipes]
+            batches = []
+            for start in range(0, len(texts), REBUILD_EMBED_BATCH):
+                self.loading.step("embeddings", start, len(texts))
+                batches.append(self.encoder.encode_corpus(texts[start:start + REBUILD_EMBED_BATCH]))
+            vectors = np.vstack(batches)
+            self.loading.step("vector_index", 0, len(recipes))
+            vector_index = create_vector_index(vectors.shape[1])
+            vector_index.add(vectors)
+        self.loading.step("facets", 0, len(recipes))
+        facets = FacetIndex().build(recipes)
+        ingredients = IngredientIndex().build(recipes)
+        self.loading.step("typeahead", 0, len(recipes))
+        self.suggestions.build(recipes)
+        self.loading.components["typeahead"] = "ready"
+        self.loading.step("vocabulary", 0, len(recipes))
+        self.canonicalizer.build(recipes)
+
+        with self._update_lock:
+            self.state = SearchState(recipes, index, vector_index, version, facets, ingredients)
+            self._doc_ids = {recipe_key(recipe): doc_id for doc_id, recipe in enumerate(recipes)}
+
+    def _apply_changes(self, changes, recipes, version):
+        """Patch copies of the live indexes with a change set, then swap them in; changed recipes move to new doc ids
+
+        Queries keep reading the state they started with, so the copies are
+        patched without holding the update lock. Refreshes are serialized by
+        the reload lock.
+        """
+        fresh = changes.added + changes.updated
+        vectors = None
+        if self.encoder is not None and fresh:
+            vectors = self.encoder.encode_corpus([embedding_text(recipe) for recipe in fresh])
+        latest = {recipe_key(recipe): recipe for recipe in reversed(recipes)}
+
+        state = self.state
+        slots = list(state.recipes)
+        doc_ids = dict(self._doc_ids)
+        removed = [doc_ids.pop(key) for key in changes.deleted]
+        removed += [doc_ids.pop(recipe_key(recipe)) for recipe in changes.updated]
+        facets, ingredients, index, vector_index = state.facets.copy(), state.ingredients, state.index, state.vector_index
+        # A refresh that only touches fields outside the fingerprint leaves the other indexes shared
+        if removed or fresh:
+            ingredients, index = ingredients.copy(), index.copy()
+            vector_index = vector_index.copy() if vector_index is not None else None
+        stale = [slots[doc_id] for doc_id in removed]
+        for doc_id in removed:
+            slots[doc_id] = None
+            facets.remove(doc_id)
+            ingredients.remove(doc_id)
+        # Fields outside the fingerprint (rating, tips, ...) are refreshed without moving the doc id
+        for key in changes.unchanged:
+            doc_id = doc_ids[key]
+            if any(slots[doc_id].get(field) != latest[key].get(field) for field in FACET_FIELDS):
+                facets.remove(doc_id)
+                facets.add(doc_id, latest[key])
+            slots[doc_id] = latest[key]
+        added = {}
+        for recipe in fresh:
+            added[len(slots)] = recipe
+            doc_ids[recipe_key(recipe)] = len(slots)
+            facets.add(len(slots), recipe)
+            ingredients.add(len(slots), recipe)
+            slots.append(recipe)
+
+        if removed or fresh:
+            index.update({doc_id: index_fields(recipe) for doc_id, recipe in added.items()}, removed)
+        if vector_index is not None and removed:
+            vector_index.remove(removed)
+        if vectors is not None:
+            if vector_index is None:
+                from .vector_index import create_vector_index
+                vector_index = create_vector_index(vectors.shape[1])
+            vector_index.add(vectors, ids=list(added))
+
+        with self._update_lock:
+            self.state = SearchState(slots, index, vector_index, version, facets, ingredients)
+            self._doc_ids = doc_ids
+        self.suggestions.update(added=fresh, removed=changes.deleted)
+        self.canonicalizer.update(added=fresh, removed=stale)
+
+    def _generation_meta(self, version):
+        """What a shared generation was built from; one built from anything else is not reused"""
+        return {
+            "version": version,
+            "encoder": self.encoder.name if self.encoder is not None else None,
+            "vector_index": [settings.vector_index_type, settings.vector_index_dtype],
+            "query_max_edits": settings.query_max_edits,
+            "dedup": [self.dedup.threshold, self.dedup.hasher.num_perm, self.dedup.bands] if self.dedup else None,
+        }
+
+    def _publish(self, recipes, version):
+        """Attach to the current shared generation, first building and publishing one if it is not for this corpus
+
+        Shared indexes are always rebuilt in full; recipes that were embedded
+        before come out of the embedding store rather than the encoder.
+        Returns whether a generation was built.
+        """
+        meta = self._generation_meta(version)
+        current = self.shared.current()
+        if current is not None and current[1] == meta:
+            self._attach(current[0])
+            return False
+        self._rebuild(recipes, version)
+        state = self.state
+        self.loading.step("writing_snapshot", 0, len(state.recipes))
+        name = self.shared.publish(meta, state.recipes, state.index, state.vector_index, state.facets,
+                                   state.ingredients, self.canonicalizer)
+        # The trie just built from these recipes is kept as it is
+        self._attach(name, build_typeahead=False)
+        return True
+
+    def _attach(self, name, build_typeahead=True):
+        """Serve a shared generation in place of whatever this worker was serving
+
+        The typeahead trie cannot be mapped, so it is built in a background
+        thread; until then suggest() answers from the previous one (or with
+        nothing, on a fresh start).
+        """
+        if name == self.generation:
+            return
+        self.loading.step("opening_snapshot")
+        parts = self.shared.open(name)
+        canonicalizer = parts.pop("canonicalizer")
+        with self._update_lock:
+            self.state = SearchState(**parts)
+            self.canonicalizer = canonicalizer
+            self._doc_ids = {}
+            self.generation = name
+        if self.cache is not None:
+            self.cache.clear_local()
+        if build_typeahead:
+            self.loading.components["typeahead"] = "building"
+            threading.Thread(target=self._build_typeahead, args=(parts["recipes"], name),
+                             name="typeahead-build", daemon=True).start()
+
+    def _build_typeahead(self, recipes, generation):
+        suggestions = SuggestIndex(settings.suggest_top_k, settings.suggest_max_edits)
+        suggestions.build(recipe for recipe in recipes if recipe is not None)
+        with self._update_lock:
+            # A newer generation may have been attached while this one was building
+            if self.generation == generation:
+                self.suggestions, self._suggest_counts = suggestions, None
+                self.loading.components["typeahead"] = "ready"
+
+    def sync_generation(self):
+        """Switch to the current shared generation if another worker has published a newer one"""
+        with self._reload_lock:
+            current = self.shared.current()
+            if current is not None and current[0] != self.generation:
+                self._attach(current[0])
+                logger.info("Switched to index generation %s", current[0])
+
+    async def watch_generations(self):
+        while True:
+            await asyncio.sleep(settings.shared_index_poll_interval)
+            try:
+                await asyncio.to_thread(self.sync_generation)
+            except Exception:
+                logger.exception("Switching index generation failed")
+
+    async def _load(self):
+        try:
+            await asyncio.to_thread(self.reload, True)
+        except Exception as e:
+            logger.exception("Loading the indexes failed")
+            self.loading.fail(e)
+            return
+        if self.encoder is not None and not getattr(self.encoder, "ready", True):
+            # Import and load the model now, off the request path, rather than on the first semantic query
+            self.loading.components["encoder"] = "loading"
+            try:
+                await asyncio.to_thread(self.encoder.warm)
+                self.loading.components["encoder"] = "ready"
+            except Exception:
+                logger.exception("Loading the query encoder failed")
+                self.loading.components["encoder"] = "failed"
+
+    def start(self):
+        """Load the indexes in the background unless they are loaded, and watch for shared generations"""
+        if not self.loading.ready and self._loader is None:
+            self._loader = asyncio.create_task(self._load())
+        if self.shared is not None:
+            self._watcher = asyncio.create_task(self.watch_generations())
+        return self
+
+    async def stop(self):
+        for task in (self._loader, self._watcher):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._loader = self._watcher = None
+
+    def canonicalize(self, dish_name):
+        """Canonical form of a query, used for both the cache key and retrieval"""
+        with stage("canonicalize"):
+            return self.canonicalizer.canonicalize(dish_name)
+
+    def _mode(self, mode):
+        mode = mode or settings.retrieval_mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode} (expected one of {', '.join(MODES)})")
+        # Hybrid searches do not wait for a lazily loaded encoder; they stay lexical until it is ready
+        if mode == "hybrid" and self.encoder is not None and not getattr(self.encoder, "ready", True):
+            return "lexical"
+        return mode
+
+    def _lexical_candidates(self, state, dish_name, limit, filters=None):
+        """Top BM25 (doc_id, similarity) pairs, and the ids of every recipe that matches at all"""
+        scores, bound = state.index.score_all(dish_name, state.facets.mask(filters))
+        matches = [doc_id for doc_id, score in scores.items() if score / bound >= self.similarity_threshold]
+        top = heapq.nlargest(limit, matches, key=scores.__getitem__)
+        return [(doc_id, scores[doc_id] / bound) for doc_id in top], matches
+
+    def _semantic_candidates(self, state, query_vector, limit, filters=None):
+        if state.vector_index is None:
+            return []
+        return state.vector_index.search(query_vector, limit, self.similarity_threshold,
+                                         allowed=state.facets.mask(filters))
+
+    def _fuse(self, state, dish_name, lexical, matches, semantic, limit, rerank_budget_ms):
+        """Fuse the candidate lists, re-rank the head and count facets over everything matched"""
+        budget = settings.rerank_budget_ms if rerank_budget_ms is None else rerank_budget_ms
+        with stage("rerank"):
+            candidates = reciprocal_rank_fusion(lexical, semantic, settings.rrf_k)
+            hits = rerank(dish_name, candidates, state.recipes, limit, settings.rerank_candidates, budget)
+            facets = state.facets.counts(sorted(set(matches).union(doc_id for doc_id, _ in semantic)))
+        return hits, facets
+
+    def _wants_vectors(self, state, mode):
+        return mode != "lexical" and state.vector_index is not None
+
+    def retrieve(self, dish_name, limit, filters=None, mode=None, rerank_budget_ms=None):
+        """Ranked Hits for a query, and facet counts of its matches
+
+        ``mode`` picks BM25 ("lexical"), vectors ("semantic") or both fused
+        with reciprocal-rank fusion ("hybrid", the default). The first
+        RERANK_CANDIDATES fused candidates are then re-scored by a cheap
+        cross-scorer for at most ``rerank_budget_ms``.
+
+        Every stage reads the one SearchState taken at the start. A refresh
+        swaps in a new state rather than patching this one, so no lock is
+        held while scoring.
+        """
+        mode = self._mode(mode)
+        state = self.state
+        depth = max(limit, settings.hybrid_candidates)
+        lexical, matches, semantic = [], [], []
+        if mode != "semantic":
+            with stage("retrieval"):
+                lexical, matches = self._lexical_candidates(state, dish_name, depth, filters)
+        if self._wants_vectors(state, mode):
+            with stage("embedding"):
+                query_vector = self.encoder.encode([dish_name])
+            with stage("retrieval"):
+                semantic = self._semantic_candidates(state, query_vector, depth, filters)
+        return self._fuse(state, dish_name, lexical, matches, semantic, limit, rerank_budget_ms)
+
+    async def retrieve_async(self, dish_name, limit, filters=None, mode=None, rerank_budget_ms=None):
+        """Like retrieve, but BM25 scoring runs while the query embedding is computed"""
+        mode = self._mode(mode)
+        state = self.state
+        depth = max(limit, settings.hybrid_candidates)
+        lexical, matches, semantic = [], [], []
+        if not self._wants_vectors(state, mode):
+            with stage("retrieval"):
+                lexical, matches = self._lexical_candidates(state, dish_name, depth, filters)
+            return self._fuse(state, dish_name, lexical, matches, semantic, limit, rerank_budget_ms)
+
+        async def embed():
+            with stage("embedding"):
+                if hasattr(self.encoder, "embed"):
+                    return await self.encoder.embed(dish_name)
+                return await asyncio.to_thread(self.encoder.encode, [dish_name])
+
+        async def score_lexical():
+            if mode == "semantic":
+                return [], []
+            with stage("retrieval"):
+                return await asyncio.to_thread(self._lexical_candidates, state, dish_name, depth, filters)
+
+        query_vector, (lexical, matches) = await asyncio.gather(embed(), score_lexical())
+        with stage("retrieval"):
+            semantic = self._semantic_candidates(state, query_vector, depth, filters)
+        return self._fuse(state, dish_name, lexical, matches, semantic, limit, rerank_budget_ms)
+
+    async def _enrich(self, rank, hit):
+        recipe = hit.recipe
+        if self.rag is not None:
+            recipe = await self.rag.enrich(recipe)
+        return rank, to_result(recipe, hit.similarity, hit.retrieved_by, hit.reranked)
+
+    async def enrich_hits(self, hits):
+        """Yield (rank, RecipeResult) for each hit as soon as its enrichment completes"""
+        tasks = [asyncio.ensure_future(self._enrich(rank, hit)) for rank, hit in enumerate(hits)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer may stop early, e.g. when a streaming client disconnects
+            for task in tasks:
+                task.cancel()
+
+    async def enrich_all(self, hits):
+        results = [None] * len(hits)
+        with stage("enrichment"):
+            async for rank, result in self.enrich_hits(hits):
+                results[rank] = result
+        return results
+
+    def search(self, dish_name, max_results=None, filters=None, mode=None, rerank_budget_ms=None):
+        """Search recipes by dish name (without enrichment)"""
+        started = time.perf_counter()
+        filters = normalize_filters(filters)
+        query = self.canonicalize(dish_name)
+        hits, facets = self.retrieve(query, max_results or self.max_results, filters, mode, rerank_budget_ms)
+        return self._respond(dish_name, hits, started, query, facets)
+
+    async def search_async(self, dish_name, max_results=None, filters=None, mode=None, rerank_budget_ms=None):
+        """Search recipes by dish name without blocking the event loop on embeddings
+
+        ``filters`` maps facets to wanted values (see facets.FACETS); recipes
+        outside them are excluded before ranking. ``mode`` and
+        ``rerank_budget_ms`` override the retrieval settings for this query
+        (see retrieve). Raises ValueError for unknown facets or modes.
+        """
+        started = time.perf_counter()
+        limit = max_results or self.max_results
+        filters = normalize_filters(filters)
+        mode = self._mode(mode)
+        query = self.canonicalize(dish_name)
+        if self.cache is None:
+            hits, facets = await self.retrieve_async(query, limit, filters, mode, rerank_budget_ms)
+            results = await self.enrich_all(hits)
+            return self._build_response(dish_name, results, started, canonical_query=query, facets=facets)
+
+        async def compute():
+            hits, facets = await self.retrieve_async(query, limit, filters, mode, rerank_budget_ms)
+            results = await self.enrich_all(hits)
+            with stage("serialization"):
+                return {"results": [result.model_dump() for result in results], "facets": facets}
+
+        # The corpus version is part of the key, so a refresh never serves old results
+        filter_key = json.dumps(filters, sort_keys=True) if filters else ""
+        budget = settings.rerank_budget_ms if rerank_budget_ms is None else rerank_budget_ms
+        key = self.cache.key(query, limit, self.state.version, filter_key, mode, budget)
+        payload, cached = await self.cache.get_or_compute(key, compute)
+        with stage("serialization"):
+            results = [RecipeResult(**result) for result in payload["results"]]
+        return self._build_response(dish_name, results, started, cached, query, payload["facets"])
+
+    async def search_stream(self, dish_name, max_results=None, filters=None, mode=None, rerank_budget_ms=None):
+        """Search as a sequence of events
+
+        Yields a "hits" event with the ranked recipes and facet counts right
+        after retrieval, one "result" event per enriched RecipeResult in
+        completion order, and a closing "done" event.
+        """
+        started = time.perf_counter()
+        filters = normalize_filters(filters)
+        query = self.canonicalize(dish_name)
+        hits, facets = await self.retrieve_async(query, max_results or self.max_results, filters, mode,
+                                                 rerank_budget_ms)
+        yield {
+            "event": "hits",
+            "query": dish_name,
+            "canonical_query": query,
+            "facets": facets,
+            "hits": [
+                RecipeHit(rank=rank, id=recipe_key(hit.recipe), title=hit.recipe["title"],
+                          source=hit.recipe.get("source", "Unknown"), url=hit.recipe.get("url", ""),
+                          similarity_score=round(hit.similarity, 4), retrieved_by=hit.retrieved_by,
+                          reranked=hit.reranked).model_dump()
+                for rank, hit in enumerate(hits)
+            ],
+            "retrieval_time_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        results = [None] * len(hits)
+        with stage("enrichment"):
+            async for rank, result in self.enrich_hits(hits):
+                results[rank] = result
+                yield {"event": "result", "rank": rank, "result": result.model_dump()}
+        response = self._build_response(dish_name, results, started, canonical_query=query)
+        yield {"event": "done", "total_found": response.total_found, "search_time_ms": response.search_time_ms}
+
+    def _respond(self, dish_name, hits, started, canonical_query=None, facets=None):
+        results = [to_result(*hit) for hit in hits]
+        return self._build_response(dish_name, results, started, canonical_query=canonical_query, facets=facets)
+
+    def _build_response(self, dish_name, results, started, cached=False, canonical_query=None, facets=None):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._record_search(dish_name, results, elapsed_ms, cached)
+        return RecipeSearchResponse(
+            query=dish_name,
+            results=results,
+            total_found=len(results),
+            search_time_ms=round(elapsed_ms, 3),
+            cached=cached,
+            canonical_query=canonical_query,
+            facets=facets or {},
+        )
+
+    def _record_search(self, dish_name, results, elapsed_ms, cached=False):
+        self.analytics.record(dish_name, len(results), elapsed_ms, cached)
+        if results:
+            self.popularity.record(results[0].title)
+
+    def search_by_ingredients(self, ingredients, max_results=None, filters=None):
+        """Recipes ranked by how much of their ingredient list the given ingredients cover"""
+        started = time.perf_counter()
+        names = []
+        for ingredient in ingredients:
+            name = normalize_ingredient(ingredient)
+            if name and name not in names:
+                names.append(name)
+        state = self.state
+        with stage("retrieval"):
+            found = state.ingredients.search(names, max_results or self.max_results, state.facets.mask(filters))
+            results = []
+            for doc_id, coverage, matched in found:
+                recipe = state.recipes[doc_id]
+                results.append(PantryMatch(
+                    id=recipe_key(recipe),
+                    title=recipe["title"],
+                    source=recipe.get("source", "Unknown"),
+                    url=recipe.get("url", ""),
+                    coverage=round(coverage, 4),
+                    matched=matched,
+                    missing=[name for name in recipe_ingredients(recipe) if name not in matched],
+                    cook_time_minutes=recipe.get("cook_time_minutes"),
+                    difficulty=recipe.get("difficulty"),
+                ))
+        return PantrySearchResponse(
+            ingredients=names,
+            results=results,
+            total_found=len(results),
+            search_time_ms=round((time.perf_counter() - started) * 1000, 3),
+        )
+
+    def suggest(self, query, limit=8):
+        """Dish-name completions for a typed prefix, most searched first"""
+        with stage("suggest"):
+            counts = {title: count for title, count, _ in self.popularity.top("all", self.popularity.top_k)}
+            # Popularity only changes on flush, so the trie is re-ranked at most once per flush
+            if counts != self._suggest_counts:
+                self.suggestions.set_weights(counts)
+                self._suggest_counts = counts
+            return [
+                Suggestion(id=entry, title=title, edits=edits)
+                for entry, title, edits in self.suggestions.suggest(query, limit)
+            ]
+
+    def get_popular_recipes(self, limit=10, window="all"):
+        return [
+            PopularRecipe(title=title, search_count=count, last_searched=format_timestamp(last_searched))
+            for title, count, last_searched in self.popularity.top(window, limit)
+        ]
+
+    def get_stats(self, minutes=60):
+        """Search totals and a per-minute history of the last ``minutes``, from the analytics aggregates"""
+        totals, history = self.analytics.stats(minutes)
+        summary = totals.summary()
+        return SystemStats(
+            total_searches=summary["searches"],
+            total_recipes_indexed=self.recipe_count,
+            cache_hit_rate=summary["cache_hit_rate"],
+            avg_response_time_ms=summary["avg_response_time_ms"],
+            empty_results=summary["empty_results"],
+            history=[StatsMinute(minute=format_timestamp(minute), **stats.summary()) for minute, stats in history],
+        )
+
+
+class WebScrapingService:
+    """Multi-source recipe scraping into the local corpus file
+
+    Each run resumes or starts a crawl pass over the configured sources and
+    merges the recipes it parsed into the corpus, keyed by recipe id. Pages
+    that answer 304 or have not changed are not parsed again, so their
+    recipes simply stay as they are in the corpus.
+    """
+
+    def __init__(self, corpus_path=None, sources=None, frontier_path=None):
+        self.corpus_path = corpus_path or settings.recipe_corpus_path
+        self.sources = sources or settings.recipe_source_list
+        self.frontier_path = frontier_path or settings.scrape_frontier_path
+        self._lock = asyncio.Lock()
+
+    async def scrape(self):
+        from .scrapers import CrawlEngine, FrontierStore, create_scrapers
+
+        async with self._lock:
+            scraped = {}
+            frontier = FrontierStore(self.frontier_path)
+            try:
+                engine = CrawlEngine(
+                    create_scrapers(self.sources),
+                    frontier,
+                    concurrency=settings.scrape_concurrency,
+                    connections_per_host=settings.scrape_connections_per_host,
+                    max_pages=settings.scrape_max_pages,
+                    max_depth=settings.scrape_max_depth,
+                )
+                stats = await engine.crawl(lambda recipe: scraped.__setitem__(recipe["id"], recipe))
+            finally:
+                frontier.close()
+
+            if scraped:
+                recipes, _ = load_corpus(self.corpus_path)
+                by_id = {recipe.get("id") or recipe["title"]: recipe for recipe in recipes}
+                by_id.update(scraped)
+                write_corpus(self.corpus_path, list(by_id.values()))
+            logger.info("Scrape pass finished: %s", stats)
+            return stats
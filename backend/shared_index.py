@@ -0,0 +1,179 @@
+"""
+Versioned on-disk snapshots of the search state, memory-mapped by every worker process
+"""
+
+import functools
+import json
+import logging
+import os
+import shutil
+import time
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+import numpy as np
+
+from .facets import FacetIndex
+from .ingredients import IngredientIndex
+from .query import QueryCanonicalizer
+from .search_index import PackedBM25Index
+from .vector_index import load_vector_index
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; run a single worker there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout of a snapshot changes; snapshots in another format are rebuilt
+SNAPSHOT_FORMAT = 2
+
+
+class RecipeStore(Sequence):
+    """Recipes by doc id, decoded on access from one memory-mapped JSON blob
+
+    Retired doc ids are stored empty and read as None. The most recently
+    read recipes are kept decoded.
+    """
+
+    def __init__(self, data, offsets, cache_size=1024):
+        self.data = data
+        self.offsets = offsets
+        self._decoded = functools.lru_cache(maxsize=cache_size)(self._decode)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _decode(self, doc_id):
+        start, end = self.offsets[doc_id], self.offsets[doc_id + 1]
+        return json.loads(self.data[start:end].tobytes()) if end > start else None
+
+    def __getitem__(self, doc_id):
+        if isinstance(doc_id, slice):
+            return [self[i] for i in range(*doc_id.indices(len(self)))]
+        doc_id = int(doc_id)
+        if doc_id < 0:
+            doc_id += len(self)
+        if not 0 <= doc_id < len(self):
+            raise IndexError(f"doc id {doc_id} out of range")
+        return self._decoded(doc_id)
+
+    @staticmethod
+    def save(path, recipes):
+        blobs = [b"" if recipe is None else json.dumps(recipe, ensure_ascii=False).encode("utf-8")
+                 for recipe in recipes]
+        offsets = np.concatenate([[0], np.cumsum([len(blob) for blob in blobs])]).astype(np.int64)
+        np.save(os.path.join(path, "recipes.npy"), np.frombuffer(b"".join(blobs), dtype=np.uint8))
+        np.save(os.path.join(path, "recipe_offsets.npy"), offsets)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mode = "r" if mmap else None
+        return cls(np.load(os.path.join(path, "recipes.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "recipe_offsets.npy"), mmap_mode=mode))
+
+
+class SharedIndex:
+    """Generations of the search indexes in one directory, built once and mapped by every worker
+
+    A generation is a snapshot of the whole search state: a subdirectory
+    holding the recipes, BM25 vocabulary and postings, vectors, facet
+    bitmaps, ingredient postings and the query vocabulary's spelling table
+    as .npy files with small JSON headers, plus a meta.json recording the
+    SNAPSHOT_FORMAT and what it was built from. Opening one maps the arrays
+    rather than reading them, so it takes milliseconds. Whichever
+    worker (re)builds the indexes writes a new generation under a file lock
+    and then points ``current.json`` at it with an atomic rename. Workers
+    open generations with read-only memory maps, so the operating system
+    keeps one copy in its page cache however many workers there are, and
+    no page is ever copied on write. The generation before the current one
+    is kept for workers that have not switched yet.
+    """
+
+    def __init__(self, path, keep=2):
+        self.path = path
+        self.keep = keep
+        os.makedirs(path, exist_ok=True)
+        self._current_path = os.path.join(path, "current.json")
+
+    @contextmanager
+    def lock(self):
+        """Held while a generation is built, so workers starting together build it once"""
+        with open(os.path.join(self.path, "build.lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def current(self):
+        """(name, meta) of the published generation, or None if there is none in this format"""
+        try:
+            with open(self._current_path, encoding="utf-8") as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+        meta = dict(pointer["meta"])
+        if meta.pop("format", None) != SNAPSHOT_FORMAT:
+            logger.info("Index generation %s is not in snapshot format %s; it will be rebuilt",
+                        pointer["generation"], SNAPSHOT_FORMAT)
+            return None
+        return pointer["generation"], meta
+
+    def publish(self, meta, recipes, index, vector_index, facets, ingredients, canonicalizer):
+        """Write a generation of these indexes and make it the current one; returns its name"""
+        name = f"{time.time_ns()}-{meta['version']}"
+        path = os.path.join(self.path, name)
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path)
+        RecipeStore.save(tmp_path, recipes)
+        index.save(os.path.join(tmp_path, "bm25"))
+        if vector_index is not None:
+            vector_index.save(os.path.join(tmp_path, "vectors"))
+        facets.save(os.path.join(tmp_path, "facets"))
+        ingredients.save(os.path.join(tmp_path, "ingredients"))
+        canonicalizer.save(os.path.join(tmp_path, "vocabulary"))
+        meta = {"format": SNAPSHOT_FORMAT, **meta}
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({**meta, "recipes": len(recipes), "created": time.time()}, f)
+        os.replace(tmp_path, path)
+
+        pointer_path = f"{self._current_path}.tmp"
+        with open(pointer_path, "w", encoding="utf-8") as f:
+            json.dump({"generation": name, "meta": meta}, f)
+        os.replace(pointer_path, self._current_path)
+        self._collect()
+        return name
+
+    def open(self, name):
+        """Read-only indexes of a generation, keyed like the fields of services.SearchState
+
+        The query vocabulary comes back under "canonicalizer".
+        """
+        path = os.path.join(self.path, name)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Index generation {name} is in snapshot format {meta.get('format')}, "
+                             f"not {SNAPSHOT_FORMAT}")
+        vectors_path = os.path.join(path, "vectors")
+        return {
+            "recipes": RecipeStore.load(path),
+            "index": PackedBM25Index.load(os.path.join(path, "bm25")),
+            "vector_index": load_vector_index(vectors_path) if os.path.isdir(vectors_path) else None,
+            "version": meta["version"],
+            "facets": FacetIndex.load(os.path.join(path, "facets")),
+            "ingredients": IngredientIndex.load(os.path.join(path, "ingredients")),
+            "canonicalizer": QueryCanonicalizer.load(os.path.join(path, "vocabulary")),
+        }
+
+    def _collect(self):
+        # Names start with the build time, so they sort oldest first; files still
+        # mapped by a worker stay readable until it unmaps them
+        names = sorted(name for name in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, name)))
+        for name in names[:-self.keep]:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+            logger.info("Removed index generation %s", name)
@@ -0,0 +1,243 @@
+"""
+Typeahead suggestions over recipe titles and aliases
+"""
+
+import heapq
+import threading
+
+from .manifest import recipe_key
+from .transliteration import DISH_ALIASES, fold, transliteration_key
+
+
+class _Node:
+    __slots__ = ("label", "children", "entries", "top")
+
+    def __init__(self, label=""):
+        self.label = label
+        self.children = {}
+        self.entries = set()
+        self.top = []
+
+
+def _common_prefix(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class SuggestIndex:
+    """Radix trie with the best ``top_k`` completions precomputed at every node
+
+    Every word start of a title (and of its aliases) is inserted under its
+    transliteration key, so "biriyani", "briyani" and "Biryani" reach the
+    same node and "paneer" completes "Palak Paneer". Edges carry whole label
+    strings, so the trie has at most two nodes per key. An exact prefix
+    lookup is a walk down the trie plus a slice; when that finds too little,
+    a Levenshtein DFS allows up to ``max_edits`` typos in the prefix.
+
+    Entries rank by the popularity of their title (set_weights), then by
+    rating. Adding, removing or re-weighting recipes only recomputes the top
+    lists of the nodes on their keys' paths.
+    """
+
+    def __init__(self, top_k=10, max_edits=2):
+        self.top_k = top_k
+        self.max_edits = max_edits
+        self.root = _Node()
+        self.titles = {}
+        self.weights = {}
+        self._rating = {}
+        self._keys = {}
+        self._by_title = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.titles)
+
+    @staticmethod
+    def keys_for(recipe):
+        """Transliteration keys a recipe is reachable under"""
+        words = transliteration_key(recipe["title"]).split()
+        keys = {" ".join(words[start:]) for start in range(len(words))}
+        for word in fold(recipe["title"]).split():
+            keys.update(transliteration_key(alias) for alias in DISH_ALIASES.get(word, ()))
+        keys.update(transliteration_key(alias) for alias in recipe.get("aliases") or [])
+        keys.discard("")
+        return keys
+
+    def _score(self, entry):
+        return (self.weights.get(fold(self.titles[entry]), 0), self._rating[entry])
+
+    def _insert_key(self, key):
+        """Path from the root to the node for ``key``, splitting edges as needed"""
+        node, path, rest = self.root, [self.root], key
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                child = node.children[rest[0]] = _Node(rest)
+                path.append(child)
+                return path
+            shared = _common_prefix(child.label, rest)
+            if shared < len(child.label):
+                middle = _Node(child.label[:shared])
+                child.label = child.label[shared:]
+                middle.children[child.label[0]] = child
+                middle.top = list(child.top)
+                node.children[rest[0]] = middle
+                child = middle
+            node, rest = child, rest[shared:]
+            path.append(node)
+        return path
+
+    def _find(self, key):
+        """Path to the node for ``key``, or to the node whose edge ``key`` ends inside; None if absent"""
+        node, path, rest = self.root, [self.root], key
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return None
+            shared = _common_prefix(child.label, rest)
+            if shared < len(rest) and shared < len(child.label):
+                return None
+            node, rest = child, rest[shared:]
+            path.append(node)
+        return path
+
+    def _remove_key(self, entry, key):
+        path = self._find(key)
+        if path is None:
+            return []
+        node = path[-1]
+        node.entries.discard(entry)
+        # Keep the trie compressed: drop empty leaves and fold single-child nodes into their child
+        while len(path) > 1 and not node.entries and len(node.children) <= 1:
+            parent = path[-2]
+            if node.children:
+                (child,) = node.children.values()
+                child.label = node.label + child.label
+                parent.children[node.label[0]] = child
+                path[-1] = child
+                break
+            del parent.children[node.label[0]]
+            path.pop()
+            node = parent
+        return path
+
+    def _recompute(self, paths):
+        """Refresh top lists bottom-up, each touched node once
+
+        A later insert or removal may have split or folded edges on an earlier
+        path, so the order comes from walking the trie as it is now.
+        """
+        touched = {id(node) for path in paths for node in path}
+        if not touched:
+            return
+        order, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(child for child in node.children.values() if id(child) in touched)
+        for node in reversed(order):
+            candidates = set(node.entries)
+            for child in node.children.values():
+                candidates.update(child.top)
+            node.top = heapq.nlargest(self.top_k, candidates, key=self._score)
+
+    def _insert(self, entry, recipe):
+        self.titles[entry] = recipe["title"]
+        self._rating[entry] = float(recipe.get("rating") or 0.0)
+        self._keys[entry] = self.keys_for(recipe)
+        self._by_title.setdefault(fold(recipe["title"]), set()).add(entry)
+        paths = []
+        for key in self._keys[entry]:
+            path = self._insert_key(key)
+            path[-1].entries.add(entry)
+            paths.append(path)
+        return paths
+
+    def _remove(self, entry):
+        paths = [self._remove_key(entry, key) for key in self._keys.pop(entry, ())]
+        title = self.titles.pop(entry, None)
+        if title is not None:
+            same_title = self._by_title[fold(title)]
+            same_title.discard(entry)
+            if not same_title:
+                del self._by_title[fold(title)]
+        self._rating.pop(entry, None)
+        return paths
+
+    def build(self, recipes):
+        with self._lock:
+            self.root = _Node()
+            self.titles, self._rating, self._keys, self._by_title = {}, {}, {}, {}
+            paths = []
+            for recipe in recipes:
+                paths.extend(self._insert(recipe_key(recipe), recipe))
+            self._recompute(paths)
+
+    def update(self, added=(), removed=()):
+        """Insert or replace recipes and drop recipe ids, recomputing only the touched paths"""
+        with self._lock:
+            paths = []
+            for entry in removed:
+                paths.extend(self._remove(entry))
+            for recipe in added:
+                entry = recipe_key(recipe)
+                paths.extend(self._remove(entry))
+                paths.extend(self._insert(entry, recipe))
+            # Top lists may still name removed entries; every node that can is on one of these paths
+            self._recompute(paths)
+
+    def set_weights(self, counts):
+        """Replace title popularity counts; only entries whose weight changed are re-ranked"""
+        counts = {fold(title): count for title, count in counts.items() if count}
+        with self._lock:
+            changed = {title for title in set(counts) | set(self.weights)
+                       if counts.get(title) != self.weights.get(title)}
+            self.weights = counts
+            paths = []
+            for title in changed:
+                for entry in self._by_title.get(title, ()):
+                    paths.extend(self._find(key) for key in self._keys[entry])
+            self._recompute(paths)
+
+    def suggest(self, query, limit=8):
+        """Up to ``limit`` (entry, title, edits) tuples, exact prefix matches first"""
+        key = transliteration_key(query)
+        if not key:
+            return []
+        with self._lock:
+            path = self._find(key)
+            results = [(entry, 0) for entry in (path[-1].top[:limit] if path else [])]
+            max_edits = 0 if len(key) < 3 else 1 if len(key) < 6 else self.max_edits
+            if len(results) < limit and max_edits:
+                seen = {entry for entry, _ in results}
+                ranked = sorted(self._fuzzy(key, max_edits).items(),
+                                key=lambda item: (item[1], [-value for value in self._score(item[0])]))
+                results.extend((entry, edits) for entry, edits in ranked if entry not in seen)
+            return [(entry, self.titles[entry], edits) for entry, edits in results[:limit]]
+
+    def _fuzzy(self, key, max_edits):
+        """entry -> fewest edits turning ``key`` into a prefix of one of its keys"""
+        found = {}
+        stack = [(child, list(range(len(key) + 1))) for child in self.root.children.values()]
+        while stack:
+            node, row = stack.pop()
+            for char in node.label:
+                previous, row = row, [row[0] + 1]
+                for column in range(1, len(key) + 1):
+                    cost = 0 if key[column - 1] == char else 1
+                    row.append(min(row[column - 1] + 1, previous[column] + 1, previous[column - 1] + cost))
+                if row[-1] <= max_edits:
+                    # Everything below this point on the edge completes a matching prefix
+                    for entry in node.top:
+                        if row[-1] < found.get(entry, max_edits + 1):
+                            found[entry] = row[-1]
+                if min(row) > max_edits:
+                    break
+            else:
+                stack.extend((child, row) for child in node.children.values())
+        return found
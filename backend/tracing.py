@@ -0,0 +1,284 @@
+"""
+Per-stage request timing: latency histograms, Server-Timing and a slow-request profiler
+"""
+
+import asyncio
+import contextvars
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from .config import settings
+
+# Each power of two is split into this many linear sub-buckets (~3% resolution)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Microsecond values up to 2**36 (about 19 hours) get their own bucket
+MAX_EXPONENT = 36
+
+
+def bucket_index(value_us):
+    if value_us < SUB_BUCKETS:
+        return value_us
+    exponent = min(value_us.bit_length() - 1, MAX_EXPONENT)
+    sub = (value_us >> (exponent - SUB_BUCKET_BITS)) & (SUB_BUCKETS - 1)
+    return (exponent - SUB_BUCKET_BITS + 1) * SUB_BUCKETS + sub
+
+
+def bucket_upper_bound(index):
+    """Largest microsecond value that lands in a bucket"""
+    if index < SUB_BUCKETS:
+        return index
+    exponent = index // SUB_BUCKETS + SUB_BUCKET_BITS - 1
+    sub = index % SUB_BUCKETS
+    return ((SUB_BUCKETS + sub + 1) << (exponent - SUB_BUCKET_BITS)) - 1
+
+
+NUM_BUCKETS = bucket_index((1 << (MAX_EXPONENT + 1)) - 1) + 1
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of microsecond durations
+
+    Recording is a couple of integer operations and a list increment; only
+    the thread that owns a histogram writes to it, so no lock is taken.
+    Readers merge histograms and compute percentiles from the buckets.
+    """
+
+    __slots__ = ("counts", "count", "total_us", "max_us")
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, value_us):
+        self.counts[bucket_index(value_us)] += 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile, in microseconds"""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * pct // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_upper_bound(index), self.max_us)
+        return self.max_us
+
+    def summary(self):
+        ms = lambda value_us: round(value_us / 1000, 3)
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total_us / self.count) if self.count else 0.0,
+            "p50_ms": ms(self.percentile(50)),
+            "p90_ms": ms(self.percentile(90)),
+            "p99_ms": ms(self.percentile(99)),
+            "p999_ms": ms(self.percentile(99.9)),
+            "max_ms": ms(self.max_us),
+        }
+
+
+class StageRecorder:
+    """Per-thread histograms for every stage, merged when read"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all = []
+        self._register_lock = threading.Lock()
+
+    def _histograms(self):
+        histograms = getattr(self._local, "histograms", None)
+        if histograms is None:
+            histograms = self._local.histograms = {}
+            with self._register_lock:
+                self._all.append(histograms)
+        return histograms
+
+    def record(self, stage, value_us):
+        histograms = self._histograms()
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = LatencyHistogram()
+        histogram.record(value_us)
+
+    def merged(self):
+        with self._register_lock:
+            per_thread = list(self._all)
+        merged = {}
+        for histograms in per_thread:
+            for stage, histogram in list(histograms.items()):
+                merged.setdefault(stage, LatencyHistogram()).merge(histogram)
+        return merged
+
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in sorted(self.merged().items())}
+
+
+recorder = StageRecorder()
+
+# Stage durations of the request being handled, for its Server-Timing header
+_current_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage(name):
+    """Time a block as one stage of the current request"""
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        elapsed_us = (time.perf_counter_ns() - started) // 1000
+        recorder.record(name, elapsed_us)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + elapsed_us
+
+
+def server_timing(timings):
+    return ", ".join(f"{name};dur={value_us / 1000:.3f}" for name, value_us in timings.items())
+
+
+class SlowRequestProfiler:
+    """Opt-in sampling profiler for slow requests
+
+    A sampled share of requests (``sample_rate``) has the stack of the
+    thread serving it (the event loop) captured every ``interval_ms`` by a
+    background thread. Requests that then take at least ``threshold_ms``
+    keep their collapsed stacks, most frequent first; the last ``keep`` are
+    available through profiles(). Unsampled requests cost one random().
+
+    Concurrent requests share the event loop thread, so a sample only counts
+    towards a request while its own task is the one running. Time spent in
+    worker threads (asyncio.to_thread) or in tasks the request spawns is not
+    sampled. A request begun outside an event loop gets every sample of its
+    thread.
+    """
+
+    def __init__(self, threshold_ms=None, sample_rate=None, interval_ms=None, keep=20):
+        self.threshold_ms = settings.trace_slow_ms if threshold_ms is None else threshold_ms
+        self.sample_rate = settings.trace_profile_sample_rate if sample_rate is None else sample_rate
+        self.interval = (interval_ms or settings.trace_profile_interval_ms) / 1000
+        self.enabled = self.sample_rate > 0
+        self._profiles = deque(maxlen=keep)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    def begin(self):
+        """Start sampling the calling task if this request is picked; returns a handle or None"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        loop = task = None
+        try:
+            loop = asyncio.get_running_loop()
+            task = asyncio.current_task(loop)
+        except RuntimeError:
+            pass
+        session = (threading.get_ident(), loop, task, Counter())
+        with self._lock:
+            self._active[id(session)] = session
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                self._sampler.start()
+        return session
+
+    def end(self, session, label, duration_ms):
+        if session is None:
+            return
+        with self._lock:
+            self._active.pop(id(session), None)
+        if duration_ms >= self.threshold_ms:
+            stacks = session[3]
+            self._profiles.append({
+                "request": label,
+                "duration_ms": round(duration_ms, 3),
+                "samples": sum(stacks.values()),
+                "stacks": [{"stack": stack, "samples": count} for stack, count in stacks.most_common(20)],
+                "captured_at": time.time(),
+            })
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                sessions = list(self._active.values())
+                if not sessions:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            for thread_id, loop, task, stacks in sessions:
+                frame = frames.get(thread_id)
+                if frame is not None and (task is None or asyncio.current_task(loop) is task):
+                    stacks[_collapse(frame)] += 1
+            time.sleep(self.interval)
+
+    def profiles(self):
+        return list(self._profiles)
+
+
+def _collapse(frame, limit=40):
+    parts = []
+    while frame is not None and len(parts) < limit:
+        code = frame.f_code
+        parts.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware that times each HTTP request by stage
+
+    Adds a Server-Timing header listing the stages the request went through
+    plus its total, records the total in a "request <route>" histogram, and
+    hands the request to the slow-request profiler. Streaming responses send their
+    headers before later stages run, so their header lists only what had
+    finished by then.
+    """
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = {}
+        token = _current_timings.set(timings)
+        started = time.perf_counter_ns()
+        session = self.profiler.begin() if self.profiler is not None else None
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total_us = (time.perf_counter_ns() - started) // 1000
+                header = server_timing({**timings, "total": total_us})
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            total_us = (time.perf_counter_ns() - started) // 1000
+            # The router stores the matched route in the scope; unmatched paths share one histogram
+            route = scope.get("route")
+            recorder.record(f"request {route.path}" if route is not None else "request", total_us)
+            _current_timings.reset(token)
+            if session is not None:
+                self.profiler.end(session, f"{scope['method']} {scope['path']}", total_us / 1000)
@@ -0,0 +1,61 @@
+"""
+Spelling-insensitive keys and aliases for romanised Indian dish names
+"""
+
+import re
+import unicodedata
+
+# Applied in order; spellings of the same Hindi word converge on one key,
+# e.g. biryani/biriyani -> biriani, paneer/panir -> panir, jeera/zeera -> jira
+TRANSLITERATION_RULES = [
+    (re.compile(r"[^a-z0-9 ]+"), " "),
+    (re.compile(r"ee"), "i"),
+    (re.compile(r"oo|ou"), "u"),
+    (re.compile(r"aa"), "a"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"sh"), "s"),
+    (re.compile(r"([bcdgjkpt])h"), r"\1"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"z"), "j"),
+    (re.compile(r"q|ck"), "k"),
+    (re.compile(r"y"), "i"),
+    (re.compile(r"([a-z])\1+"), r"\1"),
+    (re.compile(r"\s+"), " "),
+]
+
+# Canonical word as used in recipe titles -> other names people search for it by
+DISH_ALIASES = {
+    "aloo": ["alu", "potato"],
+    "gobi": ["gobhi", "cauliflower"],
+    "palak": ["spinach"],
+    "paneer": ["panir", "cottage cheese"],
+    "chole": ["chhole", "chickpea", "chickpeas"],
+    "rajma": ["kidney bean", "kidney beans"],
+    "dal": ["daal", "dhal", "lentil", "lentils"],
+    "jeera": ["zeera", "cumin"],
+    "biryani": ["biriyani", "briyani", "biriani"],
+    "dosa": ["dosai", "dose"],
+    "makhani": ["makhni"],
+    "tadka": ["tarka", "tadkha"],
+    "chicken": ["murgh", "murg"],
+    "rice": ["chawal"],
+    "curry": ["kari", "salan"],
+}
+
+
+def fold(text):
+    """Unicode-normalised, case-folded text"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def ascii_fold(text):
+    """Case-folded text with accents and other non-ASCII characters dropped"""
+    return unicodedata.normalize("NFKD", fold(text)).encode("ascii", "ignore").decode("ascii")
+
+
+def transliteration_key(text):
+    """Key under which spelling variants of the same words compare equal"""
+    key = ascii_fold(text)
+    for pattern, replacement in TRANSLITERATION_RULES:
+        key = pattern.sub(replacement, key)
+    return key.strip()
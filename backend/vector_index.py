@@ -0,0 +1,422 @@
+"""
+Vector indexes for recipe embeddings
+"""
+
+import copy
+import json
+import os
+
+import numpy as np
+
+
+def normalize_rows(vectors):
+    """L2-normalise each row so a dot product is cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def allowed_ids(allowed, ids):
+    """Which of ``ids`` a boolean mask over ids lets through; ids past its end are excluded"""
+    inside = ids < len(allowed)
+    return inside & allowed[np.where(inside, ids, 0)]
+
+
+class FlatIndex:
+    """Exact cosine similarity over every stored vector"""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def add(self, vectors, ids=None):
+        """Append vectors; ids default to consecutive integers"""
+        vectors = normalize_rows(vectors)
+        if ids is None:
+            start = int(self.ids.max()) + 1 if len(self.ids) else 0
+            ids = np.arange(start, start + len(vectors), dtype=np.int64)
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+
+    def remove(self, ids):
+        """Drop the vectors stored under these ids"""
+        keep = ~np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+        self.vectors, self.ids = self.vectors[keep], self.ids[keep]
+
+    def copy(self):
+        """Copy that can be patched while this index keeps serving queries; add() and remove() never write in place"""
+        return copy.copy(self)
+
+    def search(self, query, k=10, threshold=None, allowed=None):
+        """Return up to k (doc_id, similarity) pairs at or above threshold, best first
+
+        ``allowed`` is an optional boolean mask over ids; other vectors are skipped.
+        """
+        if not len(self.vectors):
+            return []
+        scores = self.vectors @ normalize_rows(query)[0]
+        keep = np.ones(len(scores), dtype=bool) if threshold is None else scores >= threshold
+        if allowed is not None:
+            keep &= allowed_ids(allowed, self.ids)
+        candidates = np.flatnonzero(keep)
+        if not len(candidates):
+            return []
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top]
+
+    def save(self, path):
+        """Write the index as .npy files that load() can memory-map"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "ids.npy"), self.ids)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"type": "flat", "dim": self.dim}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved index; with mmap the vectors stay on disk and are paged in on demand"""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(meta["dim"])
+        mode = "r" if mmap else None
+        index.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        index.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode=mode)
+        return index
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means; returns L2-normalised centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.bincount(assignments, minlength=k) == 0
+        # Re-seed empty clusters from random points so every list stays in use
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class Quantizer:
+    """Stores vectors as float32, float16 or int8 codes with a per-vector scale"""
+
+    DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+    def __init__(self, dtype="float32"):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.dtype = dtype
+
+    def encode(self, vectors):
+        """Return (codes, scales); scales is None unless dtype is int8"""
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.round(vectors / scales[:, None]).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return vectors.astype(self.DTYPES[self.dtype]), None
+
+    def scores(self, codes, scales, query):
+        scores = codes.astype(np.float32, copy=False) @ query
+        if scales is not None:
+            scores *= scales
+        return scores
+
+
+class IVFIndex:
+    """Inverted-file ANN index over L2-normalised vectors
+
+    Vectors are assigned to the nearest of ``nlist`` k-means centroids and a
+    query only scans the ``nprobe`` closest lists. Until ``train_size`` vectors
+    have been added the index is untrained and scans everything exactly.
+
+    Trained lists live in one contiguous array grouped by list (``offsets``
+    marks where each list starts), which is what ``save`` writes and ``load``
+    memory-maps. Vectors added afterwards go to an in-memory tail that is
+    searched alongside the lists and folded in by ``compact``, which ``add``
+    runs once the tail reaches ``max_tail`` vectors or a quarter of the lists.
+    """
+
+    def __init__(self, dim, nlist=None, nprobe=8, dtype="float32", train_size=1024, seed=0, max_tail=4096):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.quantizer = Quantizer(dtype)
+        self.train_size = train_size
+        self.seed = seed
+        self.max_tail = max_tail
+
+        self.centroids = None
+        self.codes = np.zeros((0, dim), dtype=Quantizer.DTYPES[dtype])
+        self.scales = np.zeros(0, dtype=np.float32) if dtype == "int8" else None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+        # Tail of vectors added since the last compact: (list_no, id, vector)
+        self._tail_lists = []
+        self._tail_ids = []
+        self._tail_vectors = []
+        self._next_id = 0
+        # Ids removed from the contiguous arrays but not yet compacted away
+        self._deleted = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids) - len(self._deleted) + len(self._tail_ids)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _assign(self, vectors):
+        if not self.is_trained:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def train(self, vectors):
+        """Fit the coarse quantizer and re-bucket everything already stored"""
+        vectors = normalize_rows(vectors)
+        existing_ids, existing = self._all_vectors()
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        sample = vectors
+        if len(vectors) > 256 * nlist:
+            rng = np.random.default_rng(self.seed)
+            sample = vectors[rng.choice(len(vectors), 256 * nlist, replace=False)]
+        self.centroids = kmeans(sample, nlist, seed=self.seed)
+        self.nlist = nlist
+
+        self.codes = self.codes[:0]
+        self.scales = None if self.scales is None else self.scales[:0]
+        self.ids = self.ids[:0]
+        self._deleted = self._deleted[:0]
+        self.offsets = np.zeros(nlist + 1, dtype=np.int64)
+        self._tail_lists, self._tail_ids, self._tail_vectors = [], [], []
+        if len(existing_ids):
+            self._append(existing, existing_ids)
+            self.compact()
+
+    def _all_vectors(self):
+        """Dequantised copy of every stored vector with its id"""
+        parts, ids = [], []
+        if len(self.ids):
+            decoded = np.asarray(self.codes, dtype=np.float32)
+            if self.scales is not None:
+                decoded = decoded * self.scales[:, None]
+            live = ~np.isin(np.asarray(self.ids), self._deleted)
+            parts.append(decoded[live])
+            ids.append(np.asarray(self.ids)[live])
+        if self._tail_ids:
+            parts.append(np.stack(self._tail_vectors))
+            ids.append(np.asarray(self._tail_ids, dtype=np.int64))
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, self.dim), dtype=np.float32)
+        return np.concatenate(ids), np.vstack(parts)
+
+    def _append(self, vectors, ids):
+        lists = self._assign(vectors)
+        self._tail_lists.extend(lists.tolist())
+        self._tail_ids.extend(ids.tolist())
+        self._tail_vectors.extend(vectors)
+
+    def add(self, vectors, ids=None):
+        """Insert vectors; ids default to consecutive integers"""
+        vectors = normalize_rows(vectors)
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + len(vectors), dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids):
+            self._next_id = max(self._next_id, int(ids.max()) + 1)
+        self._append(vectors, ids)
+        if not self.is_trained and len(self) >= self.train_size:
+            _, everything = self._all_vectors()
+            self.train(everything)
+        # Growing with the lists keeps the copying compact() does amortised over the adds
+        elif len(self._tail_ids) >= max(self.max_tail, len(self.ids) // 4):
+            self.compact()
+
+    def remove(self, ids):
+        """Delete vectors by id
+
+        Tail entries are dropped at once; entries in the contiguous arrays are
+        tombstoned, filtered out of search results and purged by compact().
+        """
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids):
+            return
+        if self._tail_ids:
+            gone = set(ids.tolist())
+            keep = [i for i, doc_id in enumerate(self._tail_ids) if doc_id not in gone]
+            self._tail_lists = [self._tail_lists[i] for i in keep]
+            self._tail_ids = [self._tail_ids[i] for i in keep]
+            self._tail_vectors = [self._tail_vectors[i] for i in keep]
+        stored = ids[np.isin(ids, np.asarray(self.ids))]
+        self._deleted = np.union1d(self._deleted, stored)
+
+    def copy(self):
+        """Copy that can be patched while this index keeps serving queries
+
+        Only the tail lists are extended in place; the contiguous arrays are
+        always replaced, so they are shared.
+        """
+        clone = copy.copy(self)
+        clone._tail_lists = list(self._tail_lists)
+        clone._tail_ids = list(self._tail_ids)
+        clone._tail_vectors = list(self._tail_vectors)
+        return clone
+
+    def compact(self):
+        """Fold the in-memory tail into the contiguous per-list arrays and purge tombstones"""
+        if len(self._deleted):
+            keep = ~np.isin(np.asarray(self.ids), self._deleted)
+            current_lists = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))[keep]
+            self.codes = np.asarray(self.codes)[keep]
+            if self.scales is not None:
+                self.scales = np.asarray(self.scales)[keep]
+            self.ids = np.asarray(self.ids)[keep]
+            self.offsets = np.concatenate(
+                [[0], np.cumsum(np.bincount(current_lists, minlength=len(self.offsets) - 1))]
+            ).astype(np.int64)
+            self._deleted = self._deleted[:0]
+        if not self._tail_ids:
+            return
+        nlist = self.nlist if self.is_trained else 1
+        tail_lists = np.asarray(self._tail_lists, dtype=np.int64)
+        tail_codes, tail_scales = self.quantizer.encode(np.stack(self._tail_vectors))
+        current_lists = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+        lists = np.concatenate([current_lists, tail_lists])
+        order = np.argsort(lists, kind="stable")
+        self.codes = np.concatenate([np.asarray(self.codes), tail_codes])[order]
+        if self.scales is not None:
+            self.scales = np.concatenate([np.asarray(self.scales), tail_scales])[order]
+        self.ids = np.concatenate([np.asarray(self.ids), np.asarray(self._tail_ids, dtype=np.int64)])[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=nlist))]).astype(np.int64)
+        self._tail_lists, self._tail_ids, self._tail_vectors = [], [], []
+
+    def search(self, query, k=10, threshold=None, nprobe=None, allowed=None):
+        """Return up to k (id, similarity) pairs at or above threshold, best first
+
+        ``allowed`` is an optional boolean mask over ids; other vectors are skipped.
+        """
+        query = normalize_rows(query)[0]
+        if self.is_trained:
+            probe = min(nprobe or self.nprobe, self.nlist)
+            centroid_scores = self.centroids @ query
+            lists = np.argpartition(-centroid_scores, probe - 1)[:probe]
+        else:
+            lists = range(len(self.offsets) - 1)
+
+        candidate_ids, candidate_scores = [], []
+        for list_no in lists:
+            start, end = self.offsets[list_no], self.offsets[list_no + 1]
+            if start == end:
+                continue
+            scales = None if self.scales is None else self.scales[start:end]
+            scores = self.quantizer.scores(self.codes[start:end], scales, query)
+            ids = self.ids[start:end]
+            if threshold is not None:
+                keep = scores >= threshold
+                scores, ids = scores[keep], ids[keep]
+            candidate_ids.append(ids)
+            candidate_scores.append(scores)
+
+        if self._tail_ids:
+            probed = set(np.asarray(lists).tolist()) if self.is_trained else None
+            keep = [i for i, list_no in enumerate(self._tail_lists) if probed is None or list_no in probed]
+            if keep:
+                scores = np.stack([self._tail_vectors[i] for i in keep]) @ query
+                ids = np.asarray([self._tail_ids[i] for i in keep], dtype=np.int64)
+                if threshold is not None:
+                    mask = scores >= threshold
+                    scores, ids = scores[mask], ids[mask]
+                candidate_ids.append(ids)
+                candidate_scores.append(scores)
+
+        if not candidate_ids:
+            return []
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        if len(self._deleted):
+            live = ~np.isin(ids, self._deleted)
+            ids, scores = ids[live], scores[live]
+        if allowed is not None:
+            keep = allowed_ids(allowed, ids)
+            ids, scores = ids[keep], scores[keep]
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def save(self, path):
+        """Write the index as .npy files that load() can memory-map"""
+        self.compact()
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "codes.npy"), np.asarray(self.codes))
+        np.save(os.path.join(path, "ids.npy"), np.asarray(self.ids))
+        np.save(os.path.join(path, "offsets.npy"), np.asarray(self.offsets))
+        if self.scales is not None:
+            np.save(os.path.join(path, "scales.npy"), np.asarray(self.scales))
+        if self.is_trained:
+            np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({
+                "type": "ivf",
+                "dim": self.dim,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "dtype": self.quantizer.dtype,
+                "train_size": self.train_size,
+                "max_tail": self.max_tail,
+                "next_id": self._next_id,
+            }, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved index; with mmap the stored vectors stay on disk and are paged in on demand"""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], nlist=meta["nlist"], nprobe=meta["nprobe"],
+                    dtype=meta["dtype"], train_size=meta["train_size"], max_tail=meta.get("max_tail", 4096))
+        mode = "r" if mmap else None
+        index.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode=mode)
+        index.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode=mode)
+        index.offsets = np.load(os.path.join(path, "offsets.npy"))
+        if meta["dtype"] == "int8":
+            index.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode=mode)
+        centroids_path = os.path.join(path, "centroids.npy")
+        if os.path.exists(centroids_path):
+            index.centroids = np.load(centroids_path)
+        index._next_id = meta["next_id"]
+        return index
+
+
+def create_vector_index(dim, kind=None, dtype=None, nprobe=None):
+    """Vector index configured by VECTOR_INDEX_TYPE / VECTOR_INDEX_DTYPE / VECTOR_INDEX_NPROBE"""
+    from .config import settings
+    kind = kind or settings.vector_index_type
+    if kind == "flat":
+        return FlatIndex(dim)
+    if kind == "ivf":
+        return IVFIndex(dim, nprobe=nprobe or settings.vector_index_nprobe,
+                        dtype=dtype or settings.vector_index_dtype)
+    raise ValueError(f"Unknown VECTOR_INDEX_TYPE: {kind}")
+
+
+def load_vector_index(path, mmap=True):
+    """Open an index written by FlatIndex.save() or IVFIndex.save()"""
+    with open(os.path.join(path, "meta.json")) as f:
+        kind = json.load(f).get("type", "ivf")
+    return (FlatIndex if kind == "flat" else IVFIndex).load(path, mmap)
@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for the search, cache and indexing hot paths
+"""
@@ -0,0 +1,210 @@
+"""
+Synthetic recipe corpus and query mix for the benchmarks
+"""
+
+import itertools
+import json
+import random
+
+from backend.transliteration import DISH_ALIASES
+
+SOURCES = {
+    "hk": ("Hebbar's Kitchen", "https://hebbarskitchen.com/"),
+    "ak": ("Archana's Kitchen", "https://www.archanaskitchen.com/"),
+    "ihr": ("Indian Healthy Recipes", "https://www.indianhealthyrecipes.com/"),
+}
+
+# Main ingredient -> (ingredient line, diet)
+MAINS = {
+    "paneer": ("200 g paneer, cubed", "vegetarian"),
+    "chicken": ("500 g chicken", "non-vegetarian"),
+    "mutton": ("500 g mutton", "non-vegetarian"),
+    "fish": ("500 g fish", "non-vegetarian"),
+    "egg": ("4 eggs", "non-vegetarian"),
+    "prawn": ("300 g prawns", "non-vegetarian"),
+    "aloo": ("3 potatoes, cubed", "vegan"),
+    "gobi": ("1 cauliflower, cut into florets", "vegan"),
+    "palak": ("2 bunches spinach", "vegan"),
+    "chole": ("1 cup chickpeas, soaked", "vegan"),
+    "rajma": ("1 cup kidney beans, soaked", "vegan"),
+    "dal": ("1 cup toor dal", "vegan"),
+    "mushroom": ("200 g mushrooms", "vegan"),
+    "bhindi": ("250 g okra", "vegan"),
+    "baingan": ("2 brinjals", "vegan"),
+    "matar": ("1 cup green peas", "vegan"),
+    "rice": ("2 cups basmati rice", "vegan"),
+    "soya": ("1 cup soya chunks", "vegan"),
+}
+
+# Style -> (course, extra ingredient lines, typical minutes)
+STYLES = {
+    "masala": ("main course", ["1 tsp garam masala", "2 tomatoes"], 40),
+    "curry": ("main course", ["1 cup coconut milk", "1 tsp coriander powder"], 45),
+    "tikka": ("appetizer", ["1 cup curd", "1 tsp kashmiri red chilli powder"], 35),
+    "biryani": ("main course", ["2 cups basmati rice", "1 tbsp biryani masala", "pinch of saffron"], 90),
+    "korma": ("main course", ["10 cashews", "1/2 cup cream"], 50),
+    "makhani": ("main course", ["3 tbsp butter", "1/2 cup cream"], 45),
+    "kadai": ("main course", ["1 capsicum", "1 tsp kadai masala"], 35),
+    "fry": ("side dish", ["1 tsp mustard seeds", "10 curry leaves"], 25),
+    "pulao": ("main course", ["2 cups basmati rice", "2 bay leaves"], 40),
+    "paratha": ("breakfast", ["2 cups wheat flour", "2 tbsp ghee"], 30),
+    "sabzi": ("side dish", ["1 tsp jeera", "1/2 tsp turmeric"], 25),
+    "kofta": ("main course", ["1/2 cup besan", "2 tomatoes"], 60),
+    "tadka": ("main course", ["1 tsp jeera", "2 dried red chillies", "1 tbsp ghee"], 30),
+    "roast": ("side dish", ["1 tsp pepper", "10 curry leaves"], 40),
+    "65": ("appetizer", ["2 tbsp corn flour", "10 curry leaves"], 30),
+    "do pyaza": ("main course", ["4 onions", "1 tsp garam masala"], 45),
+}
+
+# Region -> cuisine
+REGIONS = {
+    "": "North Indian",
+    "Punjabi": "Punjabi",
+    "Hyderabadi": "Hyderabadi",
+    "Kerala": "Kerala",
+    "Chettinad": "Chettinad",
+    "Goan": "Goan",
+    "Amritsari": "Punjabi",
+    "Bengali": "Bengali",
+    "Mughlai": "Mughlai",
+    "Andhra": "Andhra",
+}
+
+BASE_INGREDIENTS = [
+    "2 onions, finely chopped", "2 tomatoes, pureed", "1 tbsp ginger garlic paste", "2 green chillies",
+    "1/2 tsp turmeric", "1 tsp red chilli powder", "1 tsp coriander powder", "1 tsp jeera",
+    "2 tbsp oil", "1 tbsp ghee", "1/4 cup coriander leaves", "salt to taste", "1 cup water",
+    "1 tsp lemon juice", "1/2 tsp hing", "1 tsp kasuri methi", "1 inch cinnamon", "4 cloves",
+]
+
+SYLLABLES = ["ma", "na", "ra", "sa", "ka", "ta", "la", "va", "ni", "di", "pu", "ri", "shi", "mi", "go", "ya"]
+
+STEP_TEMPLATES = [
+    "Heat {fat} in a pan and add {spice}.",
+    "Add {base} and saute until soft.",
+    "Add the {main} and cook for {minutes} minutes.",
+    "Stir in {extra} and simmer on low heat.",
+    "Garnish with {garnish} and serve hot with {side}.",
+    "Season with salt, cover and cook until the {main} is tender.",
+]
+
+
+def _zipf_weights(n, s):
+    """Cumulative Zipf weights over n ranks, for random.choices"""
+    return list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+
+
+def _style_words(count, seed):
+    # Made-up household names ("Ramani's", "Kadivi's") that grow the vocabulary like a real corpus
+    rng = random.Random(seed)
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title() for _ in range(count)]
+
+
+def generate(count, seed=0):
+    """Yield ``count`` recipes shaped like the scraped ones, deterministically for a seed
+
+    Dishes combine a region, main ingredient and style, with a long tail of
+    household-style titles, so titles repeat across sources the way the
+    real sites do while the vocabulary keeps growing with the corpus.
+    """
+    rng = random.Random(seed)
+    households = _style_words(max(100, count // 20), seed)
+    mains, styles, regions, sources = list(MAINS), list(STYLES), list(REGIONS), list(SOURCES)
+    main_weights, style_weights = _zipf_weights(len(mains), 0.8), _zipf_weights(len(styles), 0.8)
+    region_weights, household_weights = _zipf_weights(len(regions), 1.0), _zipf_weights(len(households), 0.6)
+    for i in range(count):
+        main = rng.choices(mains, cum_weights=main_weights)[0]
+        style = rng.choices(styles, cum_weights=style_weights)[0]
+        region = rng.choices(regions, cum_weights=region_weights)[0]
+        words = [region, main.title(), style.title()]
+        if rng.random() < 0.3:
+            words.insert(0, f"{rng.choices(households, cum_weights=household_weights)[0]}'s")
+        title = " ".join(word for word in words if word)
+        main_line, diet = MAINS[main]
+        course, extras, minutes = STYLES[style]
+        ingredients = [main_line] + extras + rng.sample(BASE_INGREDIENTS, rng.randint(4, 10))
+        steps = [
+            template.format(fat=rng.choice(["oil", "ghee", "butter"]), spice=rng.choice(["jeera", "mustard seeds"]),
+                            base=rng.choice(["onions", "ginger garlic paste", "tomatoes"]), main=main,
+                            minutes=rng.randint(5, 20), extra=extras[0].split(" ", 2)[-1],
+                            garnish=rng.choice(["coriander leaves", "cream", "fried onions"]),
+                            side=rng.choice(["rice", "roti", "naan", "paratha"]))
+            for template in STEP_TEMPLATES[:rng.randint(3, len(STEP_TEMPLATES))]
+        ]
+        prefix = sources[i % len(sources)]
+        name, site = SOURCES[prefix]
+        slug = "-".join(title.lower().replace("'", "").split())
+        yield {
+            "id": f"{prefix}-{slug}-{i}",
+            "title": title,
+            "source": name,
+            "url": f"{site}{slug}-{i}/",
+            "description": f"{title} made the {REGIONS[region]} way.",
+            "diet": diet,
+            "cuisine": REGIONS[region],
+            "course": course,
+            "difficulty": rng.choice(["easy", "medium", "hard"]),
+            "cook_time_minutes": max(10, minutes + rng.randint(-15, 30)),
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+            "ingredients": ingredients,
+            "steps": steps,
+        }
+
+
+def write(path, count, seed=0):
+    """Write a generated corpus as the JSON array the backend reads"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, recipe in enumerate(generate(count, seed)):
+            f.write(("," if i else "") + json.dumps(recipe, ensure_ascii=False))
+        f.write("]")
+
+
+def _typo(word, rng):
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+
+def queries(recipes, count, seed=0):
+    """A mix of what people type: dish names, partial names, filler words, typos and alias spellings"""
+    rng = random.Random(seed)
+    titles = [recipe["title"] for recipe in recipes if recipe]
+    mix = []
+    for _ in range(count):
+        words = rng.choice(titles).lower().replace("'s", "").split()
+        kind = rng.random()
+        if kind < 0.3:
+            query = " ".join(words[-2:])
+        elif kind < 0.45:
+            query = " ".join(words) + " recipe"
+        elif kind < 0.6:
+            query = " ".join(_typo(word, rng) for word in words[-2:])
+        elif kind < 0.75:
+            query = " ".join(rng.choice(DISH_ALIASES[word]) if word in DISH_ALIASES else word for word in words)
+        elif kind < 0.9:
+            query = words[-1]
+        else:
+            query = " ".join(words)
+        mix.append(query)
+    return mix
+
+
+def prefixes(queries, seed=0):
+    """Partially typed versions of queries, as the typeahead sees them"""
+    rng = random.Random(seed)
+    return [query[:rng.randint(2, max(2, len(query)))] for query in queries]
+
+
+def pantries(recipes, count, seed=0):
+    """Ingredient lists to ask "what can I cook" with, part of a recipe plus a few strays"""
+    rng = random.Random(seed)
+    recipes = [recipe for recipe in recipes if recipe]
+    stray = [line.split(",")[0] for line in BASE_INGREDIENTS]
+    return [
+        rng.sample(recipe["ingredients"], min(len(recipe["ingredients"]), rng.randint(2, 5))) + rng.sample(stray, 2)
+        for recipe in (rng.choice(recipes) for _ in range(count))
+    ]
@@ -0,0 +1,343 @@
+"""
+Offline benchmark suite: index build, query latency, incremental refresh, cache paths, dedup and memory
+
+Runs against generated corpora (see benchmarks.corpus), with no network,
+Redis or model download, and writes the results as JSON. Given a baseline
+written by an earlier run, it compares every metric against it and exits
+non-zero if any regressed by more than the tolerance.
+
+    python -m benchmarks.run --sizes 1000,10000
+    python -m benchmarks.run --sizes 100000,1000000 --queries 100 --output big_results.json
+    python -m benchmarks.run --sizes 1000,10000 --update-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from backend.cache import LocalRedis, SearchCache
+from backend.config import settings
+from backend.dedup import RecipeDeduplicator
+from backend.embeddings import EmbeddingService, HashingEncoder
+from backend.hybrid import MODES
+from backend.services import LoadProgress, RecipeSearchService
+from backend.shared_index import SharedIndex
+
+from . import corpus
+
+DEFAULT_SIZES = "1000,10000"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# A metric only regresses if it also got worse by more than this, whatever the tolerance,
+# so sub-millisecond timings do not flap on scheduler noise
+NOISE_FLOORS = {"_ms": 0.2, "_s": 0.05, "_mb": 5.0}
+# Reported but never failed on: a p99 over a few hundred queries rests on a handful of samples
+UNGATED = (".p99_ms",)
+
+# Searches with a filter, as picked from the facet panel
+FILTERS = {"diet": "veg", "time": ["under_30_min", "30_to_60_min"]}
+
+
+class PhaseTimer(LoadProgress):
+    """LoadProgress that also records the seconds spent in each phase it is told about"""
+
+    def __init__(self):
+        super().__init__()
+        self.seconds = {}
+        self._phase_started = time.perf_counter()
+
+    def step(self, phase, done=0, total=0):
+        if phase != self.phase:
+            now = time.perf_counter()
+            self.seconds[self.phase] = self.seconds.get(self.phase, 0.0) + now - self._phase_started
+            self._phase_started = now
+        super().step(phase, done, total)
+
+
+def rss_mb():
+    """Resident memory of this process, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def disk_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2 ** 20
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2 ** 20
+
+
+def latencies(call, args, rounds, warmup=10):
+    """Milliseconds per call over args in each of ``rounds`` passes, after a few untimed warm-up calls"""
+    for arg in args[:warmup]:
+        call(arg)
+    passes = []
+    for _ in range(rounds):
+        timings = []
+        for arg in args:
+            started = time.perf_counter()
+            call(arg)
+            timings.append((time.perf_counter() - started) * 1000)
+        passes.append(timings)
+    return passes
+
+
+def summarize(metrics, name, passes):
+    """Record p50/p95/p99, each the best over the passes, since noise only ever adds time"""
+    percentiles = np.percentile(np.asarray(passes), [50, 95, 99], axis=1).min(axis=1)
+    for label, value in zip(("p50", "p95", "p99"), percentiles):
+        metrics[f"{name}.{label}_ms"] = round(float(value), 4)
+
+
+async def cache_paths(service, queries, rounds):
+    """Miss, L1-hit and L2-hit latencies of search_async through a SearchCache over an in-process Redis"""
+    passes = {"miss": [], "l1_hit": [], "l2_hit": []}
+    try:
+        for _ in range(rounds):
+            # A fresh cache each round, so its first pass really misses
+            service.cache = SearchCache(LocalRedis())
+            for path, timings in passes.items():
+                timings.append([])
+                for query in queries:
+                    if path == "l2_hit":
+                        service.cache.clear_local()
+                    started = time.perf_counter()
+                    await service.search_async(query)
+                    timings[-1].append((time.perf_counter() - started) * 1000)
+    finally:
+        service.cache = None
+    return passes
+
+
+def mutate(recipes, seed):
+    """The corpus after a typical scrape: 1% of recipes edited, 0.5% deleted and 0.5% new"""
+    edited = [dict(recipe, steps=recipe["steps"] + ["Rest for 5 minutes before serving."]) if i % 100 == 0
+              else recipe for i, recipe in enumerate(recipes)]
+    kept = [recipe for i, recipe in enumerate(edited) if i % 200 != 1]
+    new = corpus.generate(max(1, len(recipes) // 200), seed + 1)
+    added = [dict(recipe, id=f"new-{recipe['id']}") for recipe in new]
+    return kept + added
+
+
+def run_size(size, options):
+    """Every benchmark for one corpus size; run in a fresh process so memory figures are its own"""
+    logging.basicConfig(level=logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="snapchef-bench-")
+    metrics, info = {}, {"recipes": size}
+    # The generated dishes are templated closely enough to collapse into a few thousand clusters,
+    # so the index benchmarks run on the whole corpus and dedup is timed on its own below
+    dedup_enabled, settings.dedup_enabled = settings.dedup_enabled, False
+    try:
+        corpus_path = os.path.join(workdir, "recipes.json")
+        started = time.perf_counter()
+        corpus.write(corpus_path, size, options["seed"])
+        info["generate_s"] = round(time.perf_counter() - started, 3)
+        info["corpus_mb"] = round(disk_mb(corpus_path), 2)
+
+        # Near-duplicate detection from scratch, then from signatures a previous process stored
+        with open(corpus_path, encoding="utf-8") as f:
+            generated = json.load(f)
+        signatures_path = os.path.join(workdir, "dedup_signatures")
+        started = time.perf_counter()
+        info["dedup_recipes"] = len(RecipeDeduplicator(store_path=signatures_path).deduplicate(generated))
+        metrics["dedup.full_s"] = round(time.perf_counter() - started, 4)
+        started = time.perf_counter()
+        RecipeDeduplicator(store_path=signatures_path).deduplicate(generated)
+        metrics["dedup.cached_s"] = round(time.perf_counter() - started, 4)
+        del generated
+
+        # Full build, timed per phase through the service's own load progress
+        rss_before = rss_mb()
+        encoder = EmbeddingService(HashingEncoder(), store_path=os.path.join(workdir, "embeddings"))
+        service = RecipeSearchService(corpus_path=corpus_path, encoder=encoder,
+                                      manifest_path=os.path.join(workdir, "manifest.json"), load=False)
+        service.loading = timer = PhaseTimer()
+        started = time.perf_counter()
+        service.reload(full=True)
+        metrics["build.total_s"] = round(time.perf_counter() - started, 4)
+        for phase, seconds in timer.seconds.items():
+            if phase != "starting":
+                metrics[f"build.{phase}_s"] = round(seconds, 4)
+        if rss_before is not None:
+            metrics["memory.indexes_mb"] = round(rss_mb() - rss_before, 1)
+
+        # Query latency per retrieval mode and endpoint, caching off
+        recipes = [recipe for recipe in service.state.recipes if recipe is not None]
+        queries = corpus.queries(recipes, options["queries"], options["seed"])
+        pantries = corpus.pantries(recipes, options["queries"], options["seed"])
+        rounds = options["rounds"]
+        for mode in MODES:
+            summarize(metrics, f"query.{mode}", latencies(lambda q: service.search(q, mode=mode), queries, rounds))
+        summarize(metrics, "query.filtered",
+                  latencies(lambda q: service.search(q, filters=FILTERS), queries, rounds))
+        summarize(metrics, "query.pantry", latencies(service.search_by_ingredients, pantries, rounds))
+        summarize(metrics, "query.suggest",
+                  latencies(lambda q: service.suggest(q, 8), corpus.prefixes(queries, options["seed"]), rounds))
+
+        passes = asyncio.run(cache_paths(service, list(dict.fromkeys(queries)), rounds))
+        for path, timings in passes.items():
+            summarize(metrics, f"cache.{path}", timings)
+
+        # Incremental refresh after a typical scrape, then a refresh with nothing to do
+        with open(corpus_path, "w", encoding="utf-8") as f:
+            json.dump(mutate(recipes, options["seed"]), f, ensure_ascii=False)
+        started = time.perf_counter()
+        info["refresh"] = service.reload()
+        metrics["refresh.incremental_s"] = round(time.perf_counter() - started, 4)
+        started = time.perf_counter()
+        service.reload()
+        metrics["refresh.noop_s"] = round(time.perf_counter() - started, 4)
+
+        # Snapshot written for shared workers, and a cold start that maps it instead of rebuilding
+        shared = SharedIndex(os.path.join(workdir, "snapshots"))
+        service.shared = shared
+        service.loading = timer = PhaseTimer()
+        service.reload(full=True)
+        metrics["snapshot.write_s"] = round(timer.seconds["writing_snapshot"], 4)
+        metrics["snapshot.disk_mb"] = round(disk_mb(shared.path), 2)
+        started = time.perf_counter()
+        cold = RecipeSearchService(corpus_path=corpus_path, encoder=encoder,
+                                   manifest_path=os.path.join(workdir, "manifest.json"), shared=shared)
+        metrics["startup.snapshot_s"] = round(time.perf_counter() - started, 4)
+        info["startup_attached"] = cold.generation == service.generation
+
+        peak = peak_rss_mb()
+        if peak is not None:
+            metrics["memory.peak_mb"] = round(peak, 1)
+    finally:
+        settings.dedup_enabled = dedup_enabled
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"metrics": metrics, "info": info}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """(rows, regressions) comparing every metric present in both runs; lower is better for all of them"""
+    rows, regressions = [], []
+    for size, current in results["sizes"].items():
+        previous = baseline.get("sizes", {}).get(size)
+        if previous is None:
+            continue
+        for name, value in current["metrics"].items():
+            before = previous["metrics"].get(name)
+            if before is None:
+                continue
+            floor = next((floor for suffix, floor in NOISE_FLOORS.items() if name.endswith(suffix)), 0.0)
+            regressed = (value > before * (1 + tolerance) and value - before > floor
+                         and not name.endswith(UNGATED))
+            change = (value - before) / before * 100 if before else 0.0
+            row = (size, name, before, value, change, regressed)
+            rows.append(row)
+            if regressed:
+                regressions.append(row)
+    return rows, regressions
+
+
+def print_comparison(rows):
+    print(f"{'size':>8}  {'metric':<32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for size, name, before, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{size:>8}  {name:<32} {before:>12.4f} {value:>12.4f} {change:>8.1f}%{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline SnapChef benchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated corpus sizes, e.g. 1000,10000,100000,1000000 (default {DEFAULT_SIZES})")
+    parser.add_argument("--queries", type=int, default=300, help="Queries timed per benchmark (default 300)")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Passes over the queries per latency benchmark, keeping the best (default 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated corpus and queries")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Allowed slowdown as a fraction of the baseline before a metric fails (default 0.3)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    options = {"queries": args.queries, "rounds": args.rounds, "seed": args.seed}
+    results = {"environment": environment(), "options": options, "sizes": {}}
+    context = multiprocessing.get_context("spawn")
+    for size in sizes:
+        print(f"Benchmarking {size} recipes...", flush=True)
+        with context.Pool(1) as pool:
+            results["sizes"][str(size)] = pool.apply(run_size, (size, options))
+        metrics = results["sizes"][str(size)]["metrics"]
+        print(f"  build {metrics['build.total_s']:.2f}s, hybrid p50 {metrics['query.hybrid.p50_ms']:.2f}ms, "
+              f"refresh {metrics['refresh.incremental_s']:.2f}s, snapshot start {metrics['startup.snapshot_s']:.2f}s")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    changed = [key for key in ("platform", "cpus", "python", "numpy")
+               if baseline.get("environment", {}).get(key) != results["environment"][key]]
+    if changed:
+        print(f"Warning: the baseline was recorded with a different {', '.join(changed)}; "
+              f"timings are only comparable on the same machine")
+    rows, regressions = compare(results, baseline, args.tolerance)
+    print_comparison(rows)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
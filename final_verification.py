@@ -4,10 +4,36 @@ Final verification script for SnapChef demo
 Ensures all systems are working for judges
 """
 
+import argparse
+import asyncio
+import random
 import requests
 import json
+import math
 import time
 
+import httpx
+
+# Weighted query mix replayed by the load mode: (query, weight)
+LOAD_QUERY_MIX = [
+    ("biryani", 30),
+    ("paneer", 20),
+    ("dal", 15),
+    ("curry", 15),
+    ("rice", 10),
+    ("chicken biryani", 5),
+    ("dal makhani", 5),
+]
+
+# Share of traffic sent to each endpoint: (name, method, path, weight)
+LOAD_ENDPOINT_MIX = [
+    ("search", "POST", "/search", 80),
+    ("popular", "GET", "/recipes/popular", 10),
+    ("stats", "GET", "/stats", 10),
+]
+
+SEARCH_LATENCY_TARGET_MS = 1000
+
 def test_all_endpoints():
     """Test all API endpoints comprehensively"""
     base_url = "http://localhost:8000"
@@ -160,9 +186,193 @@ def test_all_endpoints():
     
     return True
 
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+class LoadPlan:
+    """Draws the next request from the weighted endpoint and query mixes"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.endpoints = [e[:3] for e in LOAD_ENDPOINT_MIX]
+        self.endpoint_weights = [e[3] for e in LOAD_ENDPOINT_MIX]
+        self.queries = [q for q, _ in LOAD_QUERY_MIX]
+        self.query_weights = [w for _, w in LOAD_QUERY_MIX]
+
+    def next_request(self):
+        name, method, path = self.rng.choices(self.endpoints, self.endpoint_weights)[0]
+        body = None
+        if method == "POST":
+            query = self.rng.choices(self.queries, self.query_weights)[0]
+            body = {"dish_name": query}
+        return name, method, path, body
+
+class LoadStats:
+    """Per-endpoint latency samples and error counters"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.status_codes = {}
+
+    def record(self, endpoint, latency_ms, status):
+        self.latencies.setdefault(endpoint, []).append(latency_ms)
+        codes = self.status_codes.setdefault(endpoint, {})
+        codes[str(status)] = codes.get(str(status), 0) + 1
+        if status != 200:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        report = {}
+        all_latencies = []
+        all_errors = 0
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            all_latencies.extend(samples)
+            errors = self.errors.get(endpoint, 0)
+            all_errors += errors
+            report[endpoint] = self._summarize(samples, errors, elapsed)
+            report[endpoint]["status_codes"] = self.status_codes.get(endpoint, {})
+        report["overall"] = self._summarize(sorted(all_latencies), all_errors, elapsed)
+        return report
+
+    @staticmethod
+    def _summarize(samples, errors, elapsed):
+        count = len(samples)
+        return {
+            "requests": count,
+            "errors": errors,
+            "error_rate": errors / count if count else 0.0,
+            "throughput_rps": count / elapsed if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+                "max": samples[-1] if samples else 0.0,
+                "mean": sum(samples) / count if count else 0.0,
+            },
+        }
+
+async def _load_worker(client, plan, stats, deadline, tickets):
+    """Issue requests until the deadline (closed loop) or the tickets run out (open loop)"""
+    while True:
+        if tickets is not None:
+            scheduled = await tickets.get()
+            if scheduled is None:
+                return
+        else:
+            scheduled = time.perf_counter()
+            if scheduled >= deadline:
+                return
+
+        endpoint, method, path, body = plan.next_request()
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        # In open-loop mode latency is measured from the scheduled send time so
+        # that queueing behind a slow server is not hidden (coordinated omission)
+        stats.record(endpoint, (time.perf_counter() - scheduled) * 1000, status)
+
+async def _schedule_tickets(tickets, rps, deadline, workers):
+    """Release one ticket every 1/rps seconds until the deadline"""
+    interval = 1.0 / rps
+    next_send = time.perf_counter()
+    while next_send < deadline:
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tickets.put_nowait(next_send)
+        next_send += interval
+    for _ in range(workers):
+        tickets.put_nowait(None)
+
+async def run_load_test(base_url, concurrency=50, rps=None, duration=30, timeout=10, seed=None):
+    """Replay the weighted query mix against the API and return the latency report"""
+    plan = LoadPlan(seed)
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        tickets = asyncio.Queue() if rps else None
+
+        tasks = [
+            asyncio.create_task(_load_worker(client, plan, stats, deadline, tickets))
+            for _ in range(concurrency)
+        ]
+        if tickets is not None:
+            tasks.append(asyncio.create_task(_schedule_tickets(tickets, rps, deadline, concurrency)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "base_url": base_url,
+        "mode": "open-loop" if rps else "closed-loop",
+        "concurrency": concurrency,
+        "target_rps": rps,
+        "duration_s": elapsed,
+        "query_mix": dict(LOAD_QUERY_MIX),
+        "endpoint_mix": {name: weight for name, _, _, weight in LOAD_ENDPOINT_MIX},
+        "endpoints": stats.summary(elapsed),
+    }
+
+def print_load_report(report):
+    """Print the per-endpoint latency table"""
+    print(f"\n📊 Load Test Results ({report['mode']}, {report['concurrency']} workers, {report['duration_s']:.1f}s)")
+    print("=" * 60)
+    for endpoint, data in report["endpoints"].items():
+        latency = data["latency_ms"]
+        print(f"   {endpoint:<8} {data['requests']:>7} req  {data['throughput_rps']:>8.1f} req/s  "
+              f"p50 {latency['p50']:>7.1f}ms  p95 {latency['p95']:>7.1f}ms  p99 {latency['p99']:>7.1f}ms  "
+              f"errors {data['error_rate'] * 100:.2f}%")
+
+    search = report["endpoints"].get("search")
+    if search and search["requests"]:
+        p95 = search["latency_ms"]["p95"]
+        if p95 < SEARCH_LATENCY_TARGET_MS:
+            print(f"\n   ✅ Search p95 {p95:.1f}ms is within the {SEARCH_LATENCY_TARGET_MS}ms target")
+        else:
+            print(f"\n   ❌ Search p95 {p95:.1f}ms exceeds the {SEARCH_LATENCY_TARGET_MS}ms target")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SnapChef final verification")
+    parser.add_argument("--load", action="store_true", help="run the concurrent load test instead of the functional checks")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50, help="number of concurrent workers / pooled connections")
+    parser.add_argument("--rps", type=float, default=None, help="fixed request rate (open loop); omit for closed loop")
+    parser.add_argument("--duration", type=float, default=30, help="test duration in seconds")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the query mix")
+    parser.add_argument("--output", default="load_test_results.json")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    success = test_all_endpoints()
-    if success:
-        print("\n✅ All systems operational - Demo ready!")
+    args = parse_args()
+    if args.load:
+        print("🍳 SnapChef Load Test")
+        print("=" * 60)
+        report = asyncio.run(run_load_test(
+            args.base_url,
+            concurrency=args.concurrency,
+            rps=args.rps,
+            duration=args.duration,
+            timeout=args.timeout,
+            seed=args.seed,
+        ))
+        print_load_report(report)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📊 Load test results saved to {args.output}")
     else:
-        print("\n❌ Some issues detected - Please check logs")
+        success = test_all_endpoints()
+        if success:
+            print("\n✅ All systems operational - Demo ready!")
+        else:
+            print("\n❌ Some issues detected - Please check logs")
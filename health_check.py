@@ -4,50 +4,282 @@ SnapChef Health Check Script
 Monitors the health of all services
 """
 
-import requests
+import argparse
+import asyncio
+import math
 import time
 import json
+from collections import deque
 from datetime import datetime
 
+import httpx
+
+# Every service is probed concurrently; each gets its own deadline so the
+# whole run takes as long as the slowest single timeout
+SERVICES = {
+    "frontend": {"type": "http", "url": "http://localhost:3000", "timeout": 5},
+    "backend": {"type": "http", "url": "http://localhost:8000/health", "timeout": 5},
+    "redis": {"type": "redis", "host": "localhost", "port": 6379, "timeout": 2},
+    "elasticsearch": {"type": "http", "url": "http://localhost:9200/_cluster/health", "timeout": 5}
+}
+
+REDIS_PING = b"*1\r\n$4\r\nPING\r\n"
+
+async def probe_http(client, config):
+    """Probe an HTTP service"""
+    response = await client.get(config["url"])
+    if response.status_code == 200:
+        return {
+            "status": "healthy",
+            "response_time": response.elapsed.total_seconds(),
+            "timestamp": datetime.now().isoformat()
+        }
+    return {
+        "status": "unhealthy",
+        "status_code": response.status_code,
+        "timestamp": datetime.now().isoformat()
+    }
+
+class RedisConnection:
+    """Raw-socket RESP connection that can be kept open between probes"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def ping(self):
+        """Send PING and return the raw reply line"""
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            self.writer.write(REDIS_PING)
+            await self.writer.drain()
+            reply = await self.reader.readline()
+        except BaseException:
+            # Never reuse a connection with a half-read reply on it
+            self.close()
+            raise
+        if not reply:
+            self.close()
+        return reply
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+async def probe_redis(config, connection=None):
+    """Send a RESP PING over a raw socket and time the round trip"""
+    own_connection = connection is None
+    if own_connection:
+        connection = RedisConnection(config["host"], config["port"])
+    started = time.perf_counter()
+    try:
+        reply = await connection.ping()
+    finally:
+        if own_connection:
+            connection.close()
+    elapsed = time.perf_counter() - started
+
+    if reply.strip() == b"+PONG":
+        return {
+            "status": "healthy",
+            "response_time": elapsed,
+            "timestamp": datetime.now().isoformat()
+        }
+    return {
+        "status": "unhealthy",
+        "message": reply.decode(errors="replace").strip() or "connection closed",
+        "timestamp": datetime.now().isoformat()
+    }
+
+async def probe_service(client, config, redis_connection=None):
+    """Run one probe under its own deadline"""
+    try:
+        if config["type"] == "redis":
+            probe = probe_redis(config, redis_connection)
+        else:
+            probe = probe_http(client, config)
+        return await asyncio.wait_for(probe, timeout=config["timeout"])
+    except asyncio.TimeoutError:
+        return {
+            "status": "error",
+            "error": f"timed out after {config['timeout']}s",
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": str(e) or type(e).__name__,
+            "timestamp": datetime.now().isoformat()
+        }
+
+async def check_service_health_async(services=None, client=None, redis_connections=None):
+    """Probe all services concurrently"""
+    services = services or SERVICES
+    redis_connections = redis_connections or {}
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient()
+    try:
+        results = await asyncio.gather(
+            *(probe_service(client, config, redis_connections.get(name))
+              for name, config in services.items())
+        )
+    finally:
+        if own_client:
+            await client.aclose()
+    return dict(zip(services, results))
+
 def check_service_health():
     """Check health of all services"""
-    services = {
-        "frontend": "http://localhost:3000",
-        "backend": "http://localhost:8000/health",
-        "redis": "http://localhost:6379",
-        "elasticsearch": "http://localhost:9200/_cluster/health"
-    }
-    
-    health_status = {}
-    
-    for service, url in services.items():
+    return asyncio.run(check_service_health_async())
+
+def print_health(health):
+    """Print one line per service"""
+    for service, status in health.items():
+        if status["status"] == "healthy":
+            print(f"✅ {service.upper()}: {status['status']} ({status['response_time']:.2f}s)")
+        elif status["status"] == "unhealthy":
+            detail = f"HTTP {status['status_code']}" if "status_code" in status else status.get("message")
+            print(f"❌ {service.upper()}: {status['status']} ({detail})")
+        else:
+            print(f"⚠️  {service.upper()}: {status['status']} - {status.get('error', 'Unknown error')}")
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+class ServiceHistory:
+    """Bounded ring buffer of the most recent probes of one service"""
+
+    def __init__(self, window):
+        self.probes = deque(maxlen=window)
+        self.total_probes = 0
+        self.total_failures = 0
+
+    def add(self, status):
+        healthy = status["status"] == "healthy"
+        self.probes.append((healthy, status.get("response_time")))
+        self.total_probes += 1
+        if not healthy:
+            self.total_failures += 1
+
+    def summary(self):
+        """Rolling latency percentiles and uptime over the window"""
+        times = sorted(t for ok, t in self.probes if ok and t is not None)
+        up = sum(1 for ok, _ in self.probes if ok)
+        return {
+            "window": len(self.probes),
+            "uptime_ratio": up / len(self.probes) if self.probes else None,
+            "p50": percentile(times, 50),
+            "p95": percentile(times, 95),
+            "max": times[-1] if times else None,
+            "probes_total": self.total_probes,
+            "failures_total": self.total_failures
+        }
+
+def render_prometheus(services, histories, latest):
+    """Render the rolling summaries in the Prometheus text exposition format"""
+    lines = [
+        "# HELP snapchef_service_up Whether the last probe succeeded",
+        "# TYPE snapchef_service_up gauge",
+        "# HELP snapchef_service_uptime_ratio Share of healthy probes in the rolling window",
+        "# TYPE snapchef_service_uptime_ratio gauge",
+        "# HELP snapchef_service_response_seconds Rolling probe response time",
+        "# TYPE snapchef_service_response_seconds summary",
+        "# HELP snapchef_service_probes_total Probes run since start",
+        "# TYPE snapchef_service_probes_total counter",
+        "# HELP snapchef_service_failures_total Failed probes since start",
+        "# TYPE snapchef_service_failures_total counter"
+    ]
+    for service in services:
+        label = f'service="{service}"'
+        summary = histories[service].summary()
+        up = 1 if latest.get(service, {}).get("status") == "healthy" else 0
+        lines.append(f"snapchef_service_up{{{label}}} {up}")
+        if summary["uptime_ratio"] is not None:
+            lines.append(f"snapchef_service_uptime_ratio{{{label}}} {summary['uptime_ratio']:.4f}")
+        for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("1", "max")):
+            if summary[key] is not None:
+                lines.append(f'snapchef_service_response_seconds{{{label},quantile="{quantile}"}} {summary[key]:.6f}')
+        lines.append(f"snapchef_service_probes_total{{{label}}} {summary['probes_total']}")
+        lines.append(f"snapchef_service_failures_total{{{label}}} {summary['failures_total']}")
+    return "\n".join(lines) + "\n"
+
+async def serve_metrics(port, render):
+    """Serve GET /metrics with a minimal HTTP/1.0 responder"""
+    async def handle(reader, writer):
         try:
-            if service == "redis":
-                # Redis doesn't have HTTP endpoint, skip for now
-                health_status[service] = {"status": "unknown", "message": "Redis check not implemented"}
-                continue
-            
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                health_status[service] = {
-                    "status": "healthy",
-                    "response_time": response.elapsed.total_seconds(),
-                    "timestamp": datetime.now().isoformat()
-                }
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if request_line.split(b" ")[1:2] == [b"/metrics"]:
+                body = render().encode()
+                head = b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
             else:
-                health_status[service] = {
-                    "status": "unhealthy",
-                    "status_code": response.status_code,
-                    "timestamp": datetime.now().isoformat()
-                }
-        except Exception as e:
-            health_status[service] = {
-                "status": "error",
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            }
-    
-    return health_status
+                body = b"not found\n"
+                head = b"HTTP/1.0 404 Not Found\r\nContent-Type: text/plain\r\n"
+            writer.write(head + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "0.0.0.0", port)
+
+async def watch(interval=5.0, window=120, jsonl_path=None, metrics_port=None, services=None):
+    """Probe on an interval, keeping sessions open and a rolling history per service"""
+    services = services or SERVICES
+    histories = {name: ServiceHistory(window) for name in services}
+    latest = {}
+    redis_connections = {
+        name: RedisConnection(config["host"], config["port"])
+        for name, config in services.items() if config["type"] == "redis"
+    }
+    limits = httpx.Limits(max_keepalive_connections=len(services), keepalive_expiry=max(30, interval * 3))
+
+    server = None
+    if metrics_port:
+        server = await serve_metrics(metrics_port, lambda: render_prometheus(services, histories, latest))
+        print(f"📈 Metrics available at http://localhost:{metrics_port}/metrics")
+
+    async with httpx.AsyncClient(limits=limits) as client:
+        try:
+            while True:
+                started = time.monotonic()
+                health = await check_service_health_async(services, client, redis_connections)
+                latest.update(health)
+                record = {"timestamp": datetime.now().isoformat(), "services": {}}
+                for service, status in health.items():
+                    histories[service].add(status)
+                    record["services"][service] = dict(status, rolling=histories[service].summary())
+
+                if jsonl_path:
+                    with open(jsonl_path, 'a') as f:
+                        f.write(json.dumps(record) + "\n")
+
+                print(f"\n🏥 {record['timestamp']}")
+                print_health(health)
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            for connection in redis_connections.values():
+                connection.close()
+            if server is not None:
+                server.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SnapChef health check")
+    parser.add_argument("--watch", action="store_true", help="keep probing on an interval")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between probe rounds")
+    parser.add_argument("--window", type=int, default=120, help="probes kept per service for rolling stats")
+    parser.add_argument("--jsonl", default="health_history.jsonl", help="append-only probe history (empty to disable)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus text metrics on this port")
+    return parser.parse_args()
 
 def main():
     """Main health check function"""
@@ -55,14 +287,7 @@ def main():
     print("=" * 60)
     
     health = check_service_health()
-    
-    for service, status in health.items():
-        if status["status"] == "healthy":
-            print(f"✅ {service.upper()}: {status['status']} ({status['response_time']:.2f}s)")
-        elif status["status"] == "unhealthy":
-            print(f"❌ {service.upper()}: {status['status']} (HTTP {status['status_code']})")
-        else:
-            print(f"⚠️  {service.upper()}: {status['status']} - {status.get('error', 'Unknown error')}")
+    print_health(health)
     
     # Save health status to file
     with open('health_status.json', 'w') as f:
@@ -71,4 +296,11 @@ def main():
     print(f"\n📊 Health status saved to health_status.json")
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.watch:
+        try:
+            asyncio.run(watch(args.interval, args.window, args.jsonl or None, args.metrics_port))
+        except KeyboardInterrupt:
+            print("\n👋 Health monitor stopped")
+    else:
+        main()
@@ -0,0 +1,3 @@
+"""
+SnapChef indexing pipeline
+"""
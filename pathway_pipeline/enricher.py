@@ -0,0 +1,63 @@
+"""
+Offline enrichment stage: generates recipe details once per recipe version
+"""
+
+import asyncio
+import logging
+import time
+
+from backend.manifest import fingerprint
+from backend.rag import missing_fields
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentStage:
+    """Fills the enrichment store ahead of search traffic
+
+    Recipes that are missing details and whose content hash has no stored
+    enrichment go through the RAGService in chunks, which caps the number of
+    concurrent generations and writes each result to its store.
+    """
+
+    def __init__(self, rag, chunk_size=100):
+        self.rag = rag
+        self.chunk_size = chunk_size
+        self.seen = 0
+        self.already_stored = 0
+        self.generated = 0
+        self.failed = 0
+        self.last_run_seconds = 0.0
+
+    async def run(self, recipes):
+        """Return the recipes with stored or newly generated details merged in"""
+        started = time.monotonic()
+        recipes = list(recipes)
+        self.seen += len(recipes)
+        incomplete = [fingerprint(recipe) for recipe in recipes if missing_fields(recipe)]
+        todo = await asyncio.to_thread(self.rag.store.missing, incomplete)
+        self.already_stored += len(incomplete) - len(todo)
+
+        generated, failed = self.rag.enriched, self.rag.failed
+        enriched = []
+        for start in range(0, len(recipes), self.chunk_size):
+            chunk = recipes[start:start + self.chunk_size]
+            enriched.extend(await asyncio.gather(*(self.rag.enrich(recipe) for recipe in chunk)))
+        self.generated += self.rag.enriched - generated
+        self.failed += self.rag.failed - failed
+
+        self.last_run_seconds = time.monotonic() - started
+        if todo:
+            logger.info("Enriched %d recipes in %.1fs (%d already stored, %d failed)",
+                        self.rag.enriched - generated, self.last_run_seconds,
+                        len(incomplete) - len(todo), self.rag.failed - failed)
+        return enriched
+
+    def snapshot(self):
+        return {
+            "seen": self.seen,
+            "already_stored": self.already_stored,
+            "generated": self.generated,
+            "failed": self.failed,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+        }
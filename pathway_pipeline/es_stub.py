@@ -0,0 +1,98 @@
+"""
+In-memory stand-in for the parts of Elasticsearch the pipeline uses
+
+Serves /, /_cluster/health, /{index}/_bulk, /{index}/_count and
+/{index}/_doc/{id}. ``reject_rate`` answers that share of bulk items with
+429 so retry handling can be exercised locally.
+
+Run with: python -m pathway_pipeline.es_stub --port 9200
+"""
+
+import argparse
+import json
+import random
+
+from aiohttp import web
+
+
+class ElasticsearchStub:
+    def __init__(self, reject_rate=0.0, seed=None):
+        self.reject_rate = reject_rate
+        self.random = random.Random(seed)
+        self.indices = {}
+        self.bulk_requests = 0
+
+    def app(self):
+        app = web.Application(client_max_size=100 * 1024 * 1024)
+        app.router.add_get("/", self.info)
+        app.router.add_get("/_cluster/health", self.health)
+        app.router.add_post("/{index}/_bulk", self.bulk)
+        app.router.add_get("/{index}/_count", self.count)
+        app.router.add_get("/{index}/_doc/{doc_id}", self.get_doc)
+        return app
+
+    async def info(self, request):
+        return web.json_response({"name": "es-stub", "version": {"number": "8.11.0"}})
+
+    async def health(self, request):
+        return web.json_response({"cluster_name": "es-stub", "status": "green"})
+
+    async def bulk(self, request):
+        self.bulk_requests += 1
+        index = self.indices.setdefault(request.match_info["index"], {})
+        lines = (await request.text()).splitlines()
+        items, errors = [], False
+        position = 0
+        while position < len(lines):
+            if not lines[position].strip():
+                position += 1
+                continue
+            action = json.loads(lines[position])
+            op, meta = next(iter(action.items()))
+            position += 1
+            source = None
+            if op in ("index", "create", "update"):
+                source = json.loads(lines[position])
+                position += 1
+
+            doc_id = meta.get("_id")
+            if self.random.random() < self.reject_rate:
+                errors = True
+                items.append({op: {"_id": doc_id, "status": 429, "error": {
+                    "type": "es_rejected_execution_exception", "reason": "rejected by es-stub"}}})
+            elif op == "delete":
+                status = 200 if index.pop(doc_id, None) is not None else 404
+                items.append({op: {"_id": doc_id, "status": status, "result": "deleted" if status == 200 else "not_found"}})
+            elif not isinstance(source, dict):
+                errors = True
+                items.append({op: {"_id": doc_id, "status": 400, "error": {
+                    "type": "mapper_parsing_exception", "reason": "document must be an object"}}})
+            else:
+                created = doc_id not in index
+                index[doc_id] = source
+                items.append({op: {"_id": doc_id, "status": 201 if created else 200,
+                                   "result": "created" if created else "updated"}})
+        return web.json_response({"took": 1, "errors": errors, "items": items})
+
+    async def count(self, request):
+        return web.json_response({"count": len(self.indices.get(request.match_info["index"], {}))})
+
+    async def get_doc(self, request):
+        index = self.indices.get(request.match_info["index"], {})
+        doc_id = request.match_info["doc_id"]
+        if doc_id not in index:
+            return web.json_response({"_id": doc_id, "found": False}, status=404)
+        return web.json_response({"_id": doc_id, "found": True, "_source": index[doc_id]})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Elasticsearch stand-in for the SnapChef pipeline")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--reject-rate", type=float, default=0.0,
+                        help="share of bulk items answered with 429")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    web.run_app(ElasticsearchStub(args.reject_rate).app(), port=args.port)
@@ -0,0 +1,291 @@
+"""
+Elasticsearch indexing with size/time-bounded bulk batches and back-pressure
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+
+import httpx
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-item statuses worth another attempt; anything else is dead-lettered at once
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class BulkAction:
+    """One document on its way into the index"""
+
+    __slots__ = ("op", "doc_id", "source", "payload", "enqueued_at", "attempts")
+
+    def __init__(self, op, doc_id, source=None):
+        self.op = op
+        self.doc_id = doc_id
+        self.source = source
+        header = json.dumps({op: {"_id": doc_id}}, ensure_ascii=False)
+        body = "" if source is None else json.dumps(source, ensure_ascii=False) + "\n"
+        self.payload = (header + "\n" + body).encode("utf-8")
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class IndexerStats:
+    """Counters read by the pipeline monitor"""
+
+    def __init__(self, window=60.0):
+        self.window = window
+        self.enqueued = 0
+        self.indexed = 0
+        self.deleted = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.bulk_requests = 0
+        self.bulk_errors = 0
+        self.bytes_sent = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        # (finished_at, documents) per bulk request, for throughput over the window
+        self._completions = deque()
+
+    def record_batch(self, acknowledged, lags):
+        now = time.monotonic()
+        self._completions.append((now, acknowledged))
+        while self._completions and self._completions[0][0] < now - self.window:
+            self._completions.popleft()
+        if lags:
+            self.last_lag_seconds = max(lags)
+            self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+
+    def throughput(self):
+        """Acknowledged documents per second over the last window"""
+        now = time.monotonic()
+        recent = [(finished, count) for finished, count in self._completions if finished >= now - self.window]
+        if not recent:
+            return 0.0
+        span = max(1.0, now - recent[0][0])
+        return sum(count for _, count in recent) / span
+
+    def snapshot(self, queue_depth=0, pending=0, oldest_pending_age=0.0):
+        return {
+            "enqueued": self.enqueued,
+            "indexed": self.indexed,
+            "deleted": self.deleted,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "bulk_requests": self.bulk_requests,
+            "bulk_errors": self.bulk_errors,
+            "bytes_sent": self.bytes_sent,
+            "queue_depth": queue_depth,
+            "pending": pending,
+            "throughput_docs_per_second": round(self.throughput(), 2),
+            "lag_seconds": round(max(self.last_lag_seconds, oldest_pending_age), 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+        }
+
+
+class BulkIndexer:
+    """Streams index/delete actions into Elasticsearch through the _bulk API
+
+    Producers await ``index()``/``delete()``, which block once ``queue_size``
+    actions are waiting, so a fast source is slowed to what Elasticsearch
+    accepts. A batcher flushes when a batch reaches ``max_docs`` actions or
+    ``max_bytes`` of NDJSON, or ``flush_interval`` seconds after its first
+    action; up to ``concurrency`` bulk requests are in flight at once.
+    Items that fail with a retryable status are resent with jittered
+    exponential backoff; the rest, and items out of retries, are appended to
+    the dead-letter file as JSON lines and passed to ``on_dead_letter``.
+    """
+
+    def __init__(self, es_url=None, index=None, max_docs=None, max_bytes=None, flush_interval=None,
+                 queue_size=None, concurrency=2, max_retries=None, dead_letter_path=None, timeout=None,
+                 client=None, on_dead_letter=None):
+        self.es_url = (es_url or settings.elasticsearch_url).rstrip("/")
+        self.index_name = index or settings.elasticsearch_index
+        self.max_docs = max_docs or settings.bulk_max_docs
+        self.max_bytes = max_bytes or settings.bulk_max_bytes
+        self.flush_interval = settings.bulk_flush_interval if flush_interval is None else flush_interval
+        self.max_retries = settings.bulk_max_retries if max_retries is None else max_retries
+        self.dead_letter_path = dead_letter_path or settings.bulk_dead_letter_path
+        self.timeout = timeout or settings.request_timeout
+        self.concurrency = concurrency
+        self.on_dead_letter = on_dead_letter
+
+        self.stats = IndexerStats()
+        self._queue = asyncio.Queue(maxsize=queue_size or settings.bulk_queue_size)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._in_flight = set()
+        self._pending = 0
+        # Mirrors the queue's order, so the oldest unsent action can be aged
+        self._unsent = deque()
+        self._client = client
+        self._own_client = client is None
+        self._batcher = None
+
+    async def start(self):
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        self._batcher = asyncio.create_task(self._run())
+        return self
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def index(self, doc_id, document):
+        await self._put(BulkAction("index", doc_id, document))
+
+    async def delete(self, doc_id):
+        await self._put(BulkAction("delete", doc_id))
+
+    async def _put(self, action):
+        self._pending += 1
+        self.stats.enqueued += 1
+        await self._queue.put(action)
+        self._unsent.append(action)
+
+    def _finish(self, count=1):
+        """Mark actions acknowledged or dead-lettered"""
+        self._pending -= count
+        for _ in range(count):
+            self._queue.task_done()
+
+    async def flush(self):
+        """Wait until every action queued so far is acknowledged or dead-lettered"""
+        await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            self._batcher = None
+        if self._own_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def snapshot(self):
+        oldest = time.monotonic() - self._unsent[0].enqueued_at if self._unsent else 0.0
+        return self.stats.snapshot(self._queue.qsize(), self._pending, oldest)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._unsent.popleft()
+            size = len(batch[0].payload)
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_docs and size < self.max_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    action = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._unsent.popleft()
+                batch.append(action)
+                size += len(action.payload)
+            await self._slots.acquire()
+            task = asyncio.create_task(self._send_with_retries(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send_with_retries(self, batch):
+        try:
+            while batch:
+                retry = await self._send(batch)
+                if not retry:
+                    break
+                attempt = max(action.attempts for action in retry)
+                if attempt > self.max_retries:
+                    self._dead_letter(retry, "retries exhausted")
+                    break
+                self.stats.retried += len(retry)
+                await asyncio.sleep(0.2 * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                batch = retry
+        except Exception as e:
+            logger.exception("Bulk request failed")
+            self._dead_letter(batch, str(e))
+        finally:
+            self._slots.release()
+
+    async def _send(self, batch):
+        """Send one _bulk request; returns the actions to retry"""
+        body = b"".join(action.payload for action in batch)
+        for action in batch:
+            action.attempts += 1
+        self.stats.bulk_requests += 1
+        self.stats.bytes_sent += len(body)
+        try:
+            response = await self._client.post(
+                f"{self.es_url}/{self.index_name}/_bulk",
+                content=body,
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+        except httpx.HTTPError as e:
+            logger.warning("Bulk request of %d actions failed: %s", len(batch), e)
+            self.stats.bulk_errors += 1
+            return batch
+
+        if response.status_code in RETRY_STATUSES:
+            self.stats.bulk_errors += 1
+            return batch
+        if response.status_code != 200:
+            self.stats.bulk_errors += 1
+            self._dead_letter(batch, f"HTTP {response.status_code}: {response.text[:200]}")
+            return []
+
+        items = response.json().get("items", [])
+        retry, failed, lags = [], [], []
+        now = time.monotonic()
+        for action, item in zip(batch, items):
+            result = item.get(action.op) or next(iter(item.values()), {})
+            status = result.get("status", 500)
+            # Deleting a document that is already gone is fine
+            if status < 300 or (action.op == "delete" and status == 404):
+                lags.append(now - action.enqueued_at)
+                if action.op == "delete":
+                    self.stats.deleted += 1
+                else:
+                    self.stats.indexed += 1
+                self._finish()
+            elif status in RETRY_STATUSES:
+                retry.append(action)
+            else:
+                failed.append((action, json.dumps(result.get("error"))))
+        # A short items list means the rest were never acknowledged
+        retry.extend(batch[len(items):])
+        for action, error in failed:
+            self._dead_letter([action], error)
+        self.stats.record_batch(len(lags), lags)
+        return retry
+
+    def _dead_letter(self, actions, error):
+        if not actions:
+            return
+        logger.warning("Dead-lettering %d actions: %s", len(actions), error)
+        os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter_path)), exist_ok=True)
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for action in actions:
+                f.write(json.dumps({
+                    "op": action.op,
+                    "_id": action.doc_id,
+                    "source": action.source,
+                    "attempts": action.attempts,
+                    "error": error,
+                    "failed_at": time.time(),
+                }, ensure_ascii=False) + "\n")
+        self.stats.dead_lettered += len(actions)
+        self._finish(len(actions))
+        if self.on_dead_letter is not None:
+            for action in actions:
+                self.on_dead_letter(action)
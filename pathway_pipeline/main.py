@@ -0,0 +1,131 @@
+"""
+SnapChef indexing pipeline entry point
+
+Watches the recipe corpus, precomputes LLM enrichments for new and changed
+recipes, and streams new, changed and deleted recipes into Elasticsearch
+through the bulk indexer.
+
+Run with: python -m pathway_pipeline.main [--once] [--es-stub PORT]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+
+from backend.config import settings
+from backend.dedup import RecipeDeduplicator
+from backend.enrichment_store import EnrichmentStore
+from backend.manifest import ChangeSet, IndexManifest, document_fingerprint, fingerprint, recipe_key
+from backend.rag import RAGService, create_generator
+from backend.services import load_corpus
+
+from .enricher import EnrichmentStage
+from .indexer import BulkIndexer
+from .monitor import PipelineMonitor
+
+logger = logging.getLogger(__name__)
+
+
+async def sync_corpus(indexer, manifest, corpus_path, enricher=None, dedup=None):
+    """Push one corpus diff through the indexer; returns the change set that was applied
+
+    Recipes that end up dead-lettered stay out of the manifest, so the next
+    pass tries them again. With a deduplicator only canonical recipes are
+    indexed, and copies folded into one are deleted from the index.
+    """
+    recipes, version = load_corpus(corpus_path)
+    if dedup is not None:
+        recipes = dedup.deduplicate(recipes)
+    changes = manifest.diff(recipes)
+    if not (changes.added or changes.updated or changes.deleted):
+        return changes
+
+    failed = set()
+    previous, indexer.on_dead_letter = indexer.on_dead_letter, lambda action: failed.add(action.doc_id)
+    try:
+        fresh = changes.added + changes.updated
+        documents = await enricher.run(fresh) if enricher is not None else fresh
+        for recipe, document in zip(fresh, documents):
+            # The hash is of the source recipe, not of the enriched document
+            await indexer.index(recipe_key(recipe), dict(document, content_hash=fingerprint(recipe)))
+        for key in changes.deleted:
+            await indexer.delete(key)
+        await indexer.flush()
+    finally:
+        indexer.on_dead_letter = previous
+
+    applied = ChangeSet(
+        [recipe for recipe in changes.added if recipe_key(recipe) not in failed],
+        [recipe for recipe in changes.updated if recipe_key(recipe) not in failed],
+        changes.unchanged,
+        [key for key in changes.deleted if key not in failed],
+    )
+    manifest.apply(applied)
+    manifest.save()
+    logger.info("Synced corpus %s: %d added, %d updated, %d deleted, %d failed", version,
+                len(applied.added), len(applied.updated), len(applied.deleted), len(failed))
+    return applied
+
+
+async def run(es_url=None, once=False, poll_interval=None, corpus_path=None):
+    corpus_path = corpus_path or settings.recipe_corpus_path
+    poll_interval = poll_interval or settings.pipeline_poll_interval
+    manifest = IndexManifest(settings.pipeline_manifest_path, document_fingerprint)
+    monitor = PipelineMonitor()
+    store = EnrichmentStore(settings.enrichment_store_path)
+    enricher = EnrichmentStage(RAGService(create_generator(), store))
+    monitor.register("enrichment", enricher.snapshot)
+    dedup = RecipeDeduplicator() if settings.dedup_enabled else None
+    if dedup is not None:
+        monitor.register("dedup", dedup.snapshot)
+
+    async with BulkIndexer(es_url) as indexer:
+        monitor.register("indexer", indexer.snapshot)
+        monitor.start()
+        try:
+            last_mtime = None
+            while True:
+                mtime = os.path.getmtime(corpus_path) if os.path.exists(corpus_path) else None
+                if mtime != last_mtime:
+                    await sync_corpus(indexer, manifest, corpus_path, enricher, dedup)
+                    last_mtime = mtime
+                if once:
+                    break
+                await asyncio.sleep(poll_interval)
+        finally:
+            await monitor.stop()
+            store.close()
+
+
+async def main(args):
+    es_url = args.es_url
+    runner = None
+    if args.es_stub:
+        from aiohttp import web
+        from .es_stub import ElasticsearchStub
+
+        runner = web.AppRunner(ElasticsearchStub().app())
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", args.es_stub).start()
+        es_url = f"http://127.0.0.1:{args.es_stub}"
+        logger.info("Using the local Elasticsearch stand-in at %s", es_url)
+    try:
+        await run(es_url, once=args.once)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SnapChef indexing pipeline")
+    parser.add_argument("--es-url", help="Elasticsearch URL (default: ELASTICSEARCH_URL)")
+    parser.add_argument("--es-stub", type=int, metavar="PORT",
+                        help="serve an in-memory Elasticsearch stand-in on PORT and index into it")
+    parser.add_argument("--once", action="store_true", help="sync the corpus once and exit")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,75 @@
+"""
+Pipeline monitoring: periodic snapshots of stage counters
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineMonitor:
+    """Logs stage counters every ``interval`` seconds and writes them to a JSON file
+
+    Stages register a callable returning a dict of counters, e.g.
+    ``monitor.register("indexer", indexer.snapshot)``. The file is replaced
+    atomically, so health checks and dashboards can read it at any time.
+    """
+
+    def __init__(self, interval=10.0, path=None):
+        self.interval = interval
+        self.path = path or settings.pipeline_stats_path
+        self.stages = {}
+        self.started_at = time.time()
+        self._task = None
+
+    def register(self, name, snapshot):
+        self.stages[name] = snapshot
+
+    def snapshot(self):
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "stages": {name: snapshot() for name, snapshot in self.stages.items()},
+        }
+
+    def write(self):
+        data = self.snapshot()
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        indexer = data["stages"].get("indexer")
+        if indexer:
+            logger.info(
+                "indexer: %(indexed)d indexed, %(deleted)d deleted, %(dead_lettered)d dead-lettered, "
+                "%(throughput_docs_per_second).1f docs/s, lag %(lag_seconds).2fs, queue %(queue_depth)d",
+                indexer,
+            )
+        return data
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write()
+            except Exception:
+                logger.exception("Writing pipeline stats failed")
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.write()
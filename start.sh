@@ -48,9 +48,17 @@ else
     echo "❌ Elasticsearch is not responding"
 fi
 
-# Check Backend API
-if curl -s http://localhost:8000/health > /dev/null; then
+# Check Backend API, waiting for its search indexes to finish loading
+for attempt in $(seq 1 60); do
+    if curl -sf http://localhost:8000/health/ready > /dev/null; then
+        break
+    fi
+    sleep 2
+done
+if curl -sf http://localhost:8000/health/ready > /dev/null; then
     echo "✅ Backend API is running"
+elif curl -s http://localhost:8000/health/live > /dev/null; then
+    echo "⏳ Backend API is up but still loading its indexes (see http://localhost:8000/health/ready)"
 else
     echo "❌ Backend API is not responding"
 fi
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Let the tests import backend and pathway_pipeline however pytest is started
+sys.path.insert(0, ROOT)
+
+FIXTURE_CORPUS = os.path.join(ROOT, "data", "recipes.json")
+
+
+@pytest.fixture
+def corpus():
+    """The recipes of the bundled fixture corpus"""
+    with open(FIXTURE_CORPUS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def make_service(tmp_path, monkeypatch, corpus):
+    """Builds a RecipeSearchService over a corpus file under tmp_path (the fixture corpus by default)"""
+    from backend.config import settings
+    from backend.services import RecipeSearchService, write_corpus
+
+    monkeypatch.setattr(settings, "dedup_enabled", False)
+
+    def make(recipes=None, **kwargs):
+        path = str(tmp_path / "recipes.json")
+        write_corpus(path, corpus if recipes is None else recipes)
+        kwargs.setdefault("manifest_path", str(tmp_path / "index_manifest.json"))
+        return RecipeSearchService(path, **kwargs)
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """backend.main, imported with every file it writes under a temporary directory and an in-process cache
+
+    Requests go through httpx's ASGI transport, which does not run the
+    startup events, so the search service starts out not ready.
+    """
+    from backend.config import settings
+
+    data = tmp_path_factory.mktemp("api")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings, "cache_backend", "local")
+        patch.setattr(settings, "recipe_corpus_path", str(data / "recipes.json"))
+        for name in ("index_manifest_path", "analytics_path", "enrichment_store_path", "dedup_store_path",
+                     "embedding_store_path", "scrape_frontier_path"):
+            patch.setattr(settings, name, str(data / name))
+        with open(FIXTURE_CORPUS, encoding="utf-8") as source, open(settings.recipe_corpus_path, "w",
+                                                                     encoding="utf-8") as target:
+            target.write(source.read())
+        from backend import main
+        yield main
@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import json
+import os
+
+import httpx
+import pytest
+
+from backend import analytics as analytics_module
+from backend.analytics import ACTIVE_SUFFIX, SEALED_SUFFIX, AggregateStore, SearchAnalytics, read_segment
+
+# 2026-01-01 00:00:00 UTC, a minute boundary
+START = 1767225600.0
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time.time() for the analytics module; set clock.now to move it"""
+
+    class Clock:
+        now = START
+
+    monkeypatch.setattr(analytics_module.time, "time", lambda: Clock.now)
+    return Clock
+
+
+def segments(path, suffix):
+    return sorted(name for name in os.listdir(path) if name.endswith(suffix))
+
+
+def test_record_only_appends_and_drops_the_oldest_when_full(tmp_path):
+    analytics = SearchAnalytics(path=str(tmp_path), queue_size=3)
+    for i in range(5):
+        analytics.record(f"query {i}", results=1, elapsed_ms=2.0)
+    assert analytics.counters["recorded"] == 5 and analytics.counters["dropped"] == 2
+    assert [event.query for event in analytics._queue] == ["query 2", "query 3", "query 4"]
+    assert not segments(str(tmp_path), ACTIVE_SUFFIX)
+
+
+def test_flush_appends_gzip_members_to_the_active_segment(tmp_path, clock):
+    analytics = SearchAnalytics(path=str(tmp_path))
+    for batch in (["dal", "rice"], ["upma"]):
+        for query in batch:
+            analytics.record(query, results=3, elapsed_ms=1.5, cached=query == "rice")
+        run(analytics.flush())
+    [active] = segments(str(tmp_path), ACTIVE_SUFFIX)
+    events = read_segment(os.path.join(str(tmp_path), active))
+    assert [(event.query, event.elapsed_us, event.cached) for event in events] == [
+        ("dal", 1500, False), ("rice", 1500, True), ("upma", 1500, False),
+    ]
+    assert analytics.counters["written"] == 3 and analytics.snapshot()["queued"] == 0
+
+
+def test_segments_are_sealed_by_size_and_age(tmp_path, clock):
+    analytics = SearchAnalytics(path=str(tmp_path), segment_bytes=10 ** 6, segment_seconds=60)
+    analytics.record("dal", 1, 1.0)
+    run(analytics.flush())
+    clock.now += 61
+    analytics.record("rice", 1, 1.0)
+    run(analytics.flush())
+    assert len(segments(str(tmp_path), SEALED_SUFFIX)) == 1 and len(segments(str(tmp_path), ACTIVE_SUFFIX)) == 1
+
+    small = SearchAnalytics(path=str(tmp_path / "small"), segment_bytes=1)
+    for query in ("a", "b", "c"):
+        small.record(query, 1, 1.0)
+        run(small.flush())
+    assert len(segments(str(tmp_path / "small"), SEALED_SUFFIX)) == 2 and small.counters["segments"] == 3
+
+
+def test_a_truncated_segment_keeps_the_events_before_the_cut(tmp_path):
+    path = str(tmp_path / ("cut" + SEALED_SUFFIX))
+    whole = gzip.compress(json.dumps([START, "dal", 1, 1000, False]).encode() + b"\n")
+    broken = gzip.compress(json.dumps([START, "rice", 1, 1000, False]).encode() + b"\n")
+    with open(path, "wb") as f:
+        # A crash part way through writing the second batch
+        f.write(whole + broken[:len(broken) // 2])
+    assert [event.query for event in read_segment(path)] == ["dal"]
+
+
+def test_compaction_rolls_segments_into_per_minute_rows_once(tmp_path, clock):
+    analytics = SearchAnalytics(path=str(tmp_path), segment_bytes=1)
+    # Two searches in the first minute, one of them cached and one with no results; one in the third
+    for offset, query, results, elapsed_ms, cached in ((5, "dal", 3, 4.0, False), (30, "rice", 0, 2.0, True),
+                                                       (150, "upma", 1, 9.0, False)):
+        clock.now = START + offset
+        analytics.record(query, results, elapsed_ms, cached)
+        run(analytics.flush())
+    # The last segment is left as if by a worker that stopped: idle for more than two segment spans
+    later = START + 150 + 3 * analytics.segment_seconds
+    os.utime(os.path.join(str(tmp_path), segments(str(tmp_path), ACTIVE_SUFFIX)[0]), (START + 150,) * 2)
+    analytics._active = None
+    assert analytics.compact(now=later) == 3
+    assert not segments(str(tmp_path), SEALED_SUFFIX) and not segments(str(tmp_path), ACTIVE_SUFFIX)
+
+    rows = AggregateStore(os.path.join(str(tmp_path), "aggregates.sqlite3")).minutes(0)
+    assert sorted(rows) == [int(START), int(START) + 120]
+    first = rows[int(START)]
+    assert (first.searches, first.cached, first.empty, first.total_us, first.max_us) == (2, 1, 1, 6000, 4000)
+    assert rows[int(START) + 120].searches == 1
+    # Every event counts once, however many times compaction runs
+    assert analytics.compact(now=later) == 0
+    totals, _ = analytics.stats(now=later)
+    assert totals.searches == 3 and totals.cached == 1 and totals.empty == 1
+
+
+def test_stats_history_covers_the_last_minutes(tmp_path, clock):
+    analytics = SearchAnalytics(path=str(tmp_path))
+    for minute in range(5):
+        clock.now = START + minute * 60 + 1
+        for _ in range(minute + 1):
+            analytics.record("dal", 1, 1.0)
+        run(analytics.flush())
+    now = START + 4 * 60 + 30
+    totals, history = analytics.stats(minutes=3, now=now)
+    assert totals.searches == 15
+    assert [(minute - int(START)) // 60 for minute, _ in history] == [2, 3, 4]
+    assert [stats.searches for _, stats in history] == [3, 4, 5]
+    assert analytics.stats(minutes=0, now=now)[1] == []
+
+
+def test_stats_endpoint_reports_the_requested_history(api):
+    async def get(minutes):
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/stats", params={"minutes": minutes})
+
+    before = run(get(5)).json()
+    api.analytics.record("dal tadka", 2, 3.0)
+    api.analytics.record("jeera rice", 0, 1.0, cached=True)
+    response = run(get(5))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_searches"] == before["total_searches"] + 2
+    assert body["empty_results"] == before["empty_results"] + 1
+    assert body["history"] and body["history"][-1]["searches"] >= 2
+    assert run(get(0)).json()["history"] == []
+    assert run(get(-1)).status_code == 422
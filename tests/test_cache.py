@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from backend.cache import LocalRedis, SearchCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_l1_then_l2_hits():
+    async def scenario():
+        redis = LocalRedis()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"results": [1]}
+
+        cache = SearchCache(redis, ttl=60, stale_ttl=60)
+        assert await cache.get_or_compute("k", compute) == ({"results": [1]}, False)
+        assert await cache.get_or_compute("k", compute) == ({"results": [1]}, True)
+        other_worker = SearchCache(redis, ttl=60, stale_ttl=60)
+        assert await other_worker.get_or_compute("k", compute) == ({"results": [1]}, True)
+        return calls, cache.counters, other_worker.counters
+
+    calls, first, second = run(scenario())
+    assert len(calls) == 1
+    assert first["l1_hits"] == 1 and second["l2_hits"] == 1
+
+
+def test_concurrent_misses_share_one_computation():
+    async def scenario():
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        cache = SearchCache(LocalRedis(), ttl=60)
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        return calls, results, cache.counters
+
+    calls, results, counters = run(scenario())
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ["value"] * 5
+    assert counters["coalesced"] == 4
+
+
+def test_cancelled_leader_does_not_fail_waiters():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "value"
+
+        cache = SearchCache(LocalRedis(), ttl=60)
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # The leader's client hangs up while the fill is still running
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The fill still completed and was cached for later requests
+        again = await cache.get_or_compute("k", compute)
+        return results, again, cache._inflight
+
+    results, again, inflight = run(scenario())
+    assert [value for value, _ in results] == ["value"] * 3
+    assert again == ("value", True)
+    assert inflight == {}
+
+
+def test_failed_fill_reaches_every_waiter_and_is_retried():
+    async def scenario():
+        attempts = []
+
+        async def compute():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise RuntimeError("backend down")
+            return "value"
+
+        cache = SearchCache(LocalRedis(), ttl=60)
+        outcomes = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(3)),
+                                        return_exceptions=True)
+        retried = await cache.get_or_compute("k", compute)
+        return outcomes, retried
+
+    outcomes, retried = run(scenario())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert retried == ("value", False)
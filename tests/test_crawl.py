@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from backend.scrapers.base import BaseScraper
+from backend.scrapers.engine import CrawlEngine
+from backend.scrapers.frontier import FrontierStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def recipe_page(name):
+    recipe = {"@type": "Recipe", "name": name, "recipeIngredient": ["lentils"], "recipeInstructions": ["Boil"]}
+    return f'<html><script type="application/ld+json">{json.dumps(recipe)}</script></html>'
+
+
+class RecipeSite:
+    """Small recipe site: ETag pages, a page without validators, and flaky or broken pages"""
+
+    def __init__(self, flaky_failures=1):
+        self.flaky_failures = flaky_failures
+        self.requests = []
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/", self.index)
+        app.router.add_get("/dal-recipe/", self.tagged)
+        app.router.add_get("/plain-recipe/", self.plain)
+        app.router.add_get("/flaky-recipe/", self.flaky)
+        app.router.add_get("/broken-recipe/", self.broken)
+        return app
+
+    def _seen(self, request):
+        self.requests.append((request.path, request.headers.get("If-None-Match")))
+
+    async def index(self, request):
+        self._seen(request)
+        if request.headers.get("If-None-Match") == '"index"':
+            return web.Response(status=304)
+        links = "".join(f'<a href="/{slug}-recipe/">{slug}</a>' for slug in ("dal", "plain", "flaky", "broken"))
+        return web.Response(text=f"<html>{links}</html>", content_type="text/html", headers={"ETag": '"index"'})
+
+    async def tagged(self, request):
+        self._seen(request)
+        if request.headers.get("If-None-Match") == '"dal-v1"':
+            return web.Response(status=304)
+        return web.Response(text=recipe_page("Dal"), content_type="text/html", headers={"ETag": '"dal-v1"'})
+
+    async def plain(self, request):
+        self._seen(request)
+        return web.Response(text=recipe_page("Rice"), content_type="text/html")
+
+    async def flaky(self, request):
+        self._seen(request)
+        if self.flaky_failures:
+            self.flaky_failures -= 1
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.Response(text=recipe_page("Upma"), content_type="text/html")
+
+    async def broken(self, request):
+        self._seen(request)
+        return web.Response(status=500)
+
+
+class ThreadRecordingFrontier(FrontierStore):
+    """Frontier that notes which threads its reads and writes ran on"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = set()
+
+    def validators(self, url):
+        self.threads.add(threading.get_ident())
+        return super().validators(url)
+
+    def add(self, urls, source, depth=0):
+        self.threads.add(threading.get_ident())
+        return super().add(urls, source, depth)
+
+    def mark_done(self, url, etag=None, last_modified=None, content_hash=None):
+        self.threads.add(threading.get_ident())
+        super().mark_done(url, etag, last_modified, content_hash)
+
+    def mark_failed(self, url):
+        self.threads.add(threading.get_ident())
+        super().mark_failed(url)
+
+
+async def crawl(site, frontier, passes=1, **kwargs):
+    server = TestServer(site.app())
+    await server.start_server()
+    try:
+        engine = CrawlEngine([BaseScraper(str(server.make_url("/")))], frontier, requests_per_second=1000,
+                             burst=10, max_retries=1, **kwargs)
+        results = []
+        for _ in range(passes):
+            recipes = []
+            stats = await engine.crawl(recipes.append)
+            results.append((stats, sorted(recipe["title"] for recipe in recipes)))
+        return results
+    finally:
+        await server.close()
+
+
+def test_retries_then_gives_up_on_persistent_errors():
+    site = RecipeSite(flaky_failures=1)
+    frontier = FrontierStore(":memory:")
+    [(stats, titles)] = run(crawl(site, frontier))
+    assert titles == ["Dal", "Rice", "Upma"]
+    # flaky succeeds on its retry; broken uses its one retry and fails
+    assert stats["retries"] == 2 and stats["failed"] == 1
+    assert [path for path, _ in site.requests].count("/broken-recipe/") == 2
+    assert stats["frontier"] == {"done": 4, "failed": 1}
+
+
+def test_second_pass_uses_conditional_gets():
+    site = RecipeSite(flaky_failures=0)
+    frontier = FrontierStore(":memory:")
+    first, second = run(crawl(site, frontier, passes=2))
+    assert first[1] == ["Dal", "Rice", "Upma"]
+    stats, titles = second
+    assert titles == []
+    # index and dal answer 304; plain and flaky come back with the same body
+    assert stats["not_modified"] == 2 and stats["unchanged"] == 2
+    revalidated = {path: etag for path, etag in site.requests[-6:] if etag}
+    assert revalidated == {"/": '"index"', "/dal-recipe/": '"dal-v1"'}
+
+
+def test_concurrent_workers_stay_within_the_page_budget():
+    site = RecipeSite(flaky_failures=0)
+    frontier = FrontierStore(":memory:")
+    # The index links four pages at once; eight idle workers must not all start on them
+    (first, _), (second, _) = run(crawl(site, frontier, passes=2, max_pages=2))
+    assert first["fetched"] + first["not_modified"] + first["failed"] == 2 and first["frontier"]["pending"] == 3
+    # The next run resumes from the pages left pending
+    assert second["fetched"] + second["not_modified"] + second["failed"] == 2 and second["frontier"]["pending"] == 1
+    assert len({path for path, _ in site.requests}) == 4
+
+
+def test_frontier_reads_and_writes_run_off_the_event_loop():
+    site = RecipeSite(flaky_failures=0)
+    frontier = ThreadRecordingFrontier(":memory:")
+    [(stats, titles)] = run(crawl(site, frontier))
+    assert titles == ["Dal", "Rice", "Upma"]
+    assert frontier.threads and threading.get_ident() not in frontier.threads
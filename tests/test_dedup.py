@@ -0,0 +1,72 @@
+from backend.dedup import RecipeDeduplicator
+from backend.manifest import IndexManifest, fingerprint
+
+BUTTER_MASALA = {
+    "id": "hk-paneer-butter-masala",
+    "title": "Paneer Butter Masala",
+    "source": "Hebbar's Kitchen",
+    "url": "https://hebbarskitchen.com/paneer-butter-masala/",
+    "ingredients": ["200 g paneer", "2 tomatoes", "1 onion", "10 cashews", "2 tbsp butter",
+                    "1 tsp ginger garlic paste", "1 tsp kashmiri red chilli powder", "1/2 tsp garam masala",
+                    "1 tsp kasuri methi", "2 tbsp cream"],
+    "steps": ["Cook the onion, tomatoes and cashews and blend them to a smooth paste.",
+              "Heat butter in a pan and saute the ginger garlic paste with the chilli powder.",
+              "Add the paste and simmer until the butter separates.",
+              "Add paneer, kasuri methi and cream and cook for 2 minutes."],
+    "description": "Creamy paneer curry.",
+}
+DAL = {
+    "id": "ak-dal-tadka",
+    "title": "Dal Tadka",
+    "source": "Archana's Kitchen",
+    "url": "https://www.archanaskitchen.com/dal-tadka",
+    "ingredients": ["1 cup toor dal", "1 tsp jeera", "2 dried red chillies", "1 tbsp ghee", "1/2 tsp turmeric"],
+    "steps": ["Pressure cook the dal with turmeric.", "Temper jeera and red chillies in ghee and pour over the dal."],
+}
+
+
+def copy_of(recipe, **changes):
+    return dict(recipe, **changes)
+
+
+def test_copies_from_other_sources_collapse_into_the_most_complete():
+    republished = copy_of(BUTTER_MASALA, id="ak-paneer-butter-masala", source="Archana's Kitchen", url="u2",
+                          description=None, steps=BUTTER_MASALA["steps"][:3])
+    deduplicator = RecipeDeduplicator(store_path="")
+    result = deduplicator.deduplicate([republished, DAL, BUTTER_MASALA])
+    assert [recipe["id"] for recipe in result] == ["ak-dal-tadka", "hk-paneer-butter-masala"]
+    assert result[1]["alternates"] == [
+        {"id": "ak-paneer-butter-masala", "title": "Paneer Butter Masala", "source": "Archana's Kitchen", "url": "u2"}
+    ]
+    assert deduplicator.counters["duplicates"] == 1
+
+
+def test_similar_pages_of_one_source_are_kept_apart():
+    variant = copy_of(BUTTER_MASALA, id="hk-paneer-butter-masala-2")
+    result = RecipeDeduplicator(store_path="").deduplicate([BUTTER_MASALA, variant, DAL])
+    assert len(result) == 3 and not any(recipe.get("alternates") for recipe in result)
+
+
+def test_explicit_threshold_is_respected():
+    assert RecipeDeduplicator(threshold=0, store_path="").threshold == 0
+
+
+def test_signatures_are_reused_across_instances(tmp_path):
+    recipes = [BUTTER_MASALA, DAL]
+    first = RecipeDeduplicator(store_path=str(tmp_path))
+    first.deduplicate(recipes)
+    second = RecipeDeduplicator(store_path=str(tmp_path))
+    second.deduplicate(recipes + [copy_of(DAL, id="ihr-dal-tadka", source="Indian Healthy Recipes")])
+    assert first.counters["hashed"] == 2 and second.counters["hashed"] == 0
+    assert second.counters["clusters"] == 1
+
+
+def test_a_joining_copy_reindexes_without_changing_the_enrichment_key():
+    deduplicator = RecipeDeduplicator(store_path="")
+    manifest = IndexManifest()
+    [alone] = deduplicator.deduplicate([BUTTER_MASALA])
+    manifest.apply(manifest.diff([alone]))
+    republished = copy_of(BUTTER_MASALA, id="ak-paneer-butter-masala", source="Archana's Kitchen")
+    [canonical] = deduplicator.deduplicate([BUTTER_MASALA, republished])
+    assert canonical["alternates"] and fingerprint(canonical) == fingerprint(BUTTER_MASALA)
+    assert [recipe["id"] for recipe in manifest.diff([canonical]).updated] == ["hk-paneer-butter-masala"]
@@ -0,0 +1,83 @@
+import multiprocessing
+
+import numpy as np
+
+from backend.embeddings import EmbeddingService, EmbeddingStore, HashingEncoder
+
+
+def _append(path, prefix, value, count):
+    store = EmbeddingStore(path, "test")
+    for i in range(count):
+        store.put_many([f"{prefix}{i}"], [[value, i]])
+
+
+def test_store_round_trip_and_reopen(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "test")
+    store.put_many(["a", "b", "a"], [[1, 0], [0, 1], [9, 9]])
+    assert len(store) == 2
+    assert store.get("a").tolist() == [1, 0]
+    reopened = EmbeddingStore(str(tmp_path), "test")
+    assert reopened.get("b").tolist() == [0, 1]
+    assert EmbeddingStore(str(tmp_path), "other").get("a") is None
+
+
+def test_two_stores_on_one_path_agree_on_rows(tmp_path):
+    first = EmbeddingStore(str(tmp_path), "test")
+    second = EmbeddingStore(str(tmp_path), "test")
+    first.put_many(["a1", "a2"], [[1, 0], [1, 0]])
+    second.put_many(["b1", "b2"], [[0, 1], [0, 1]])
+    assert second.get("b1").tolist() == [0, 1]
+    assert second.get("a1").tolist() == [1, 0]
+    # first has not seen b1 yet; storing it again syncs instead of writing a second row
+    first.put_many(["b1"], [[5, 5]])
+    assert first.get("b1").tolist() == [0, 1]
+    assert len(EmbeddingStore(str(tmp_path), "test")) == 4
+
+
+def test_store_shared_between_processes(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_append, args=(str(tmp_path), prefix, value, 50))
+               for prefix, value in (("a", 1.0), ("b", 2.0))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    store = EmbeddingStore(str(tmp_path), "test")
+    assert len(store) == 100
+    for i in range(50):
+        assert store.get(f"a{i}").tolist() == [1.0, i]
+        assert store.get(f"b{i}").tolist() == [2.0, i]
+
+
+def test_store_drops_a_half_written_row(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "test")
+    store.put_many(["a", "b"], [[1, 0], [0, 1]])
+    with open(tmp_path / "keys.txt", "a") as f:
+        f.write("c\n")
+    reopened = EmbeddingStore(str(tmp_path), "test")
+    assert len(reopened) == 2 and reopened.get("c") is None
+    reopened.put_many(["c"], [[3, 3]])
+    assert EmbeddingStore(str(tmp_path), "test").get("c").tolist() == [3, 3]
+
+
+def test_service_batches_and_caches_queries(tmp_path):
+    service = EmbeddingService(HashingEncoder(dim=32), store_path=str(tmp_path))
+    vectors = service.encode(["Paneer Tikka", "paneer  tikka", "dal"])
+    assert np.allclose(vectors[0], vectors[1])
+    assert service.stats["encoded"] == 2
+    fresh = EmbeddingService(HashingEncoder(dim=32), store_path=str(tmp_path))
+    fresh.encode(["dal"])
+    assert fresh.stats["store_hits"] == 1 and fresh.stats["encoded"] == 0
+
+
+def test_corpus_encoding_skips_the_query_cache(tmp_path):
+    service = EmbeddingService(HashingEncoder(dim=32), cache_size=2, store_path=str(tmp_path))
+    query = service.encode(["paneer tikka"])
+    service.encode_corpus(["Recipe one", "Recipe two", "Recipe three"])
+    assert len(service.cache) == 1 and len(service.store) == 1
+    assert np.allclose(service.cache.get("paneer tikka"), query[0])
+    assert len(service.corpus_store) == 3 and service.stats["corpus_encoded"] == 3
+    fresh = EmbeddingService(HashingEncoder(dim=32), store_path=str(tmp_path))
+    fresh.encode_corpus(["recipe one"])
+    assert fresh.stats["corpus_encoded"] == 0
@@ -0,0 +1,111 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from backend.facets import FacetIndex, facet_values, normalize_filters
+from backend.services import write_corpus
+
+FILTERS = [
+    {"diet": "veg"},
+    {"diet": "Vegan", "time": "under_30_min"},
+    {"cuisine": ["Punjabi", "south indian"]},
+    {"main_ingredient": ["rice", "paneer"]},
+    {"course": "main course", "main_ingredient": "chicken"},
+    {"difficulty": ["easy", "hard"], "source": "Hebbar's Kitchen"},
+    {"source": "nowhere"},
+    {"main_ingredient": "saffron"},
+]
+
+
+def brute_mask(recipes, filters):
+    filters = normalize_filters(filters)
+    mask = []
+    for recipe in recipes:
+        values = facet_values(recipe) if recipe is not None else {}
+        mask.append(recipe is not None and all(
+            set(values.get(facet, [])) & set(wanted) for facet, wanted in filters.items()
+        ))
+    return mask
+
+
+def brute_counts(recipes, doc_ids):
+    counts = {}
+    for doc_id in doc_ids:
+        for facet, values in facet_values(recipes[doc_id]).items():
+            counts.setdefault(facet, Counter()).update(values)
+    return {facet: dict(values) for facet, values in counts.items()}
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_mask_matches_a_brute_force_filter(corpus, filters):
+    # A small capacity makes the bitmaps and columns grow while building
+    index = FacetIndex(capacity=4).build(corpus)
+    assert index.mask(filters).tolist() == brute_mask(corpus, filters)
+
+
+def test_counts_match_a_brute_force_count(corpus):
+    index = FacetIndex().build(corpus)
+    for doc_ids in (range(len(corpus)), range(0, len(corpus), 3), [13, 2, 9], []):
+        assert index.counts(list(doc_ids)) == brute_counts(corpus, doc_ids)
+    counts = index.counts(range(len(corpus)))
+    assert list(counts["diet"]) == ["vegetarian", "vegan", "non-vegetarian"]
+
+
+def test_unknown_facets_are_rejected(corpus):
+    with pytest.raises(ValueError):
+        FacetIndex().build(corpus).mask({"colour": "red"})
+
+
+def test_saved_index_answers_the_same(corpus, tmp_path):
+    index = FacetIndex().build(corpus)
+    index.save(str(tmp_path))
+    loaded = FacetIndex.load(str(tmp_path))
+    for filters in FILTERS:
+        assert loaded.mask(filters).tolist() == index.mask(filters).tolist()
+    assert loaded.counts(range(len(corpus))) == index.counts(range(len(corpus)))
+
+
+def test_removed_and_re_added_documents(corpus):
+    index = FacetIndex().build(corpus)
+    recipes = list(corpus)
+    for doc_id in (0, 7, 13):
+        index.remove(doc_id)
+        recipes[doc_id] = None
+    moved = dict(corpus[1], cuisine="Bengali", ingredients=["1 cup paneer"])
+    index.add(20, moved)
+    recipes += [None] * (20 - len(recipes)) + [moved]
+    for filters in FILTERS + [{"cuisine": "bengali"}]:
+        assert index.mask(filters).tolist() == brute_mask(recipes, filters)
+    live = [doc_id for doc_id, recipe in enumerate(recipes) if recipe is not None]
+    assert index.counts(live) == brute_counts(recipes, live)
+
+
+def test_incremental_refresh_keeps_facets_in_step_with_the_corpus(make_service, corpus):
+    service = make_service()
+    edited = [dict(recipe) for recipe in corpus]
+    # A facet-only edit keeps its doc id, a content edit moves to a new one, and one recipe goes
+    edited[2]["cuisine"] = "Mughlai"
+    edited[5]["ingredients"] = ["1 cup chickpeas"] + edited[5]["ingredients"]
+    del edited[9]
+    edited.append(dict(corpus[0], id="new-egg-curry", title="Egg Curry", diet="Eggetarian"))
+    write_corpus(service.corpus_path, edited)
+    report = service.reload()
+    assert (report["added"], report["updated"], report["deleted"]) == (1, 1, 1)
+
+    recipes = list(service.state.recipes)
+    for filters in FILTERS + [{"cuisine": "mughlai"}, {"diet": "eggetarian"}, {"main_ingredient": "chickpea"}]:
+        assert service.state.facets.mask(filters).tolist() == brute_mask(recipes, filters)
+    live = [doc_id for doc_id, recipe in enumerate(recipes) if recipe is not None]
+    assert service.state.facets.counts(live) == brute_counts(recipes, live)
+
+
+def test_filtered_search_returns_only_matching_recipes(make_service, corpus):
+    service = make_service()
+    filters = {"diet": "vegan", "course": "main course"}
+    allowed = {recipe["id"] for recipe, keep in zip(corpus, brute_mask(corpus, filters)) if keep}
+    response = service.search("masala curry", max_results=10, filters=filters, mode="lexical")
+    assert response.results and {result.id for result in response.results} <= allowed
+    unfiltered = service.search("masala curry", max_results=10, mode="lexical")
+    expected = [result.id for result in unfiltered.results if result.id in allowed]
+    assert [result.id for result in response.results] == expected
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+import pytest
+
+from final_verification import (
+    LOAD_ENDPOINT_MIX, LoadPlan, LoadStats, _load_worker, _schedule_tickets, percentile,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("pct, expected", [(0, 1), (10, 1), (50, 5), (51, 6), (90, 9), (95, 10), (99, 10), (100, 10)])
+def test_percentile_is_nearest_rank(pct, expected):
+    assert percentile(list(range(1, 11)), pct) == expected
+
+
+def test_percentile_of_no_samples_is_zero():
+    assert percentile([], 99) == 0.0
+
+
+def test_load_plan_follows_the_weighted_mixes():
+    plan = LoadPlan(seed=7)
+    draws = [plan.next_request() for _ in range(20000)]
+    endpoints = Counter(name for name, _, _, _ in draws)
+    for name, _, _, weight in LOAD_ENDPOINT_MIX:
+        assert endpoints[name] / len(draws) == pytest.approx(weight / 100, abs=0.02)
+    # Only searches carry a query body
+    assert all((body is None) == (method == "GET") for _, method, _, body in draws)
+    queries = Counter(body["dish_name"] for _, _, _, body in draws if body)
+    assert queries.most_common(1)[0][0] == "biryani"
+    # The same seed replays the same requests
+    replay = LoadPlan(seed=7)
+    assert [replay.next_request() for _ in range(50)] == draws[:50]
+
+
+def test_load_stats_summarize_per_endpoint_and_overall():
+    stats = LoadStats()
+    for latency in (10, 20, 30, 40):
+        stats.record("search", latency, 200)
+    stats.record("search", 500, 503)
+    stats.record("stats", 5, 200)
+    stats.record("stats", 7, "ConnectTimeout")
+    report = stats.summary(elapsed=2.0)
+
+    search = report["search"]
+    assert (search["requests"], search["errors"], search["error_rate"]) == (5, 1, 0.2)
+    assert search["throughput_rps"] == 2.5
+    assert search["latency_ms"] == {"p50": 30, "p95": 500, "p99": 500, "max": 500, "mean": 120}
+    assert search["status_codes"] == {"200": 4, "503": 1}
+    assert report["stats"]["status_codes"] == {"200": 1, "ConnectTimeout": 1}
+
+    overall = report["overall"]
+    assert (overall["requests"], overall["errors"]) == (7, 2)
+    assert overall["latency_ms"]["p50"] == 20 and overall["latency_ms"]["max"] == 500
+
+
+def test_tickets_are_released_at_the_target_rate():
+    async def scenario():
+        tickets = asyncio.Queue()
+        started = time.perf_counter()
+        await _schedule_tickets(tickets, rps=200, deadline=started + 0.1, workers=3)
+        return [tickets.get_nowait() for _ in range(tickets.qsize())]
+
+    released = run(scenario())
+    # One ticket every 5ms for 100ms, then a stop marker for each worker
+    assert released[-3:] == [None, None, None]
+    scheduled = released[:-3]
+    assert 19 <= len(scheduled) <= 20
+    assert [b - a for a, b in zip(scheduled, scheduled[1:])] == pytest.approx([0.005] * (len(scheduled) - 1))
+
+
+def test_open_loop_latency_counts_from_the_scheduled_send():
+    def handler(request):
+        return httpx.Response(200, json={})
+
+    async def scenario():
+        stats = LoadStats()
+        tickets = asyncio.Queue()
+        # A ticket that has been waiting 200ms for a free worker
+        tickets.put_nowait(time.perf_counter() - 0.2)
+        tickets.put_nowait(None)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            await _load_worker(client, LoadPlan(seed=1), stats, deadline=None, tickets=tickets)
+        return stats
+
+    stats = run(scenario())
+    [samples] = stats.latencies.values()
+    assert len(samples) == 1 and samples[0] >= 200
+
+
+def test_transport_errors_are_recorded_by_exception_name():
+    def handler(request):
+        raise httpx.ConnectError("connection refused")
+
+    async def scenario():
+        stats = LoadStats()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            await _load_worker(client, LoadPlan(seed=1), stats, time.perf_counter() + 0.05, None)
+        return stats
+
+    stats = run(scenario())
+    report = stats.summary(elapsed=0.05)
+    assert report["overall"]["requests"] > 0 and report["overall"]["error_rate"] == 1.0
+    assert all(set(data["status_codes"]) == {"ConnectError"} for name, data in report.items() if name != "overall")
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+
+from backend.services import LoadProgress
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_load_progress_reports_steps_until_ready():
+    progress = LoadProgress()
+    assert progress.as_dict()["phase"] == "starting" and not progress.ready
+    progress.step("building_lexical_index", 10, 40)
+    snapshot = progress.as_dict()
+    assert (snapshot["phase"], snapshot["done"], snapshot["total"], snapshot["ready"]) == (
+        "building_lexical_index", 10, 40, False)
+    progress.finish()
+    first_ready = progress.ready_after_s
+    assert progress.ready and progress.phase == "serving" and first_ready is not None
+    # A later refresh goes through the steps again without leaving the ready state
+    progress.step("reading_corpus")
+    progress.finish()
+    assert progress.ready and progress.ready_after_s == first_ready
+
+
+def test_a_failed_load_is_reported_and_stays_not_ready():
+    progress = LoadProgress()
+    progress.fail(FileNotFoundError("data/recipes.json"))
+    assert not progress.ready and progress.phase == "failed"
+    assert progress.error == "FileNotFoundError: data/recipes.json"
+
+
+def test_readiness_goes_from_503_to_200_once_the_indexes_load(api, make_service, monkeypatch):
+    service = make_service(load=False)
+    monkeypatch.setattr(api, "search_service", service)
+
+    async def scenario():
+        async with client(api.app) as http:
+            before = [
+                await http.get("/health/ready"),
+                await http.post("/search", json={"dish_name": "dal tadka"}),
+                await http.get("/suggest", params={"q": "dal"}),
+            ]
+            live = await http.get("/health/live")
+            service.start()
+            await service._loader
+            after = [
+                await http.get("/health/ready"),
+                await http.post("/search", json={"dish_name": "dal tadka", "mode": "lexical"}),
+            ]
+            await service.stop()
+            return before, live, after
+
+    before, live, after = run(scenario())
+    assert [response.status_code for response in before] == [503, 503, 503]
+    assert all(response.headers["retry-after"] == "1" for response in before)
+    assert before[0].json()["phase"] == "starting" and before[0].json()["ready"] is False
+    assert live.status_code == 200
+    ready, search = after
+    assert ready.status_code == 200 and "retry-after" not in ready.headers
+    assert ready.json()["ready"] is True and ready.json()["phase"] == "serving"
+    assert search.status_code == 200 and search.json()["results"][0]["title"] == "Dal Tadka"
+
+
+def test_readiness_reports_a_failed_load(api, make_service, monkeypatch):
+    service = make_service(load=False)
+    with open(service.corpus_path, "w", encoding="utf-8") as f:
+        f.write('[{"title": "Dal Tadka",')
+    monkeypatch.setattr(api, "search_service", service)
+
+    async def scenario():
+        service.start()
+        await service._loader
+        async with client(api.app) as http:
+            return await http.get("/health/ready")
+
+    response = run(scenario())
+    assert response.status_code == 503 and response.headers["retry-after"] == "1"
+    assert response.json()["phase"] == "failed" and response.json()["error"].startswith("JSONDecodeError")
@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+import httpx
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from health_check import (
+    RedisConnection, ServiceHistory, check_service_health_async, percentile, probe_service, render_prometheus,
+    serve_metrics,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def redis_stub(reply=b"+PONG\r\n"):
+    """Loopback server answering every line with ``reply``; returns (server, port, connections)"""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        while await reader.readline():
+            writer.write(reply)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1], connections
+
+
+async def http_stub():
+    """Loopback server: /health is up, /_cluster/health answers 503 and /slow hangs"""
+
+    async def health(request):
+        return web.Response(text="ok")
+
+    async def unavailable(request):
+        return web.Response(status=503)
+
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/_cluster/health", unavailable)
+    app.router.add_get("/slow", slow)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def test_probes_are_aggregated_per_service():
+    async def scenario():
+        site = await http_stub()
+        server, port, _ = await redis_stub()
+        services = {
+            "backend": {"type": "http", "url": str(site.make_url("/health")), "timeout": 1},
+            "elasticsearch": {"type": "http", "url": str(site.make_url("/_cluster/health")), "timeout": 1},
+            "redis": {"type": "redis", "host": "127.0.0.1", "port": port, "timeout": 1},
+        }
+        try:
+            async with server:
+                return await check_service_health_async(services)
+        finally:
+            await site.close()
+
+    health = run(scenario())
+    assert list(health) == ["backend", "elasticsearch", "redis"]
+    assert health["backend"]["status"] == "healthy" and health["backend"]["response_time"] >= 0
+    assert health["elasticsearch"]["status"] == "unhealthy" and health["elasticsearch"]["status_code"] == 503
+    assert health["redis"]["status"] == "healthy"
+
+
+def test_each_probe_has_its_own_deadline():
+    async def scenario():
+        site = await http_stub()
+        services = {
+            "slow": {"type": "http", "url": str(site.make_url("/slow")), "timeout": 0.1},
+            "fast": {"type": "http", "url": str(site.make_url("/health")), "timeout": 0.1},
+            "down": {"type": "redis", "host": "127.0.0.1", "port": 1, "timeout": 0.1},
+        }
+        started = time.perf_counter()
+        try:
+            async with httpx.AsyncClient() as client:
+                health = await check_service_health_async(services, client)
+            return health, time.perf_counter() - started
+        finally:
+            await site.close()
+
+    health, elapsed = run(scenario())
+    assert health["slow"]["status"] == "error" and health["slow"]["error"] == "timed out after 0.1s"
+    assert health["down"]["status"] == "error" and health["down"]["error"]
+    # A slow or dead service does not hold up the others
+    assert health["fast"]["status"] == "healthy"
+    assert elapsed < 0.5
+
+
+def test_redis_reports_an_unexpected_reply():
+    async def scenario():
+        server, port, _ = await redis_stub(b"-NOAUTH Authentication required.\r\n")
+        async with server:
+            config = {"type": "redis", "host": "127.0.0.1", "port": port, "timeout": 1}
+            return await probe_service(None, config)
+
+    status = run(scenario())
+    assert status["status"] == "unhealthy" and status["message"] == "-NOAUTH Authentication required."
+
+
+def test_a_kept_redis_connection_is_reused_between_probes():
+    async def scenario():
+        server, port, connections = await redis_stub()
+        config = {"type": "redis", "host": "127.0.0.1", "port": port, "timeout": 1}
+        connection = RedisConnection("127.0.0.1", port)
+        async with server:
+            statuses = [await probe_service(None, config, connection) for _ in range(3)]
+            connection.close()
+        return statuses, connections
+
+    statuses, connections = run(scenario())
+    assert [status["status"] for status in statuses] == ["healthy"] * 3
+    assert len(connections) == 1
+
+
+def healthy(response_time):
+    return {"status": "healthy", "response_time": response_time}
+
+
+def test_percentile_is_nearest_rank_and_none_without_samples():
+    samples = [0.1 * i for i in range(1, 21)]
+    assert percentile(samples, 50) == samples[9] and percentile(samples, 95) == samples[18]
+    assert percentile(samples, 100) == samples[-1]
+    assert percentile([], 50) is None
+
+
+def test_history_keeps_a_rolling_window():
+    history = ServiceHistory(window=4)
+    for status in (healthy(9.0), {"status": "error", "error": "refused"}, healthy(0.3),
+                   healthy(0.1), {"status": "unhealthy", "status_code": 503}, healthy(0.2)):
+        history.add(status)
+    summary = history.summary()
+    # The 9s probe and the first failure have left the window; the totals keep them
+    assert summary["window"] == 4 and summary["uptime_ratio"] == 0.75
+    assert (summary["p50"], summary["p95"], summary["max"]) == (0.2, 0.3, 0.3)
+    assert (summary["probes_total"], summary["failures_total"]) == (6, 2)
+
+
+def test_an_empty_or_failing_history_has_no_latencies():
+    assert ServiceHistory(window=3).summary()["uptime_ratio"] is None
+    history = ServiceHistory(window=3)
+    history.add({"status": "error", "error": "timed out after 2s"})
+    summary = history.summary()
+    assert summary["uptime_ratio"] == 0 and summary["p50"] is None and summary["max"] is None
+
+
+def test_prometheus_text_has_a_series_per_service():
+    services = {"backend": {}, "redis": {}}
+    histories = {"backend": ServiceHistory(10), "redis": ServiceHistory(10)}
+    for response_time in (0.01, 0.02, 0.04):
+        histories["backend"].add(healthy(response_time))
+    histories["redis"].add({"status": "error", "error": "refused"})
+    text = render_prometheus(services, histories, {"backend": healthy(0.04), "redis": {"status": "error"}})
+    lines = set(text.splitlines())
+    assert {
+        'snapchef_service_up{service="backend"} 1',
+        'snapchef_service_uptime_ratio{service="backend"} 1.0000',
+        'snapchef_service_response_seconds{service="backend",quantile="0.5"} 0.020000',
+        'snapchef_service_response_seconds{service="backend",quantile="1"} 0.040000',
+        'snapchef_service_probes_total{service="backend"} 3',
+        'snapchef_service_up{service="redis"} 0',
+        'snapchef_service_uptime_ratio{service="redis"} 0.0000',
+        'snapchef_service_failures_total{service="redis"} 1',
+    } <= lines
+    # No latency series for a service without a healthy probe
+    assert not any(line.startswith('snapchef_service_response_seconds{service="redis"') for line in lines)
+
+
+def test_metrics_are_served_over_http():
+    async def scenario():
+        server = await serve_metrics(0, lambda: "snapchef_service_up{service=\"backend\"} 1\n")
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+                return await client.get("/metrics"), await client.get("/other")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    metrics, missing = run(scenario())
+    assert metrics.status_code == 200 and metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert metrics.text == 'snapchef_service_up{service="backend"} 1\n'
+    assert missing.status_code == 404
@@ -0,0 +1,73 @@
+import threading
+
+from backend import hybrid
+from backend.hybrid import Candidate, reciprocal_rank_fusion, rerank
+from backend.services import write_corpus
+
+
+def recipe(title, ingredients=()):
+    return {"title": title, "ingredients": list(ingredients)}
+
+
+def test_fusion_orders_by_summed_reciprocal_ranks():
+    lexical = [(1, 0.9), (2, 0.8), (3, 0.7)]
+    semantic = [(3, 0.95), (4, 0.9), (1, 0.5)]
+    candidates = reciprocal_rank_fusion(lexical, semantic, k=60)
+    # 1: 1/61 + 1/63, 3: 1/63 + 1/61 (tie, lower id first), 2: 1/62, 4: 1/62
+    assert [candidate.doc_id for candidate in candidates] == [1, 3, 2, 4]
+    assert candidates[0] == Candidate(1, 1 / 61 + 1 / 63, 0.9, 0.5)
+    assert candidates[2].semantic is None and candidates[3].lexical is None
+
+
+def test_fusion_with_one_list_keeps_its_order():
+    lexical = [(7, 0.4), (3, 0.9), (5, 0.1)]
+    assert [candidate.doc_id for candidate in reciprocal_rank_fusion(lexical, [])] == [7, 3, 5]
+
+
+def test_rerank_promotes_the_exact_title():
+    recipes = [recipe("Dal Tadka", ["lentils"]), recipe("Dal Makhani", ["black lentils", "cream"])]
+    candidates = reciprocal_rank_fusion([(0, 0.6), (1, 0.5)], [])
+    hits = rerank("dal makhani", candidates, recipes, limit=2, depth=10, budget_ms=1000)
+    assert [hit.recipe["title"] for hit in hits] == ["Dal Makhani", "Dal Tadka"]
+    assert all(hit.reranked and hit.retrieved_by == ["lexical"] for hit in hits)
+
+
+def test_rerank_stops_scoring_when_the_budget_runs_out(monkeypatch):
+    # Every clock read advances a millisecond: the deadline is read at 0 ms, candidates at 1, 2, 3 ...
+    ticks = iter(range(1000))
+    monkeypatch.setattr(hybrid.time, "perf_counter", lambda: next(ticks) / 1000)
+    recipes = [recipe(f"Recipe {i}") for i in range(6)]
+    candidates = reciprocal_rank_fusion([(i, 1 - i / 10) for i in range(6)], [])
+    hits = rerank("recipe", candidates, recipes, limit=6, depth=6, budget_ms=3)
+    assert [hit.reranked for hit in hits] == [True, True, False, False, False, False]
+    # Candidates past the budget keep their fused order behind the re-ranked head
+    assert [hit.recipe["title"] for hit in hits[2:]] == ["Recipe 2", "Recipe 3", "Recipe 4", "Recipe 5"]
+
+
+def test_zero_budget_and_depth_skip_the_cross_scorer():
+    recipes = [recipe("Jeera Rice"), recipe("Rice Kheer")]
+    candidates = reciprocal_rank_fusion([(1, 0.7), (0, 0.6)], [])
+    assert not any(hit.reranked for hit in rerank("jeera rice", candidates, recipes, 2, 10, budget_ms=0))
+    hits = rerank("jeera rice", candidates, recipes, limit=2, depth=1, budget_ms=1000)
+    assert [hit.reranked for hit in hits] == [True, False]
+
+
+def test_queries_score_their_snapshot_without_the_update_lock(make_service, corpus):
+    service = make_service()
+    before = service.state
+    result = []
+    # The lock is held for the whole query; a query that took it would never finish
+    with service._update_lock:
+        worker = threading.Thread(target=lambda: result.append(service.retrieve("dal tadka", 3, mode="lexical")),
+                                  daemon=True)
+        worker.start()
+        worker.join(timeout=10)
+    assert result and result[0][0][0].recipe["title"] == "Dal Tadka"
+
+    write_corpus(service.corpus_path, [recipe for recipe in corpus if recipe["id"] != "ihr-dal-tadka"])
+    assert service.reload()["deleted"] == 1
+    assert service.state is not before
+    # The state an in-flight query holds is left exactly as it was
+    hits, _ = service._fuse(before, "dal tadka", *service._lexical_candidates(before, "dal tadka", 3), [], 3, 0)
+    assert hits[0].recipe["title"] == "Dal Tadka"
+    assert "Dal Tadka" not in [hit.recipe["title"] for hit in service.retrieve("dal tadka", 3, mode="lexical")[0]]
@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+from aiohttp.test_utils import TestServer
+
+from pathway_pipeline.es_stub import ElasticsearchStub
+from pathway_pipeline.indexer import BulkIndexer
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class GatedStub(ElasticsearchStub):
+    """Holds every bulk request until the gate opens"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.gate = asyncio.Event()
+
+    async def bulk(self, request):
+        await self.gate.wait()
+        return await super().bulk(request)
+
+
+async def serve(stub):
+    server = TestServer(stub.app())
+    await server.start_server()
+    return server, str(server.make_url("")).rstrip("/")
+
+
+def indexer_for(url, tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 0.01)
+    return BulkIndexer(url, index="recipes", dead_letter_path=str(tmp_path / "dead.jsonl"), **kwargs)
+
+
+def test_full_queue_blocks_producers_until_elasticsearch_catches_up(tmp_path):
+    async def scenario():
+        stub = GatedStub()
+        server, url = await serve(stub)
+        try:
+            async with indexer_for(url, tmp_path, max_docs=1, queue_size=2, concurrency=1) as indexer:
+                # One batch is held by the stub, one by the batcher waiting
+                # for a free slot, and the next two fill the queue
+                for i in range(4):
+                    await indexer.index(f"r{i}", {"title": f"Recipe {i}"})
+                await asyncio.sleep(0.05)
+                blocked = asyncio.ensure_future(indexer.index("r4", {"title": "Recipe 4"}))
+                await asyncio.sleep(0.05)
+                was_blocked = not blocked.done()
+                depth = indexer.snapshot()["queue_depth"]
+                stub.gate.set()
+                await blocked
+                await indexer.flush()
+                return was_blocked, depth, indexer.snapshot(), stub.indices["recipes"]
+        finally:
+            await server.close()
+
+    was_blocked, depth, snapshot, index = run(scenario())
+    assert was_blocked and depth == 2
+    assert snapshot["indexed"] == 5 and snapshot["pending"] == 0 and snapshot["queue_depth"] == 0
+    assert sorted(index) == ["r0", "r1", "r2", "r3", "r4"]
+
+
+def test_rejected_items_are_retried(tmp_path):
+    async def scenario():
+        stub = ElasticsearchStub(reject_rate=0.3, seed=7)
+        server, url = await serve(stub)
+        try:
+            async with indexer_for(url, tmp_path, max_retries=20) as indexer:
+                for i in range(50):
+                    await indexer.index(f"r{i}", {"title": f"Recipe {i}"})
+                await indexer.flush()
+                return indexer.snapshot(), len(stub.indices["recipes"])
+        finally:
+            await server.close()
+
+    snapshot, indexed = run(scenario())
+    assert snapshot["retried"] > 0
+    assert snapshot["indexed"] == indexed == 50 and snapshot["dead_lettered"] == 0
+
+
+def test_unindexable_documents_go_to_the_dead_letter_file(tmp_path):
+    async def scenario():
+        stub = ElasticsearchStub()
+        server, url = await serve(stub)
+        dead = []
+        try:
+            async with indexer_for(url, tmp_path, on_dead_letter=dead.append) as indexer:
+                await indexer.index("good", {"title": "Dal"})
+                await indexer.index("bad", ["not", "a", "document"])
+                await indexer.flush()
+                return indexer.snapshot(), [action.doc_id for action in dead]
+        finally:
+            await server.close()
+
+    snapshot, dead = run(scenario())
+    assert dead == ["bad"]
+    assert snapshot["indexed"] == 1 and snapshot["dead_lettered"] == 1 and snapshot["pending"] == 0
+    lines = (tmp_path / "dead.jsonl").read_text(encoding="utf-8").splitlines()
+    entry = json.loads(lines[0])
+    assert len(lines) == 1
+    assert entry["_id"] == "bad" and entry["op"] == "index" and "mapper_parsing_exception" in entry["error"]
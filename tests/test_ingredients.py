@@ -0,0 +1,97 @@
+import random
+
+import numpy as np
+import pytest
+
+from backend.ingredients import IngredientIndex, normalize_ingredient, recipe_ingredients
+
+
+@pytest.mark.parametrize("line, name", [
+    ("2 cups Basmati Rice, washed", "rice"),
+    ("1 tsp jeera", "cumin"),
+    ("1/2 tsp Kashmiri haldi", "turmeric"),
+    ("200 g Panir", "paneer"),
+    ("3 medium Tomatoes, chopped", "tomato"),
+    ("2 Green Chillies", "green chilli"),
+    ("A few curry leaves", "curry leaf"),
+    ("1 cup Kabuli Chana (soaked overnight)", "chickpea"),
+    ("to taste", None),
+])
+def test_ingredient_lines_normalize_to_one_name(line, name):
+    assert normalize_ingredient(line) == name
+
+
+def exhaustive(recipes, names, k, allowed=None):
+    """Top k by coverage over every recipe, summing weights the way the index does"""
+    scored = []
+    for doc_id, recipe in enumerate(recipes):
+        if allowed is not None and not allowed[doc_id]:
+            continue
+        have = recipe_ingredients(recipe)
+        matched = sorted(set(names) & set(have))
+        if matched:
+            score = 0.0
+            for _ in matched:
+                score += 1.0 / len(have)
+            scored.append((doc_id, score, matched))
+    scored.sort(key=lambda entry: (-entry[1], entry[0]))
+    return scored[:k]
+
+
+def synthetic_recipes(count, seed):
+    rng = random.Random(seed)
+    vocabulary = [f"ingredient{i}" for i in range(40)]
+    return [{"ingredients": rng.sample(vocabulary, rng.randint(1, 12))} for _ in range(count)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_wand_matches_exhaustive_scoring(seed):
+    recipes = synthetic_recipes(400, seed)
+    index = IngredientIndex().build(recipes)
+    rng = random.Random(seed)
+    allowed = np.array([rng.random() < 0.5 for _ in recipes])
+    for _ in range(20):
+        names = [f"ingredient{i}" for i in rng.sample(range(45), rng.randint(1, 8))]
+        for k in (1, 5, 25):
+            assert index.search(names, k) == exhaustive(recipes, names, k)
+            assert index.search(names, k, allowed) == exhaustive(recipes, names, k, allowed)
+
+
+def test_wand_matches_exhaustive_scoring_after_removals():
+    recipes = synthetic_recipes(200, 9)
+    index = IngredientIndex().build(recipes)
+    for doc_id in range(0, 200, 3):
+        index.remove(doc_id)
+        recipes[doc_id] = {"ingredients": []}
+    names = ["ingredient1", "ingredient2", "ingredient3", "ingredient30"]
+    assert index.search(names, 10) == exhaustive(recipes, names, 10)
+
+
+def test_packed_index_answers_like_the_one_it_was_saved_from(tmp_path):
+    recipes = synthetic_recipes(300, 3)
+    index = IngredientIndex().build(recipes)
+    index.save(str(tmp_path))
+    loaded = IngredientIndex.load(str(tmp_path))
+    names = ["ingredient4", "ingredient8", "ingredient15"]
+    assert loaded.search(names, 10) == index.search(names, 10)
+
+
+def test_recipes_rank_by_the_share_of_their_ingredients_covered(corpus):
+    index = IngredientIndex().build(corpus)
+    names = ["potato", "cauliflower", "pea", "bean", "carrot"]
+    found = index.search(names, 3)
+    titles = [corpus[doc_id]["title"] for doc_id, _, _ in found]
+    # Vegetable Curry has 5 of its 11 ingredients, Vegetable Biryani 4 of 12, Aloo Gobi 2 of 10
+    assert titles == ["Vegetable Curry", "Vegetable Biryani", "Aloo Gobi"]
+    assert [round(coverage, 4) for _, coverage, _ in found] == [round(5 / 11, 4), round(4 / 12, 4), 0.2]
+
+
+def test_pantry_search_normalizes_hindi_and_english_names(make_service):
+    service = make_service()
+    response = service.search_by_ingredients(["Jeera", "2 cups basmati rice", "ghee", "tej patta", "Dalchini", "dhania"])
+    assert response.ingredients == ["cumin", "rice", "ghee", "bay leaf", "cinnamon", "coriander"]
+    best = response.results[0]
+    assert best.title == "Jeera Rice" and best.coverage == 1.0 and best.missing == []
+    assert sorted(best.matched) == ["bay leaf", "cinnamon", "coriander", "cumin", "ghee", "rice"]
+    # Salt, water and oil are assumed, so they never show up as missing
+    assert all("salt" not in result.missing for result in response.results)
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+from backend.embeddings import HashingEncoder
+from backend.facets import FacetIndex
+from backend.manifest import IndexManifest, document_fingerprint
+from backend.search_index import BM25Index
+from backend.services import write_corpus
+from pathway_pipeline.es_stub import ElasticsearchStub
+from pathway_pipeline.indexer import BulkIndexer
+from pathway_pipeline.main import sync_corpus
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def serve(stub):
+    server = TestServer(stub.app())
+    await server.start_server()
+    return server, str(server.make_url("")).rstrip("/")
+
+
+def test_sync_reindexes_edits_outside_the_content_fingerprint(tmp_path):
+    corpus = tmp_path / "recipes.json"
+    recipes = [
+        {"id": "a", "title": "Dal", "ingredients": ["lentils"], "steps": ["boil"], "rating": 4.0},
+        {"id": "b", "title": "Rice", "ingredients": ["rice"], "steps": ["steam"], "rating": 3.5},
+    ]
+
+    async def scenario():
+        stub = ElasticsearchStub()
+        server, url = await serve(stub)
+        manifest = IndexManifest(str(tmp_path / "manifest.json"), document_fingerprint)
+        try:
+            async with BulkIndexer(url, index="recipes", flush_interval=0.01,
+                                   dead_letter_path=str(tmp_path / "dead.jsonl")) as indexer:
+                write_corpus(str(corpus), recipes)
+                first = await sync_corpus(indexer, manifest, str(corpus))
+                write_corpus(str(corpus), [dict(recipes[0], rating=4.8, cuisine="Indian"), recipes[1]])
+                second = await sync_corpus(indexer, manifest, str(corpus))
+                third = await sync_corpus(indexer, manifest, str(corpus))
+                return first, second, third, stub.indices["recipes"]
+        finally:
+            await server.close()
+
+    first, second, third, index = run(scenario())
+    assert len(first.added) == 2
+    assert [recipe["id"] for recipe in second.updated] == ["a"] and second.unchanged == ["b"]
+    assert not third.updated and len(third.unchanged) == 2
+    assert index["a"]["rating"] == 4.8 and index["a"]["cuisine"] == "Indian"
+
+
+def recipe(key, title, ingredients, **fields):
+    return {"id": key, "title": title, "ingredients": ingredients, "steps": ["Cook"], **fields}
+
+
+def test_diff_sorts_recipes_into_added_updated_unchanged_and_deleted(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IndexManifest(path)
+    first = [recipe("a", "Dal", ["lentils"]), recipe("b", "Rice", ["rice"]), recipe("c", "Upma", ["rava"])]
+    manifest.apply(manifest.diff(first))
+    manifest.save()
+
+    manifest = IndexManifest(path)
+    assert len(manifest) == 3
+    second = [
+        # Whitespace, case and fields outside the fingerprint are not changes
+        recipe("a", "  DAL ", ["Lentils"], rating=4.5),
+        recipe("b", "Rice", ["rice", "ghee"]),
+        recipe("d", "Poha", ["poha"]),
+        recipe("d", "Poha again", ["poha"]),
+    ]
+    changes = manifest.diff(second)
+    assert [r["id"] for r in changes.added] == ["d"] and [r["id"] for r in changes.updated] == ["b"]
+    assert changes.unchanged == ["a"] and changes.deleted == ["c"]
+    manifest.apply(changes)
+    assert "c" in manifest.tombstones and "c" not in manifest.documents
+
+    manifest.apply(manifest.diff(first))
+    assert "c" not in manifest.tombstones and not manifest.diff(first).updated
+
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{not json", encoding="utf-8")
+    manifest = IndexManifest(str(path))
+    assert len(manifest) == 0 and len(manifest.diff([recipe("a", "Dal", ["lentils"])]).added) == 1
+
+
+class RecordingEncoder(HashingEncoder):
+    def __init__(self):
+        super().__init__(dim=32)
+        self.corpus_texts = []
+
+    def encode_corpus(self, texts):
+        self.corpus_texts.append(list(texts))
+        return self.encode(texts)
+
+
+@pytest.fixture
+def spies(monkeypatch):
+    """Doc ids handed to BM25Index.update and FacetIndex.add/remove after the service is built"""
+    calls = {"bm25_added": [], "bm25_removed": [], "facets_added": [], "facets_removed": []}
+    update, add, remove = BM25Index.update, FacetIndex.add, FacetIndex.remove
+
+    def spy_update(self, added=None, removed=(), drift=0.1):
+        calls["bm25_added"].extend(sorted(added or {}))
+        calls["bm25_removed"].extend(removed)
+        return update(self, added, removed, drift)
+
+    def spy_add(self, doc_id, recipe):
+        calls["facets_added"].append(doc_id)
+        return add(self, doc_id, recipe)
+
+    def spy_remove(self, doc_id):
+        calls["facets_removed"].append(doc_id)
+        return remove(self, doc_id)
+
+    def install():
+        monkeypatch.setattr(BM25Index, "update", spy_update)
+        monkeypatch.setattr(FacetIndex, "add", spy_add)
+        monkeypatch.setattr(FacetIndex, "remove", spy_remove)
+        return calls
+
+    return install
+
+
+def test_incremental_refresh_touches_only_changed_recipes(make_service, corpus, spies):
+    encoder = RecordingEncoder()
+    service = make_service(encoder=encoder)
+    encoder.corpus_texts.clear()
+    calls = spies()
+
+    edited = [dict(recipe) for recipe in corpus]
+    edited[3]["rating"] = 3.9
+    edited[4]["ingredients"] = edited[4]["ingredients"] + ["1 tbsp kasuri methi"]
+    edited[7]["cuisine"] = "Fusion"
+    del edited[10]
+    edited.append(recipe("new-upma", "Rava Upma", ["1 cup rava", "1 onion"], cuisine="South Indian"))
+    write_corpus(service.corpus_path, edited)
+
+    report = service.reload()
+    assert {key: report[key] for key in ("added", "updated", "unchanged", "deleted")} == {
+        "added": 1, "updated": 1, "unchanged": 12, "deleted": 1,
+    }
+    assert report["total_recipes"] == len(edited)
+    # Dal Tadka (doc 4) moves to doc 14, the new recipe takes doc 15, Chole Masala (doc 10) goes
+    assert calls["bm25_added"] == [14, 15] and sorted(calls["bm25_removed"]) == [4, 10]
+    [texts] = encoder.corpus_texts
+    assert [text.split(".")[0] for text in texts] == ["Rava Upma", "Dal Tadka"]
+    assert sorted(calls["facets_removed"]) == [4, 7, 10] and sorted(calls["facets_added"]) == [7, 14, 15]
+    # Paneer Tikka's rating changed no facet, so it stays untouched but its new rating is served
+    assert service.state.recipes[3]["rating"] == 3.9 and service.state.recipes[4] is None
+
+    vector_ids = {doc_id for doc_id, _ in service.state.vector_index.search(encoder.encode(["Dal Tadka"]), 20)}
+    assert 14 in vector_ids and 4 not in vector_ids and 10 not in vector_ids
+    found = service.search("rava upma", mode="lexical")
+    assert found.results[0].id == "new-upma"
+
+    calls["bm25_added"].clear()
+    assert service.reload()["unchanged"] == len(edited)
+    assert not calls["bm25_added"] and len(encoder.corpus_texts) == 1
@@ -0,0 +1,103 @@
+import asyncio
+
+from backend.cache import LocalRedis
+from backend.popularity import PopularityTracker
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def counts(tracker, window):
+    return {title: count for title, count, _ in tracker._ranked[window]}
+
+
+def test_windows_are_shared_between_workers():
+    async def scenario():
+        redis = LocalRedis()
+        first, second = PopularityTracker(redis), PopularityTracker(redis)
+        now = 1_700_000_000.0
+        for _ in range(3):
+            first.record("Dal", now)
+        second.record("Dal", now)
+        second.record("Rice", now)
+        await first.flush(now)
+        await second.flush(now)
+        await first.flush(now + 1)
+        return first, second
+
+    first, second = run(scenario())
+    for tracker in (first, second):
+        for window in ("all", "hour", "day", "week"):
+            assert counts(tracker, window) == {"Dal": 4, "Rice": 1}
+    assert first._ranked["hour"][0][2] == 1_700_000_000.0
+
+
+def test_buckets_slide_out_of_their_window():
+    async def scenario():
+        redis = LocalRedis()
+        tracker = PopularityTracker(redis)
+        now = 1_700_000_000.0
+        tracker.record("Dal", now)
+        await tracker.flush(now)
+        tracker.record("Rice", now + 2 * 3600)
+        await tracker.flush(now + 2 * 3600)
+        return tracker
+
+    tracker = run(scenario())
+    assert counts(tracker, "hour") == {"Rice": 1}
+    assert counts(tracker, "day") == {"Dal": 1, "Rice": 1}
+    assert counts(tracker, "all") == {"Dal": 1, "Rice": 1}
+
+
+def test_windows_fall_back_to_local_sketches_without_redis():
+    async def scenario():
+        tracker = PopularityTracker()
+        now = 1_700_000_000.0
+        tracker.record("Dal", now)
+        tracker.record("Dal", now)
+        await tracker.flush(now)
+        return tracker
+
+    tracker = run(scenario())
+    assert counts(tracker, "hour") == {"Dal": 2} and counts(tracker, "all") == {"Dal": 2}
+
+
+class FlakyRedis(LocalRedis):
+    """Fails the first transactional pipeline before EXEC, so none of its commands apply"""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+        self.transactions = []
+
+    def pipeline(self, transaction=True):
+        self.transactions.append(transaction)
+        pipe = super().pipeline(transaction)
+        if transaction and self.failures:
+            self.failures -= 1
+
+            async def execute():
+                pipe._commands = []
+                raise ConnectionError("Connection reset by peer")
+            pipe.execute = execute
+        return pipe
+
+
+def test_a_failed_flush_is_retried_without_double_counting():
+    async def scenario():
+        redis = FlakyRedis()
+        tracker = PopularityTracker(redis)
+        now = 1_700_000_000.0
+        tracker.record("Dal", now)
+        tracker.record("Dal", now)
+        await tracker.flush(now)
+        failed = tracker.counters["redis_errors"]
+        tracker.record("Dal", now + 1)
+        await tracker.flush(now + 1)
+        return tracker, redis, failed
+
+    tracker, redis, failed = run(scenario())
+    assert failed == 1 and redis.transactions[0] is True
+    for window in ("all", "hour", "day", "week"):
+        assert counts(tracker, window) == {"Dal": 3}
@@ -0,0 +1,90 @@
+import pytest
+
+from backend.query import PackedSpellCorrector, QueryCanonicalizer, SpellCorrector
+
+
+@pytest.fixture
+def canonicalizer(corpus):
+    canonicalizer = QueryCanonicalizer()
+    canonicalizer.build(corpus)
+    return canonicalizer
+
+
+CANONICAL = [
+    # Transliteration variants map to the spelling the titles use
+    ("panir butter masala", "paneer butter masala"),
+    ("Biriyani recipe", "biryani"),
+    ("Chicken Biriyani Recipe", "chicken biryani"),
+    ("daal tadkha", "dal tadka"),
+    ("How to make dal makhni", "dal makhani"),
+    # SymSpell corrections: a deletion, a transposition, a substitution
+    ("Rajma Masla", "rajma masala"),
+    ("chikcen curry", "chicken curry"),
+    ("saffran", "saffron"),
+    ("paneer tika", "paneer tikka"),
+    ("Palak Panner", "palak paneer"),
+    # Hindi/English synonyms, including multi-word ones
+    ("murgh biryani", "chicken biryani"),
+    ("cottage cheese tikka", "paneer tikka"),
+    ("kidney beans masala", "rajma masala"),
+    ("aloo gobhi", "aloo gobi"),
+    ("masala dosai", "masala dosa"),
+]
+
+UNCHANGED = [
+    # Rare corpus words stay, even next to a more frequent word one edit away
+    ("besan", "besan"),
+    ("hing", "hing"),
+    ("kabuli chana", "kabuli chana"),
+    ("juice", "juice"),
+    # Words the corpus does not know and cannot be corrected to anything
+    ("khichdi", "khichdi"),
+    ("Crème brûlée", "creme brulee"),
+    # Nothing but filler words is searched as typed
+    ("the recipe", "the recipe"),
+]
+
+
+@pytest.mark.parametrize("query, canonical", CANONICAL + UNCHANGED)
+def test_queries_canonicalize(canonicalizer, query, canonical):
+    assert canonicalizer.canonicalize(query) == canonical
+
+
+def test_synonyms_only_map_to_words_the_corpus_uses(corpus):
+    canonicalizer = QueryCanonicalizer()
+    canonicalizer.build([recipe for recipe in corpus if "Aloo" not in recipe["title"]])
+    # "aloo" is in no title or ingredient line any more, so "potato" is left as it is
+    assert canonicalizer.canonicalize("potato curry") == "potato curry"
+
+
+def test_vocabulary_follows_updates(canonicalizer):
+    khichdi = {"title": "Moong Dal Khichdi", "ingredients": ["1 cup rice", "1/2 cup moong dal"]}
+    assert canonicalizer.canonicalize("kichdi") == "kichdi"
+    canonicalizer.update(added=[khichdi])
+    assert canonicalizer.canonicalize("kichdi") == "khichdi"
+    canonicalizer.update(removed=[khichdi])
+    assert canonicalizer.canonicalize("kichdi") == "kichdi"
+
+
+def test_closer_words_win_then_more_frequent_ones():
+    spelling = SpellCorrector(max_edits=2)
+    for word, count in (("masala", 10), ("masla", 1), ("salsa", 50)):
+        spelling.add(word, count)
+    assert spelling.correct("masala") == "masala"
+    # One edit from the rare word beats two from the common ones
+    assert spelling.correct("masl") == "masla"
+    # At the same distance the more frequent word wins
+    assert spelling.correct("malsa") == "salsa"
+    assert spelling.correct("xyzzy") is None
+
+
+def test_packed_corrector_gives_the_same_corrections(tmp_path, corpus):
+    canonicalizer = QueryCanonicalizer()
+    canonicalizer.build(corpus)
+    canonicalizer.save(str(tmp_path))
+    loaded = QueryCanonicalizer.load(str(tmp_path))
+    assert isinstance(loaded.spelling, PackedSpellCorrector)
+    for query, canonical in CANONICAL + UNCHANGED:
+        assert loaded.canonicalize(query) == canonical
+    with pytest.raises(TypeError):
+        loaded.update(added=[{"title": "Khichdi"}])
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+from backend.enrichment_store import EnrichmentStore
+from backend.rag import RAGService, StubGenerator
+from pathway_pipeline.enricher import EnrichmentStage
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def recipe(**fields):
+    return {"id": "dal", "title": "Dal Tadka", "ingredients": ["lentils", "ghee"], "steps": ["Boil", "Temper"],
+            "tips": [], "nutrition": None, **fields}
+
+
+def test_enrichments_are_reused_by_fingerprint(tmp_path):
+    generator = StubGenerator()
+    rag = RAGService(generator, EnrichmentStore(str(tmp_path / "enrichments.db")))
+
+    first = run(rag.enrich(recipe()))
+    assert first["tips"] == ["Dal Tadka tastes best freshly made."]
+    assert first["ingredients"] == ["lentils", "ghee"]
+    # Case, whitespace and fields outside the fingerprint do not change it
+    again = run(rag.enrich(recipe(title="  dal   TADKA", rating=4.9)))
+    assert again["tips"] == first["tips"] and again["rating"] == 4.9
+    assert generator.calls == 1 and rag.store_hits == 1
+
+    run(rag.enrich(recipe(ingredients=["lentils", "ghee", "cumin"])))
+    assert generator.calls == 2 and rag.enriched == 2
+
+
+def test_backend_reads_what_the_pipeline_stored(tmp_path):
+    path = str(tmp_path / "enrichments.db")
+    stage = EnrichmentStage(RAGService(StubGenerator(), EnrichmentStore(path)))
+    recipes = [recipe(), recipe(id="rice", title="Jeera Rice", tips=["Rinse the rice"], nutrition={"calories": 1})]
+    run(stage.run(recipes))
+    run(stage.run(recipes))
+    assert stage.snapshot()["generated"] == 1 and stage.snapshot()["already_stored"] == 1
+
+    backend = RAGService(None, EnrichmentStore(path))
+    enriched = run(backend.enrich(recipe()))
+    assert enriched["nutrition"] == {"calories": "300 kcal"}
+    assert backend.store_hits == 1
+    assert run(backend.enrich(recipe(steps=["Boil"]))) == recipe(steps=["Boil"])
+    assert backend.stats()["skipped"] == 1
+
+
+class ThreadRecordingStore(EnrichmentStore):
+    """Notes which thread each read and write runs on"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, content_hash):
+        self.threads.append(threading.get_ident())
+        return super().get(content_hash)
+
+    def put(self, *args):
+        self.threads.append(threading.get_ident())
+        return super().put(*args)
+
+
+def test_store_calls_stay_off_the_event_loop(tmp_path):
+    store = ThreadRecordingStore(str(tmp_path / "enrichments.db"))
+    rag = RAGService(StubGenerator(), store)
+    run(rag.enrich(recipe()))
+    run(rag.enrich(recipe()))
+    assert len(store.threads) == 3 and rag.store_hits == 1
+    assert threading.get_ident() not in store.threads
@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend.search_index import BM25Index, PackedBM25Index, tokenize
+
+DOCUMENTS = [
+    {"title": "Dal Tadka", "ingredients": "toor dal, ghee, cumin, garlic"},
+    {"title": "Dal Makhani", "ingredients": "urad dal, kidney beans, butter, cream, tomato"},
+    {"title": "Jeera Rice", "ingredients": "basmati rice, cumin, ghee"},
+    {"title": "Paneer Butter Masala", "ingredients": "paneer, butter, tomato, cream, cashews"},
+    {"title": "Tomato Rice", "ingredients": "rice, tomato, onion, mustard seeds, curry leaves, peanuts"},
+]
+
+
+def ranking(index, query, k=10):
+    return [doc_id for doc_id, _, _ in index.search(query, k)]
+
+
+def test_tokenize_drops_stop_words_and_units():
+    assert tokenize("2 Cups of Basmati Rice, chopped to taste") == ["basmati", "rice"]
+
+
+def test_scores_are_bm25_with_title_terms_weighted():
+    index = BM25Index().build(DOCUMENTS)
+    scores, bound = index.score_all("cumin")
+    # cumin appears once, in the ingredients, of docs 0 and 2
+    n, df = 5, 2
+    lengths = [sum(index.term_freqs[doc_id].values()) for doc_id in range(n)]
+    avg = sum(lengths) / n
+    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    for doc_id in (0, 2):
+        norm = index.k1 * (1 - index.b + index.b * lengths[doc_id] / avg)
+        assert scores[doc_id] == pytest.approx(idf * (index.k1 + 1) / (1 + norm))
+    assert set(scores) == {0, 2} and bound == pytest.approx(max(scores.values()))
+    # "butter" is a title word of doc 3 and only an ingredient of doc 1
+    assert ranking(index, "butter") == [3, 1]
+
+
+def test_rarer_terms_weigh_more():
+    index = BM25Index().build(DOCUMENTS)
+    assert index._idf("paneer") > index._idf("rice") > index._idf("tomato")
+    # Only doc 3 has "cashews"; "tomato" is in three of the five
+    assert ranking(index, "cashews tomato") == [3, 4, 1]
+
+
+def test_shorter_documents_score_higher_for_the_same_match():
+    documents = [
+        {"title": "Rice", "ingredients": "rice, water"},
+        {"title": "Rice", "ingredients": "rice, water, salt, peas, carrots, beans, onion, ghee, cloves"},
+    ]
+    assert ranking(BM25Index().build(documents), "rice") == [0, 1]
+    # Without length normalization both score the same
+    scores, _ = BM25Index(b=0).build(documents).score_all("rice")
+    assert scores[0] == pytest.approx(scores[1])
+
+
+def test_search_normalizes_by_the_bound_and_applies_the_mask():
+    index = BM25Index().build(DOCUMENTS)
+    hits = index.search("tomato rice", k=3)
+    assert [doc_id for doc_id, _, _ in hits] == [4, 2, 1]
+    assert all(0 < normalized <= 1 for _, _, normalized in hits)
+    allowed = np.array([True, True, True, True, False])
+    assert [doc_id for doc_id, _, _ in index.search("tomato rice", 5, allowed)] == [2, 1, 3]
+    assert index.search("biryani") == []
+
+
+def test_updates_match_a_fresh_build_once_impacts_are_recomputed():
+    index = BM25Index().build(DOCUMENTS)
+    added = {5: {"title": "Veg Biryani", "ingredients": "rice, peas, carrots, saffron"}}
+    # Replace doc 2 by doc 5 and drop doc 3; drift=0 recomputes every impact
+    index.update(added, removed=[2, 3], drift=0)
+    expected = BM25Index().build([DOCUMENTS[0], DOCUMENTS[1], DOCUMENTS[4], added[5]], doc_ids=[0, 1, 4, 5])
+    assert set(index.postings) == set(expected.postings)
+    for term, plist in expected.postings.items():
+        assert [doc_id for doc_id, _ in index.postings[term]] == [doc_id for doc_id, _ in plist]
+        assert [impact for _, impact in index.postings[term]] == pytest.approx([impact for _, impact in plist])
+    assert index.num_docs == 4 and "paneer" not in index.postings
+    assert ranking(index, "rice") == ranking(expected, "rice")
+
+
+def test_small_updates_only_rewrite_the_lists_they_touch():
+    spices = [f"spice{chr(97 + i // 26)}{chr(97 + i % 26)}" for i in range(50)]
+    index = BM25Index().build({"title": "Recipe", "ingredients": f"{spice}, rice"} for spice in spices)
+    untouched = list(index.postings[spices[7]])
+    rewritten = index.update({50: {"title": "Lemon Rice", "ingredients": "rice, lemon"}}, removed=[3])
+    # Only the lists of the terms in docs 3 and 50 are rewritten; the rest keep the old statistics
+    assert rewritten == len({spices[3], "recipe", "rice", "lemon"})
+    assert index.postings[spices[7]] == untouched
+    assert spices[3] not in index.postings
+    assert [doc_id for doc_id, _ in index.postings["lemon"]] == [50]
+    assert ranking(index, "lemon rice")[0] == 50
+
+
+def test_packed_index_answers_like_the_one_it_was_saved_from(tmp_path):
+    index = BM25Index().build(DOCUMENTS)
+    index.save(str(tmp_path))
+    packed = PackedBM25Index.load(str(tmp_path))
+    for query in ("dal", "tomato rice", "butter cream", "biryani"):
+        expected, expected_bound = index.score_all(query)
+        scores, bound = packed.score_all(query)
+        assert scores == pytest.approx(expected) and bound == pytest.approx(expected_bound)
+    allowed = np.array([False, True, True, True, True])
+    assert [d for d, _, _ in packed.search("dal", 5, allowed)] == [d for d, _, _ in index.search("dal", 5, allowed)]
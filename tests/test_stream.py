@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import httpx
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class GatedRAG:
+    """Enrichment that waits for ``gate`` and then finishes the later-started recipes first"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.started = []
+
+    async def enrich(self, recipe):
+        order = len(self.started)
+        self.started.append(recipe["title"])
+        await self.gate.wait()
+        await asyncio.sleep(0.01 * (5 - order))
+        return dict(recipe, tips=[f"Serve {recipe['title']} hot"])
+
+
+class InstantRAG:
+    async def enrich(self, recipe):
+        return dict(recipe, tips=[f"Serve {recipe['title']} hot"])
+
+
+def test_hits_are_sent_before_any_enrichment(make_service):
+    rag = GatedRAG()
+    service = make_service(rag=rag)
+
+    async def scenario():
+        stream = service.search_stream("dal", max_results=3, mode="lexical")
+        hits = await stream.__anext__()
+        enriched_before_hits = list(rag.started)
+        rag.gate.set()
+        return hits, enriched_before_hits, [event async for event in stream]
+
+    hits, enriched_before_hits, rest = run(scenario())
+    assert hits["event"] == "hits" and enriched_before_hits == []
+    assert [hit["title"] for hit in hits["hits"]][:2] == ["Dal Tadka", "Dal Makhani"]
+    assert [hit["rank"] for hit in hits["hits"]] == list(range(len(hits["hits"])))
+    results, done = rest[:-1], rest[-1]
+    assert [event["event"] for event in results] == ["result"] * len(hits["hits"])
+    # Results arrive as their enrichment completes, each tagged with its rank in the hits
+    ranks = [event["rank"] for event in results]
+    assert sorted(ranks) == list(range(len(hits["hits"]))) and ranks != sorted(ranks)
+    for event in results:
+        assert event["result"]["title"] == hits["hits"][event["rank"]]["title"]
+        assert event["result"]["tips"] == [f"Serve {event['result']['title']} hot"]
+    assert done["event"] == "done" and done["total_found"] == len(hits["hits"])
+
+
+def stream(api, **kwargs):
+    async def post():
+        async with client(api.app) as http:
+            return await http.post("/search/stream", json={"dish_name": "dal", "max_results": 3, "mode": "lexical"},
+                                   **kwargs)
+    return run(post())
+
+
+def test_stream_is_ndjson_by_default(api, make_service, monkeypatch):
+    monkeypatch.setattr(api, "search_service", make_service(rag=InstantRAG()))
+    response = stream(api)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text.endswith("\n")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events] == ["hits", "result", "result", "result", "done"]
+
+
+def test_stream_is_server_sent_events_when_asked_for(api, make_service, monkeypatch):
+    monkeypatch.setattr(api, "search_service", make_service(rag=InstantRAG()))
+    for response in (stream(api, params={"format": "sse"}), stream(api, headers={"Accept": "text/event-stream"})):
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text.endswith("\n\n")
+        frames = response.text[:-2].split("\n\n")
+        names = []
+        for frame in frames:
+            event_line, data_line = frame.split("\n")
+            assert event_line.startswith("event: ") and data_line.startswith("data: ")
+            name = event_line[len("event: "):]
+            assert json.loads(data_line[len("data: "):])["event"] == name
+            names.append(name)
+        assert names == ["hits", "result", "result", "result", "done"]
+    # An explicit format wins over the Accept header
+    response = stream(api, params={"format": "ndjson"}, headers={"Accept": "text/event-stream"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+
+def test_bad_filters_are_rejected_before_the_stream_starts(api, make_service, monkeypatch):
+    service = make_service(rag=InstantRAG())
+    calls = []
+
+    async def search_stream(*args, **kwargs):
+        calls.append(args)
+        yield {"event": "hits"}
+
+    monkeypatch.setattr(service, "search_stream", search_stream)
+    monkeypatch.setattr(api, "search_service", service)
+
+    async def post():
+        async with client(api.app) as http:
+            return await http.post("/search/stream", json={"dish_name": "dal", "filters": {"colour": "red"}},
+                                   params={"format": "sse"})
+
+    response = run(post())
+    assert response.status_code == 400
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["detail"].startswith("Unknown filter: colour")
+    assert calls == []
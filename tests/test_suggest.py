@@ -0,0 +1,77 @@
+import pytest
+
+from backend.services import write_corpus
+from backend.suggest import SuggestIndex
+
+
+def titles(index, query, limit=8):
+    return [title for _, title, _ in index.suggest(query, limit)]
+
+
+@pytest.fixture
+def index(corpus):
+    index = SuggestIndex(top_k=10, max_edits=2)
+    index.build(corpus)
+    return index
+
+
+def test_prefixes_complete_every_word_start(index):
+    # Rating breaks the tie between equally popular titles
+    assert titles(index, "pan") == ["Paneer Butter Masala", "Palak Paneer", "Paneer Tikka"]
+    assert [(title, edits) for _, title, edits in index.suggest("Dal Ma")] == [("Dal Makhani", 0), ("Dal Tadka", 1)]
+    assert titles(index, "chicken cu") == ["Chicken Curry", "Chicken Biryani"]
+    assert [edits for _, _, edits in index.suggest("paneer")] == [0, 0, 0]
+
+
+def test_spelling_variants_and_typos(index):
+    assert titles(index, "Biriyani") == titles(index, "briyani") == ["Chicken Biryani", "Vegetable Biryani"]
+    assert index.suggest("panner") == [
+        ("hk-paneer-butter-masala", "Paneer Butter Masala", 1),
+        ("hk-palak-paneer", "Palak Paneer", 1),
+        ("ak-paneer-tikka", "Paneer Tikka", 1),
+    ]
+    # Short prefixes are not fuzzed
+    assert titles(index, "qz") == []
+
+
+def test_popularity_orders_completions(index):
+    index.set_weights({"Paneer Tikka": 5, "palak paneer": 2})
+    assert titles(index, "paneer") == ["Paneer Tikka", "Palak Paneer", "Paneer Butter Masala"]
+    index.set_weights({})
+    assert titles(index, "paneer") == ["Paneer Butter Masala", "Palak Paneer", "Paneer Tikka"]
+
+
+def test_limit_caps_exact_and_fuzzy_results(index):
+    # The two best-rated of the four exact matches (tied with each other)
+    assert set(titles(index, "masala", limit=2)) == {"Paneer Butter Masala", "Masala Dosa"}
+    assert len(index.suggest("masala", limit=6)) == 6
+    assert index.suggest("masala", limit=0) == []
+    assert index.suggest("", limit=5) == []
+
+
+def test_updates_answer_like_a_fresh_build(corpus):
+    updated = SuggestIndex(top_k=3)
+    updated.build(corpus)
+    renamed = dict(corpus[2], title="Paneer Makhani")
+    added = [renamed, {"id": "new-pani-puri", "title": "Pani Puri", "rating": 4.9},
+             {"id": "new-dal-pakwan", "title": "Dal Pakwan", "rating": 4.1}]
+    removed = ["hk-palak-paneer", "ak-dal-makhani", "hk-jeera-rice"]
+    updated.update(added=added, removed=removed)
+
+    current = [recipe for recipe in corpus if recipe["id"] not in removed and recipe["id"] != renamed["id"]]
+    fresh = SuggestIndex(top_k=3)
+    fresh.build(current + added)
+    assert len(updated) == len(fresh) == len(current) + 3
+    prefixes = {key[:end] for recipe in current + added + corpus
+                for key in SuggestIndex.keys_for(recipe) for end in range(1, len(key) + 1)}
+    for prefix in sorted(prefixes):
+        assert updated.suggest(prefix, 3) == fresh.suggest(prefix, 3), prefix
+
+
+def test_service_refresh_updates_suggestions(make_service, corpus):
+    service = make_service()
+    assert [s.title for s in service.suggest("palak")] == ["Palak Paneer"]
+    write_corpus(service.corpus_path, [recipe for recipe in corpus if recipe["id"] != "hk-palak-paneer"]
+                 + [{"id": "new-palak-dal", "title": "Palak Dal", "ingredients": ["spinach"], "steps": ["Cook"]}])
+    service.reload()
+    assert [s.title for s in service.suggest("palak")] == ["Palak Dal"]
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from backend.models import LatencyStats
+from backend.tracing import (
+    LatencyHistogram, ServerTimingMiddleware, SlowRequestProfiler, StageRecorder, bucket_index,
+    bucket_upper_bound, recorder, stage,
+)
+
+
+def test_buckets_bound_values_within_three_percent():
+    for value in list(range(200)) + [1000, 4097, 65535, 10 ** 6, 123456789]:
+        upper = bucket_upper_bound(bucket_index(value))
+        assert value <= upper <= value * (1 + 1 / 32)
+
+
+def test_percentiles_come_from_the_buckets():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    for value in range(1, 1001):
+        histogram.record(value)
+    for pct in (50, 90, 99):
+        expected = 10 * pct
+        assert expected <= histogram.percentile(pct) <= expected * (1 + 1 / 32)
+    # The top percentiles are capped at the largest value seen
+    assert histogram.percentile(99.9) <= 1000 and histogram.percentile(100) == 1000
+    summary = histogram.summary()
+    assert summary["count"] == 1000 and summary["mean_ms"] == 0.5 and summary["max_ms"] == 1.0
+
+
+def test_per_thread_histograms_are_merged():
+    stages = StageRecorder()
+
+    def record(offset):
+        for value in range(100):
+            stages.record("retrieval", value + offset)
+
+    threads = [threading.Thread(target=record, args=(offset,)) for offset in (0, 1000)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stages.record("rerank", 7)
+    merged = stages.merged()
+    assert merged["retrieval"].count == 200 and merged["retrieval"].max_us == 1099
+    assert merged["retrieval"].percentile(50) == 99
+    summary = stages.summary()
+    assert list(summary) == ["rerank", "retrieval"]
+    assert isinstance(LatencyStats(stages=summary).stages["retrieval"].count, int)
+
+
+def test_server_timing_lists_the_stages_and_total():
+    app = FastAPI()
+
+    @app.get("/timed")
+    async def timed():
+        with stage("retrieval"):
+            await asyncio.sleep(0.01)
+        with stage("rerank"):
+            pass
+        return {}
+
+    app.add_middleware(ServerTimingMiddleware)
+    before = recorder.merged().get("request /timed")
+
+    async def get():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/timed")
+
+    response = asyncio.run(get())
+    entries = dict(entry.split(";dur=") for entry in response.headers["server-timing"].split(", "))
+    assert list(entries) == ["retrieval", "rerank", "total"]
+    assert 10 <= float(entries["retrieval"]) <= float(entries["total"])
+    count = before.count if before is not None else 0
+    assert recorder.merged()["request /timed"].count == count + 1
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_concurrent_requests_keep_their_own_samples():
+    profiler = SlowRequestProfiler(threshold_ms=0, sample_rate=1.0, interval_ms=1)
+
+    async def request(label, work):
+        session = profiler.begin()
+        started = time.perf_counter()
+        await work()
+        profiler.end(session, label, (time.perf_counter() - started) * 1000)
+
+    async def spin():
+        for _ in range(5):
+            busy(0.02)
+            await asyncio.sleep(0)
+
+    async def wait():
+        await asyncio.sleep(0.15)
+
+    async def scenario():
+        await asyncio.gather(request("spin", spin), request("wait", wait))
+
+    asyncio.run(scenario())
+    profiles = {profile["request"]: profile for profile in profiler.profiles()}
+    assert profiles["spin"]["samples"] > 0
+    assert any(":busy:" in entry["stack"] for entry in profiles["spin"]["stacks"])
+    assert not any(":busy:" in entry["stack"] for entry in profiles["wait"]["stacks"])
@@ -0,0 +1,33 @@
+import numpy as np
+
+from backend.vector_index import IVFIndex
+
+
+def vectors(count, seed):
+    return np.random.default_rng(seed).standard_normal((count, 16)).astype(np.float32)
+
+
+def test_tail_is_compacted_once_it_reaches_max_tail():
+    index = IVFIndex(16, nlist=4, train_size=64, max_tail=32)
+    data = vectors(400, 0)
+    for start in range(0, len(data), 10):
+        index.add(data[start:start + 10])
+        assert len(index._tail_ids) < max(index.max_tail, len(index.ids) // 4) + 10
+    assert index.is_trained and len(index) == 400
+    assert len(index.ids) > 300
+    for i in (0, 123, 399):
+        assert index.search(data[i], k=1, nprobe=4)[0][0] == i
+
+
+def test_compaction_after_load_keeps_mapped_vectors(tmp_path):
+    index = IVFIndex(16, nlist=4, train_size=64, max_tail=16)
+    data = vectors(200, 1)
+    index.add(data[:100])
+    index.save(str(tmp_path))
+    loaded = IVFIndex.load(str(tmp_path))
+    assert loaded.max_tail == 16
+    loaded.remove([5])
+    loaded.add(data[100:])
+    assert len(loaded) == 199 and len(loaded._tail_ids) < 50
+    assert loaded.search(data[150], k=1, nprobe=4)[0][0] == 150
+    assert all(doc_id != 5 for doc_id, _ in loaded.search(data[5], k=5, nprobe=4))